@@ -0,0 +1,332 @@
+"""
+Benchmark the assistant pipeline offline against the local mock API.
+
+Suites:
+    ttft      thread creation, run start, time to first token and generation speed
+    render    cost of streaming frames to the UI at different STREAM_RENDER_INTERVAL values
+    ingest    vector store creation and incremental sync throughput
+    sessions  throughput and latency as concurrent sessions grow
+
+The mock (benchmarks/mock_openai.py) runs in-process with the given latency and
+token rate, so numbers measure this code rather than the network. Save results
+and compare them with an earlier run to catch regressions:
+
+    python benchmarks/assistant_bench.py --output baseline.json
+    python benchmarks/assistant_bench.py --suites ttft render --compare baseline.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import threading
+from dataclasses import asdict
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src")
+sys.path.insert(0, SRC_DIR)
+
+from mock_openai import MockConfig, MockServer
+
+SUITES = ("ttft", "render", "ingest", "sessions")
+
+
+def summarize(values):
+    """Mean and percentiles of a list of numbers, ignoring missing values."""
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return None
+
+    def pick(fraction):
+        return values[min(int(len(values) * fraction), len(values) - 1)]
+
+    return {"mean": statistics.mean(values), "p50": pick(0.5), "p95": pick(0.95), "max": values[-1],
+            "samples": len(values)}
+
+
+def tokens_per_second(result):
+    generating = (result.latency or 0) - (result.time_to_first_token or 0)
+    return result.output_tokens / generating if result.output_tokens and generating > 0 else None
+
+
+def bench_ttft(args):
+    """Sequential runs on fresh threads, as for the first question of a conversation."""
+    from service.ai_service import AIAssistantManager
+    from service.run_waiter import stream_run
+
+    client = AIAssistantManager.init_client()
+    thread_create, results = [], []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        thread_id = AIAssistantManager.create_thread()
+        thread_create.append(time.perf_counter() - started)
+        results.append(stream_run(
+            client, thread_id, os.environ["ASSISTANT_ID"],
+            additional_messages=[{"role": "user", "content": "How did OEE develop last month?"}],
+        ))
+    return {
+        "runs": len(results),
+        "completed": sum(1 for result in results if result.status == "completed"),
+        "thread_create_seconds": summarize(thread_create),
+        "run_start_seconds": summarize([result.time_to_run_start for result in results]),
+        "first_token_seconds": summarize([result.time_to_first_token for result in results]),
+        "run_seconds": summarize([result.latency for result in results]),
+        "tokens_per_second": summarize([tokens_per_second(result) for result in results]),
+    }
+
+
+class ForwardMsgArea:
+    """Stands in for ``st.empty()``: serializes every frame as Streamlit would send it."""
+
+    def __init__(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        self._message_class = ForwardMsg
+        self.frames = 0
+        self.bytes_sent = 0
+
+    def markdown(self, body):
+        message = self._message_class()
+        message.delta.new_element.markdown.body = body
+        self.bytes_sent += len(message.SerializeToString())
+        self.frames += 1
+
+
+def bench_render(args):
+    """Frames, bytes and CPU time spent rendering one streamed answer per interval."""
+    from service.ai_service import AIAssistantManager
+    from service.run import StreamlitEventHandler
+    from service.run_waiter import stream_run
+
+    client = AIAssistantManager.init_client()
+    results = {}
+    for interval in args.render_intervals:
+        frames, bytes_sent, render_seconds, cpu_seconds = [], [], [], []
+        for _ in range(args.render_runs):
+            area = ForwardMsgArea()
+            handler = StreamlitEventHandler(area, render_interval=interval, min_chars=0)
+            thread_id = AIAssistantManager.create_thread()
+            cpu_started = time.process_time()
+            stream_run(client, thread_id, os.environ["ASSISTANT_ID"], event_handler=handler,
+                       additional_messages=[{"role": "user", "content": "Summarize waste by line."}])
+            cpu_seconds.append(time.process_time() - cpu_started)
+            frames.append(area.frames)
+            bytes_sent.append(area.bytes_sent)
+            render_seconds.append(handler.render_seconds)
+        results[f"interval_{interval:g}"] = {
+            "render_interval": interval,
+            "frames": statistics.mean(frames),
+            "bytes_sent": statistics.mean(bytes_sent),
+            "render_seconds": summarize(render_seconds),
+            "cpu_seconds": summarize(cpu_seconds),
+        }
+    return results
+
+
+def write_files(directory, count, size_kb, start=0):
+    """Write ``count`` CSV exports of about ``size_kb`` each."""
+    row = "2024-03-01,Smithfield,Line 3,OEE,0.784,Availability,0.912\n"
+    rows = max(size_kb * 1024 // len(row), 1)
+    for index in range(start, start + count):
+        with open(os.path.join(directory, f"export_{index:04d}.csv"), "w") as file:
+            file.write("date,plant,line,kpi,value,component,component_value\n")
+            file.write(f"# export {index} {time.time()}\n")
+            file.write(row * rows)
+
+
+def bench_ingest(args, workdir):
+    """Full uploads, a no-op resync and a partial resync of a generated export directory."""
+    from service.ai_service import AIAssistantManager
+
+    directory = os.path.join(workdir, "data")
+    os.makedirs(directory)
+    write_files(directory, args.files, args.file_kb)
+    total_mb = args.files * args.file_kb / 1024
+
+    def timed(function, *function_args, **kwargs):
+        started = time.perf_counter()
+        result = function(*function_args, **kwargs)
+        return result, time.perf_counter() - started
+
+    store_id, create_seconds = timed(AIAssistantManager.create_vector_store, directory=directory)
+    synced_id, sync_seconds = timed(AIAssistantManager.sync_vector_store, directory=directory)
+    _, noop_seconds = timed(AIAssistantManager.sync_vector_store, synced_id, directory)
+    changed = max(args.files // 10, 1)
+    write_files(directory, changed, args.file_kb)
+    _, partial_seconds = timed(AIAssistantManager.sync_vector_store, synced_id, directory)
+    return {
+        "files": args.files,
+        "megabytes": total_mb,
+        "succeeded": bool(store_id and synced_id),
+        "batch_upload": {"seconds": create_seconds, "files_per_second": args.files / create_seconds,
+                         "megabytes_per_second": total_mb / create_seconds},
+        "sync": {"seconds": sync_seconds, "files_per_second": args.files / sync_seconds,
+                 "megabytes_per_second": total_mb / sync_seconds},
+        "noop_resync_seconds": noop_seconds,
+        "partial_resync": {"changed_files": changed, "seconds": partial_seconds},
+    }
+
+
+def bench_sessions(args, server):
+    """Sessions asking back to back on their own threads, at increasing concurrency."""
+    from service.ai_service import AIAssistantManager
+    from service.client import client_stats
+
+    results = {}
+    baseline = None
+    for sessions in args.sessions:
+        server.state.peak_runs = 0
+        first_tokens, latencies, failures = [], [], []
+        lock = threading.Lock()
+
+        def session(index):
+            thread_id = None
+            for turn in range(args.turns):
+                result = AIAssistantManager.answer_query(f"Session {index} question {turn}", thread_id=thread_id)
+                with lock:
+                    if result is None or result.status != "completed":
+                        failures.append(index)
+                        continue
+                    first_tokens.append(result.time_to_first_token)
+                    latencies.append(result.latency)
+                thread_id = result.thread_id
+
+        connections_before = sum(stats["new_connections"] for stats in client_stats().values())
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as executor:
+            list(executor.map(session, range(sessions)))
+        elapsed = time.perf_counter() - started
+        connections = sum(stats["new_connections"] for stats in client_stats().values()) - connections_before
+
+        throughput = len(latencies) / elapsed if elapsed else 0.0
+        baseline = baseline or throughput / sessions
+        results[f"sessions_{sessions}"] = {
+            "sessions": sessions,
+            "runs": len(latencies),
+            "failures": len(failures),
+            "runs_per_second": throughput,
+            "scaling_efficiency": throughput / (baseline * sessions) if baseline else None,
+            "peak_concurrent_runs": server.state.peak_runs,
+            "new_connections": connections,
+            "first_token_seconds": summarize(first_tokens),
+            "run_seconds": summarize(latencies),
+        }
+    return results
+
+
+def flatten(value, prefix=""):
+    if isinstance(value, dict):
+        items = {}
+        for key, item in value.items():
+            items.update(flatten(item, f"{prefix}.{key}" if prefix else key))
+        return items
+    return {prefix: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+
+
+def compare(current, baseline, threshold):
+    """Print metrics that changed by more than ``threshold``; returns the number of regressions."""
+    old, new = flatten(baseline.get("suites", {})), flatten(current.get("suites", {}))
+    regressions = 0
+    for key in sorted(set(old) & set(new)):
+        higher_is_better = "per_second" in key or "efficiency" in key
+        if not (higher_is_better or key.endswith(("_seconds", ".mean", ".p50", ".p95", ".seconds"))):
+            continue
+        if key.endswith((".samples", ".max")) or not old[key]:
+            continue
+        change = (new[key] - old[key]) / abs(old[key])
+        if abs(change) < threshold:
+            continue
+        worse = change < 0 if higher_is_better else change > 0
+        regressions += worse
+        print(f"{'REGRESSION' if worse else 'improved  '} {key}: {old[key]:.4g} -> {new[key]:.4g} ({change:+.1%})")
+    return regressions
+
+
+def print_summary(suites):
+    if "ttft" in suites:
+        ttft = suites["ttft"]
+        print(f"ttft: run start p50 {ttft['run_start_seconds']['p50']:.3f}s, "
+              f"first token p50 {ttft['first_token_seconds']['p50']:.3f}s, "
+              f"{ttft['tokens_per_second']['mean']:.0f} tokens/s")
+    for name, render in suites.get("render", {}).items():
+        print(f"render {name}: {render['frames']:.0f} frames, {render['bytes_sent'] / 1024:.0f} KB, "
+              f"CPU {render['cpu_seconds']['mean'] * 1000:.0f} ms")
+    if "ingest" in suites:
+        ingest = suites["ingest"]
+        print(f"ingest: batch upload {ingest['batch_upload']['files_per_second']:.1f} files/s, "
+              f"sync {ingest['sync']['files_per_second']:.1f} files/s, "
+              f"no-op resync {ingest['noop_resync_seconds']:.2f}s")
+    for name, sessions in suites.get("sessions", {}).items():
+        print(f"{name}: {sessions['runs_per_second']:.2f} runs/s, efficiency {sessions['scaling_efficiency']:.0%}, "
+              f"first token p95 {sessions['first_token_seconds']['p95']:.3f}s" if sessions["runs"] else
+              f"{name}: no completed runs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--runs", type=int, default=10, help="sequential runs for the ttft suite")
+    parser.add_argument("--render-runs", type=int, default=3, help="runs per render interval")
+    parser.add_argument("--render-intervals", type=float, nargs="+", default=[0.0, 0.05, 0.1])
+    parser.add_argument("--files", type=int, default=50, help="generated files for the ingest suite")
+    parser.add_argument("--file-kb", type=int, default=256, help="size of each generated file")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--turns", type=int, default=3, help="questions per session")
+    mock_defaults = MockConfig()
+    for name, value in asdict(mock_defaults).items():
+        parser.add_argument(f"--mock-{name.replace('_', '-')}", dest=f"mock_{name}", type=type(value), default=value)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare with the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change reported by --compare")
+    args = parser.parse_args()
+
+    config = MockConfig(**{name: getattr(args, f"mock_{name}") for name in asdict(mock_defaults)})
+    workdir = tempfile.mkdtemp(prefix="sba-bench-")
+    server = MockServer(config).start()
+    # Point the shared clients at the mock and keep caches out of the real CACHE_DIR
+    os.environ.update(
+        OPENAI_BASE_URL=server.base_url, OPENAI_API_KEY="mock", ASSISTANT_ID="asst_mock",
+        CACHE_DIR=os.path.join(workdir, "cache"),
+    )
+    suites = {}
+    try:
+        for suite in args.suites:
+            started = time.perf_counter()
+            if suite == "ttft":
+                suites[suite] = bench_ttft(args)
+            elif suite == "render":
+                suites[suite] = bench_render(args)
+            elif suite == "ingest":
+                suites[suite] = bench_ingest(args, workdir)
+            elif suite == "sessions":
+                suites[suite] = bench_sessions(args, server)
+            print(f"{suite} finished in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "mock": asdict(config),
+        "suites": suites,
+    }
+    print_summary(suites)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(result, json.load(file), args.threshold)
+        print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
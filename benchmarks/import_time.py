@@ -0,0 +1,94 @@
+"""
+Measure cold-start import time of the app's modules.
+
+Each module is imported in a fresh interpreter with ``-X importtime`` so nothing
+is shared between samples. Run from the repository root:
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --modules styles app --repeat 10 --output import_time.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+DEFAULT_MODULES = ["styles", "service.ai_service", "app"]
+
+
+def import_once(module):
+    """Import ``module`` in a new interpreter; return wall time and per-module cumulative times."""
+    env = dict(os.environ, PYTHONPATH=SRC_DIR, PYTHONDONTWRITEBYTECODE="")
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(SRC_DIR), env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    # Lines look like: "import time:  self [us] |  cumulative | imported package"
+    cumulative = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, values = line.split(":", 1)
+        try:
+            _, total, name = (part.strip() for part in values.split("|"))
+            cumulative[name] = int(total)
+        except ValueError:
+            continue
+    return elapsed, cumulative
+
+
+def benchmark(module, repeat):
+    wall_times, samples = [], []
+    for _ in range(repeat):
+        elapsed, cumulative = import_once(module)
+        wall_times.append(elapsed)
+        samples.append(cumulative)
+    last = samples[-1]
+    slowest = sorted(last.items(), key=lambda item: item[1], reverse=True)[:15]
+    return {
+        "module": module,
+        "repeat": repeat,
+        "wall_seconds": {
+            "min": min(wall_times),
+            "median": statistics.median(wall_times),
+            "max": max(wall_times),
+        },
+        "import_seconds": last.get(module, 0) / 1e6,
+        "slowest_imports": [{"module": name, "seconds": total / 1e6} for name, total in slowest],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {"python": sys.version.split()[0], "timestamp": time.time(), "results": []}
+    for module in args.modules:
+        result = benchmark(module, args.repeat)
+        results["results"].append(result)
+        wall = result["wall_seconds"]
+        print(f"{module:<24} median {wall['median'] * 1000:8.1f} ms  "
+              f"(min {wall['min'] * 1000:.1f}, max {wall['max'] * 1000:.1f}), "
+              f"import {result['import_seconds'] * 1000:.1f} ms")
+        for entry in result["slowest_imports"][:5]:
+            print(f"    {entry['module']:<40} {entry['seconds'] * 1000:8.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Load test a running app with concurrent Streamlit sessions.
+
+Each virtual user opens the app's websocket like a browser tab and reruns the
+script back to back, which is the work every interaction costs the server.
+Compare a single worker with the multi-worker deployment to see throughput
+scale across cores:
+
+    python benchmarks/load_bench.py --url http://localhost:8501 --users 32 --duration 30
+    python benchmarks/load_bench.py --url http://localhost:8082 --users 32 --duration 30 --output multi.json
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from urllib.parse import urlparse, urlunparse
+from tornado.httpclient import HTTPRequest
+from tornado.websocket import websocket_connect
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+
+def stream_url(url):
+    """Websocket endpoint of the app at ``url``."""
+    parts = urlparse(url)
+    scheme = "wss" if parts.scheme == "https" else "ws"
+    return urlunparse((scheme, parts.netloc, parts.path.rstrip("/") + "/_stcore/stream", "", "", ""))
+
+
+async def rerun(connection, timeout):
+    """Rerun the script and wait until it finishes; returns the wall time."""
+    message = BackMsg()
+    message.rerun_script.query_string = ""
+    started = time.perf_counter()
+    await connection.write_message(message.SerializeToString(), binary=True)
+    while True:
+        data = await asyncio.wait_for(connection.read_message(), timeout)
+        if data is None:
+            raise ConnectionError("Websocket closed")
+        forward = ForwardMsg()
+        forward.ParseFromString(data)
+        if forward.WhichOneof("type") == "script_finished":
+            return time.perf_counter() - started
+
+
+async def user(url, deadline, timeout, latencies, errors):
+    """One browser session rerunning the app until ``deadline``."""
+    request = HTTPRequest(stream_url(url), headers={"Sec-WebSocket-Protocol": "streamlit"})
+    try:
+        connection = await websocket_connect(request)
+    except Exception as e:
+        errors.append(f"connect: {e}")
+        return
+    try:
+        while time.perf_counter() < deadline:
+            try:
+                latencies.append(await rerun(connection, timeout))
+            except Exception as e:
+                errors.append(f"rerun: {e!r}")
+                return
+    finally:
+        connection.close()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def run(url, users, duration, ramp_up, timeout):
+    latencies, errors = [], []
+    started = time.perf_counter()
+    deadline = started + duration
+    tasks = []
+    for index in range(users):
+        tasks.append(asyncio.ensure_future(user(url, deadline, timeout, latencies, errors)))
+        if ramp_up:
+            await asyncio.sleep(ramp_up / users)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    result = {
+        "url": url,
+        "users": users,
+        "duration_seconds": elapsed,
+        "runs": len(latencies),
+        "runs_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "errors": len(errors),
+        "error_samples": errors[:5],
+    }
+    if latencies:
+        result["latency_seconds"] = {
+            "mean": statistics.mean(latencies),
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": max(latencies),
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8501")
+    parser.add_argument("--users", type=int, default=16, help="concurrent sessions")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="seconds over which sessions are opened")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for one script run")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.url, args.users, args.duration, args.ramp_up, args.timeout))
+    result["python"] = sys.version.split()[0]
+    result["timestamp"] = time.time()
+    print(f"{result['runs']} runs in {result['duration_seconds']:.1f}s: "
+          f"{result['runs_per_second']:.1f} runs/s with {args.users} sessions, {result['errors']} errors")
+    if "latency_seconds" in result:
+        latency = result["latency_seconds"]
+        print(f"latency p50 {latency['p50'] * 1000:.0f} ms, p95 {latency['p95'] * 1000:.0f} ms, "
+              f"p99 {latency['p99'] * 1000:.0f} ms")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
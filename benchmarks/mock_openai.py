@@ -0,0 +1,758 @@
+"""
+Local stand-in for the parts of the OpenAI API the app uses.
+
+Threads, messages, streamed and polled runs, files, uploads, vector stores and
+file batches, assistants, chat completions and embeddings are served from memory
+with configurable latency and generation speed, so the app and the benchmarks
+can run without a network or an API bill:
+
+    python benchmarks/mock_openai.py --port 8765 --ttft 0.4 --tokens-per-second 60
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=mock ASSISTANT_ID=asst_mock \\
+        streamlit run src/app.py
+
+Only the fields the app and the SDK's stream handling read are filled in.
+"""
+import json
+import time
+import uuid
+import base64
+import random
+import asyncio
+import argparse
+import threading
+from dataclasses import dataclass, asdict
+from aiohttp import web
+
+
+# A 1x1 PNG returned as the content of generated image files
+PNG_PIXEL = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+
+WORDS = (
+    "OEE at the Smithfield plant rose to 78.4% in March, driven by higher availability on line 3 "
+    "while performance dipped slightly because of two short changeovers. Waste fell 0.6 points "
+    "and throughput per labour hour reached 412 units, the best result this quarter."
+).split()
+
+
+@dataclass
+class MockConfig:
+    """Simulated service behaviour."""
+
+    latency: float = 0.02              # seconds added to every request
+    run_start: float = 0.15            # seconds from the run request to thread.run.created
+    ttft: float = 0.4                  # seconds from thread.run.created to the first token
+    tokens_per_second: float = 80.0    # generation speed after the first token
+    response_tokens: int = 120         # tokens in every answer
+    images: int = 0                    # generated images per answer
+    upload_mbps: float = 0.0           # simulated upload bandwidth in MB/s (0 is unlimited)
+    index_seconds: float = 0.01        # vector store processing time per file
+    poll_after_ms: int = 50            # polling interval suggested to the SDK
+    error_rate: float = 0.0            # fraction of requests answered with a 500 or 503
+    rate_limit_rpm: int = 0            # requests per minute before answering 429 (0 is unlimited)
+
+
+def _id(prefix):
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+class MockState:
+    """In-memory objects of the mock API; safe to inspect from another thread."""
+
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.threads = {}
+        self.runs = {}
+        self.files = {}
+        self.uploads = {}
+        self.vector_stores = {}
+        self.batches = {}
+        self.assistants = {}
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self._window = []
+        self.active_runs = 0
+        self.peak_runs = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "rate_limited": self.rate_limited,
+                "threads": len(self.threads),
+                "runs": len(self.runs),
+                "files": len(self.files),
+                "bytes_uploaded": sum(file["bytes"] for file in self.files.values()),
+                "vector_store_files": sum(len(store["files"]) for store in self.vector_stores.values()),
+                "peak_concurrent_runs": self.peak_runs,
+            }
+
+
+state_key = web.AppKey("state", MockState)
+
+
+def _state(request):
+    return request.app[state_key]
+
+
+def _not_found(kind, object_id):
+    return web.json_response(
+        {"error": {"message": f"No {kind} found with id '{object_id}'.", "type": "invalid_request_error"}},
+        status=404,
+    )
+
+
+@web.middleware
+async def latency_middleware(request, handler):
+    state, config = _state(request), _state(request).config
+    now = time.monotonic()
+    with state.lock:
+        state.requests += 1
+        if config.rate_limit_rpm:
+            state._window = [started for started in state._window if now - started < 60] + [now]
+            if len(state._window) > config.rate_limit_rpm:
+                state._window.pop()
+                state.rate_limited += 1
+                retry_after = 60 - (now - state._window[0])
+                return web.json_response(
+                    {"error": {"message": "Rate limit reached for requests", "type": "requests",
+                               "code": "rate_limit_exceeded"}},
+                    status=429, headers={"retry-after-ms": str(int(retry_after * 1000))},
+                )
+        if config.error_rate and random.random() < config.error_rate:
+            state.errors += 1
+            return web.json_response(
+                {"error": {"message": "The server had an error while processing your request.", "type": "server_error"}},
+                status=random.choice((500, 503)),
+            )
+    if config.latency:
+        await asyncio.sleep(config.latency)
+    return await handler(request)
+
+
+async def _json(request):
+    if not request.can_read_body:
+        return {}
+    return await request.json()
+
+
+# Assistants
+
+def _assistant(assistant_id, body=None):
+    body = body or {}
+    return {
+        "id": assistant_id, "object": "assistant", "created_at": int(time.time()),
+        "name": body.get("name", "Mock assistant"), "description": None, "model": body.get("model", "gpt-4o"),
+        "instructions": body.get("instructions", ""), "tools": body.get("tools", [{"type": "file_search"}]),
+        "tool_resources": body.get("tool_resources", {}), "metadata": {},
+    }
+
+
+async def create_assistant(request):
+    body = await _json(request)
+    assistant = _assistant(_id("asst"), body)
+    with _state(request).lock:
+        _state(request).assistants[assistant["id"]] = assistant
+    return web.json_response(assistant)
+
+
+async def retrieve_assistant(request):
+    assistant_id = request.match_info["assistant_id"]
+    return web.json_response(_state(request).assistants.get(assistant_id) or _assistant(assistant_id))
+
+
+async def update_assistant(request):
+    assistant_id = request.match_info["assistant_id"]
+    body = await _json(request)
+    with _state(request).lock:
+        assistant = _state(request).assistants.setdefault(assistant_id, _assistant(assistant_id))
+        assistant.update({key: value for key, value in body.items() if key in assistant})
+    return web.json_response(assistant)
+
+
+# Threads and messages
+
+def _thread(thread_id):
+    return {"id": thread_id, "object": "thread", "created_at": int(time.time()), "metadata": {}, "tool_resources": {}}
+
+
+def _message(thread_id, role, content, run_id=None, assistant_id=None):
+    return {
+        "id": _id("msg"), "object": "thread.message", "created_at": int(time.time()), "thread_id": thread_id,
+        "role": role, "content": [{"type": "text", "text": {"value": content, "annotations": []}}],
+        "status": "completed", "assistant_id": assistant_id, "run_id": run_id, "attachments": [], "metadata": {},
+    }
+
+
+def _add_messages(state, thread_id, messages):
+    for message in messages or []:
+        content = message.get("content", "")
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+        state.threads[thread_id]["messages"].append(_message(thread_id, message.get("role", "user"), content))
+
+
+async def create_thread(request):
+    body = await _json(request)
+    thread = _thread(_id("thread"))
+    state = _state(request)
+    with state.lock:
+        state.threads[thread["id"]] = {"thread": thread, "messages": []}
+        _add_messages(state, thread["id"], body.get("messages"))
+    return web.json_response(thread)
+
+
+async def retrieve_thread(request):
+    thread_id = request.match_info["thread_id"]
+    entry = _state(request).threads.get(thread_id)
+    return web.json_response(entry["thread"]) if entry else _not_found("thread", thread_id)
+
+
+async def delete_thread(request):
+    thread_id = request.match_info["thread_id"]
+    with _state(request).lock:
+        _state(request).threads.pop(thread_id, None)
+    return web.json_response({"id": thread_id, "object": "thread.deleted", "deleted": True})
+
+
+async def create_message(request):
+    thread_id = request.match_info["thread_id"]
+    body = await _json(request)
+    state = _state(request)
+    with state.lock:
+        if thread_id not in state.threads:
+            return _not_found("thread", thread_id)
+        _add_messages(state, thread_id, [body])
+        message = state.threads[thread_id]["messages"][-1]
+    return web.json_response(message)
+
+
+async def list_messages(request):
+    thread_id = request.match_info["thread_id"]
+    entry = _state(request).threads.get(thread_id)
+    if entry is None:
+        return _not_found("thread", thread_id)
+    messages = list(reversed(entry["messages"]))
+    if request.query.get("order") == "asc":
+        messages.reverse()
+    return web.json_response({
+        "object": "list", "data": messages, "has_more": False,
+        "first_id": messages[0]["id"] if messages else None, "last_id": messages[-1]["id"] if messages else None,
+    })
+
+
+# Runs
+
+def _run(run_id, thread_id, assistant_id, status, created_at, usage=None):
+    return {
+        "id": run_id, "object": "thread.run", "created_at": created_at, "thread_id": thread_id,
+        "assistant_id": assistant_id, "status": status, "required_action": None, "last_error": None,
+        "expires_at": None, "started_at": created_at, "cancelled_at": None, "failed_at": None,
+        "completed_at": int(time.time()) if status == "completed" else None, "incomplete_details": None,
+        "model": "gpt-4o", "instructions": "", "tools": [{"type": "file_search"}], "metadata": {},
+        "usage": usage, "temperature": 1.0, "top_p": 1.0, "max_prompt_tokens": None,
+        "max_completion_tokens": None, "truncation_strategy": {"type": "auto", "last_messages": None},
+        "response_format": "auto", "tool_choice": "auto", "parallel_tool_calls": True,
+    }
+
+
+def _answer_tokens(count):
+    # Leading spaces make each delta one "token" of readable text
+    return [(" " if index else "") + WORDS[index % len(WORDS)] for index in range(count)]
+
+
+def _usage(state, thread_id, completion_tokens):
+    prompt_tokens = sum(
+        len(block["text"]["value"]) // 4 + 4
+        for message in state.threads.get(thread_id, {}).get("messages", [])
+        for block in message["content"] if block["type"] == "text"
+    )
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _start_run(state, thread_id, body):
+    config = state.config
+    run_id = _id("run")
+    with state.lock:
+        if thread_id not in state.threads:
+            return None
+        _add_messages(state, thread_id, body.get("additional_messages"))
+        state.runs[run_id] = {
+            "thread_id": thread_id, "assistant_id": body.get("assistant_id", "asst_mock"),
+            "created_at": int(time.time()), "started": time.monotonic(), "cancelled": False,
+        }
+    duration = config.run_start + config.ttft + config.response_tokens / max(config.tokens_per_second, 1e-9)
+    state.runs[run_id]["duration"] = duration
+    return run_id
+
+
+def _run_status(state, run_id):
+    run = state.runs[run_id]
+    if run["cancelled"]:
+        return "cancelled"
+    return "completed" if time.monotonic() - run["started"] >= run["duration"] else "in_progress"
+
+
+async def _stream_run(request, state, run_id):
+    """Send a run's events the way the Assistants API does, at the configured pace."""
+    config = state.config
+    run = state.runs[run_id]
+    thread_id, assistant_id, created_at = run["thread_id"], run["assistant_id"], run["created_at"]
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+    await response.prepare(request)
+
+    async def send(event, data):
+        await response.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+
+    with state.lock:
+        state.active_runs += 1
+        state.peak_runs = max(state.peak_runs, state.active_runs)
+    try:
+        await asyncio.sleep(config.run_start)
+        for status, event in (("queued", "thread.run.created"), ("queued", "thread.run.queued"),
+                              ("in_progress", "thread.run.in_progress")):
+            await send(event, _run(run_id, thread_id, assistant_id, status, created_at))
+
+        step_id, message_id = _id("step"), _id("msg")
+        step = {
+            "id": step_id, "object": "thread.run.step", "created_at": int(time.time()), "run_id": run_id,
+            "assistant_id": assistant_id, "thread_id": thread_id, "type": "message_creation",
+            "status": "in_progress", "cancelled_at": None, "completed_at": None, "expired_at": None,
+            "failed_at": None, "last_error": None, "usage": None,
+            "step_details": {"type": "message_creation", "message_creation": {"message_id": message_id}},
+        }
+        await send("thread.run.step.created", step)
+        message = {
+            "id": message_id, "object": "thread.message", "created_at": int(time.time()), "thread_id": thread_id,
+            "role": "assistant", "content": [], "status": "in_progress", "assistant_id": assistant_id,
+            "run_id": run_id, "attachments": [], "metadata": {}, "incomplete_details": None,
+            "completed_at": None, "incomplete_at": None,
+        }
+        await send("thread.message.created", message)
+        await asyncio.sleep(config.ttft)
+
+        content = []
+        for index in range(config.images):
+            file_id = _id("file")
+            with state.lock:
+                state.files[file_id] = {"bytes": len(PNG_PIXEL), "content": PNG_PIXEL, "filename": f"{file_id}.png"}
+            content.append({"type": "image_file", "image_file": {"file_id": file_id, "detail": None}})
+            await send("thread.message.delta", {"id": message_id, "object": "thread.message.delta", "delta": {
+                "content": [{"index": index, "type": "image_file", "image_file": {"file_id": file_id}}]
+            }})
+
+        text_index, tokens, interval = len(content), _answer_tokens(config.response_tokens), 1 / config.tokens_per_second
+        started = time.monotonic()
+        for count, token in enumerate(tokens):
+            if run["cancelled"]:
+                break
+            # Pace against the start time so slow writes do not slow generation down further
+            delay = started + count * interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await send("thread.message.delta", {"id": message_id, "object": "thread.message.delta", "delta": {
+                "content": [{"index": text_index, "type": "text", "text": {"value": token, "annotations": []}}]
+            }})
+
+        text = "".join(tokens)
+        content.append({"type": "text", "text": {"value": text, "annotations": []}})
+        message.update(status="completed", content=content, completed_at=int(time.time()))
+        await send("thread.message.completed", message)
+        with state.lock:
+            state.threads[thread_id]["messages"].append(dict(message))
+        step.update(status="completed", completed_at=int(time.time()))
+        await send("thread.run.step.completed", step)
+        status = "cancelled" if run["cancelled"] else "completed"
+        usage = _usage(state, thread_id, len(tokens))
+        await send(f"thread.run.{status}", _run(run_id, thread_id, assistant_id, status, created_at, usage))
+        await response.write(b"event: done\ndata: [DONE]\n\n")
+    finally:
+        with state.lock:
+            state.active_runs -= 1
+    return response
+
+
+async def create_run(request):
+    thread_id = request.match_info["thread_id"]
+    body = await _json(request)
+    state = _state(request)
+    run_id = _start_run(state, thread_id, body)
+    if run_id is None:
+        return _not_found("thread", thread_id)
+    if body.get("stream"):
+        return await _stream_run(request, state, run_id)
+    run = state.runs[run_id]
+    return web.json_response(_run(run_id, thread_id, run["assistant_id"], "queued", run["created_at"]))
+
+
+async def create_thread_and_run(request):
+    body = await _json(request)
+    state = _state(request)
+    thread = _thread(_id("thread"))
+    with state.lock:
+        state.threads[thread["id"]] = {"thread": thread, "messages": []}
+        _add_messages(state, thread["id"], (body.get("thread") or {}).get("messages"))
+    run_id = _start_run(state, thread["id"], body)
+    if body.get("stream"):
+        return await _stream_run(request, state, run_id)
+    run = state.runs[run_id]
+    return web.json_response(_run(run_id, thread["id"], run["assistant_id"], "queued", run["created_at"]))
+
+
+async def retrieve_run(request):
+    state, run_id = _state(request), request.match_info["run_id"]
+    run = state.runs.get(run_id)
+    if run is None:
+        return _not_found("run", run_id)
+    status = _run_status(state, run_id)
+    usage = _usage(state, run["thread_id"], state.config.response_tokens) if status == "completed" else None
+    return web.json_response(_run(run_id, run["thread_id"], run["assistant_id"], status, run["created_at"], usage))
+
+
+async def cancel_run(request):
+    state, run_id = _state(request), request.match_info["run_id"]
+    run = state.runs.get(run_id)
+    if run is None:
+        return _not_found("run", run_id)
+    run["cancelled"] = True
+    return web.json_response(_run(run_id, run["thread_id"], run["assistant_id"], "cancelling", run["created_at"]))
+
+
+# Files and uploads
+
+def _file(file_id, filename, size, purpose="assistants"):
+    return {"id": file_id, "object": "file", "bytes": size, "created_at": int(time.time()),
+            "filename": filename, "purpose": purpose, "status": "processed", "status_details": None}
+
+
+async def _read_upload(request, state):
+    """Read a multipart upload at the simulated bandwidth; returns (fields, filename, data)."""
+    reader = await request.multipart()
+    fields, filename, data = {}, "upload", b""
+    async for part in reader:
+        if part.filename:
+            filename, data = part.filename, await part.read()
+        else:
+            fields[part.name] = (await part.read()).decode("utf-8")
+    if state.config.upload_mbps:
+        await asyncio.sleep(len(data) / (state.config.upload_mbps * 1024 * 1024))
+    return fields, filename, data
+
+
+async def create_file(request):
+    state = _state(request)
+    fields, filename, data = await _read_upload(request, state)
+    file_id = _id("file")
+    with state.lock:
+        state.files[file_id] = {"bytes": len(data), "content": data, "filename": filename}
+    return web.json_response(_file(file_id, filename, len(data), fields.get("purpose", "assistants")))
+
+
+async def file_content(request):
+    file = _state(request).files.get(request.match_info["file_id"])
+    if file is None:
+        return _not_found("file", request.match_info["file_id"])
+    return web.Response(body=file["content"], content_type="application/octet-stream")
+
+
+async def delete_file(request):
+    file_id = request.match_info["file_id"]
+    with _state(request).lock:
+        _state(request).files.pop(file_id, None)
+    return web.json_response({"id": file_id, "object": "file", "deleted": True})
+
+
+async def create_upload(request):
+    body = await _json(request)
+    upload_id = _id("upload")
+    upload = {"id": upload_id, "object": "upload", "bytes": body.get("bytes", 0), "created_at": int(time.time()),
+              "filename": body.get("filename", "upload"), "purpose": body.get("purpose", "assistants"),
+              "status": "pending", "expires_at": int(time.time()) + 3600, "file": None}
+    with _state(request).lock:
+        _state(request).uploads[upload_id] = dict(upload, parts={})
+    return web.json_response(upload)
+
+
+async def add_upload_part(request):
+    state, upload_id = _state(request), request.match_info["upload_id"]
+    if upload_id not in state.uploads:
+        return _not_found("upload", upload_id)
+    fields, filename, data = await _read_upload(request, state)
+    part_id = _id("part")
+    with state.lock:
+        state.uploads[upload_id]["parts"][part_id] = data
+    return web.json_response({"id": part_id, "object": "upload.part", "created_at": int(time.time()),
+                              "upload_id": upload_id})
+
+
+async def complete_upload(request):
+    state, upload_id = _state(request), request.match_info["upload_id"]
+    upload = state.uploads.get(upload_id)
+    if upload is None:
+        return _not_found("upload", upload_id)
+    body = await _json(request)
+    data = b"".join(upload["parts"][part_id] for part_id in body.get("part_ids", []))
+    file_id = _id("file")
+    with state.lock:
+        state.files[file_id] = {"bytes": len(data), "content": data, "filename": upload["filename"]}
+    result = {key: value for key, value in upload.items() if key != "parts"}
+    result.update(status="completed", file=_file(file_id, upload["filename"], len(data), upload["purpose"]))
+    return web.json_response(result)
+
+
+# Vector stores
+
+def _file_counts(state, store_id, file_ids=None):
+    store = state.vector_stores[store_id]
+    now = time.monotonic()
+    ready = [file_id for file_id, done_at in store["files"].items() if file_ids is None or file_id in file_ids]
+    completed = sum(1 for file_id in ready if store["files"][file_id] <= now)
+    return {"in_progress": len(ready) - completed, "completed": completed, "failed": 0, "cancelled": 0,
+            "total": len(ready)}
+
+
+def _vector_store(state, store_id):
+    store = state.vector_stores[store_id]
+    counts = _file_counts(state, store_id)
+    return {"id": store_id, "object": "vector_store", "created_at": store["created_at"], "name": store["name"],
+            "usage_bytes": sum(state.files.get(file_id, {}).get("bytes", 0) for file_id in store["files"]),
+            "file_counts": counts, "status": "in_progress" if counts["in_progress"] else "completed",
+            "expires_after": None, "expires_at": None, "last_active_at": int(time.time()), "metadata": {}}
+
+
+def _attach(state, store_id, file_ids):
+    """Queue files for indexing one after another, like the service's per-store processing."""
+    store = state.vector_stores[store_id]
+    start = max([time.monotonic()] + list(store["files"].values()))
+    for index, file_id in enumerate(file_ids, 1):
+        store["files"][file_id] = start + index * state.config.index_seconds
+
+
+async def create_vector_store(request):
+    body = await _json(request)
+    state, store_id = _state(request), _id("vs")
+    with state.lock:
+        state.vector_stores[store_id] = {"name": body.get("name"), "created_at": int(time.time()), "files": {}}
+        _attach(state, store_id, body.get("file_ids", []))
+        return web.json_response(_vector_store(state, store_id))
+
+
+async def retrieve_vector_store(request):
+    state, store_id = _state(request), request.match_info["vector_store_id"]
+    if store_id not in state.vector_stores:
+        return _not_found("vector store", store_id)
+    with state.lock:
+        return web.json_response(_vector_store(state, store_id))
+
+
+def _vector_store_file(state, store_id, file_id):
+    done = state.vector_stores[store_id]["files"][file_id] <= time.monotonic()
+    return {"id": file_id, "object": "vector_store.file", "created_at": int(time.time()),
+            "vector_store_id": store_id, "status": "completed" if done else "in_progress", "last_error": None,
+            "usage_bytes": state.files.get(file_id, {}).get("bytes", 0), "chunking_strategy": None}
+
+
+async def create_vector_store_file(request):
+    state, store_id = _state(request), request.match_info["vector_store_id"]
+    if store_id not in state.vector_stores:
+        return _not_found("vector store", store_id)
+    body = await _json(request)
+    with state.lock:
+        _attach(state, store_id, [body["file_id"]])
+        return web.json_response(_vector_store_file(state, store_id, body["file_id"]))
+
+
+async def list_vector_store_files(request):
+    state, store_id = _state(request), request.match_info["vector_store_id"]
+    if store_id not in state.vector_stores:
+        return _not_found("vector store", store_id)
+    batch = state.batches.get(request.match_info.get("batch_id"))
+    with state.lock:
+        file_ids = batch["file_ids"] if batch else list(state.vector_stores[store_id]["files"])
+        data = [_vector_store_file(state, store_id, file_id) for file_id in file_ids]
+    return web.json_response({"object": "list", "data": data, "has_more": False,
+                              "first_id": data[0]["id"] if data else None, "last_id": data[-1]["id"] if data else None})
+
+
+async def delete_vector_store_file(request):
+    state, store_id, file_id = _state(request), request.match_info["vector_store_id"], request.match_info["file_id"]
+    with state.lock:
+        state.vector_stores.get(store_id, {"files": {}})["files"].pop(file_id, None)
+    return web.json_response({"id": file_id, "object": "vector_store.file.deleted", "deleted": True})
+
+
+def _batch(state, batch_id):
+    batch = state.batches[batch_id]
+    counts = _file_counts(state, batch["vector_store_id"], set(batch["file_ids"]))
+    return {"id": batch_id, "object": "vector_store.files_batch", "created_at": batch["created_at"],
+            "vector_store_id": batch["vector_store_id"], "file_counts": counts,
+            "status": "in_progress" if counts["in_progress"] else "completed"}
+
+
+def _batch_response(state, batch_id):
+    return web.json_response(_batch(state, batch_id), headers={"openai-poll-after-ms": str(state.config.poll_after_ms)})
+
+
+async def create_file_batch(request):
+    state, store_id = _state(request), request.match_info["vector_store_id"]
+    if store_id not in state.vector_stores:
+        return _not_found("vector store", store_id)
+    body = await _json(request)
+    batch_id = _id("vsfb")
+    with state.lock:
+        _attach(state, store_id, body.get("file_ids", []))
+        state.batches[batch_id] = {"vector_store_id": store_id, "file_ids": list(body.get("file_ids", [])),
+                                   "created_at": int(time.time())}
+        return _batch_response(state, batch_id)
+
+
+async def retrieve_file_batch(request):
+    state, batch_id = _state(request), request.match_info["batch_id"]
+    if batch_id not in state.batches:
+        return _not_found("file batch", batch_id)
+    with state.lock:
+        return _batch_response(state, batch_id)
+
+
+# Chat completions and embeddings
+
+async def chat_completion(request):
+    body = await _json(request)
+    config = _state(request).config
+    tokens = _answer_tokens(min(body.get("max_tokens") or 80, 80))
+    await asyncio.sleep(config.ttft + len(tokens) / config.tokens_per_second)
+    return web.json_response({
+        "id": _id("chatcmpl"), "object": "chat.completion", "created": int(time.time()),
+        "model": body.get("model", "gpt-4o-mini"),
+        "choices": [{"index": 0, "finish_reason": "stop", "logprobs": None,
+                     "message": {"role": "assistant", "content": "- " + "".join(tokens), "refusal": None}}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+    })
+
+
+async def create_embedding(request):
+    body = await _json(request)
+    inputs = body.get("input")
+    inputs = [inputs] if isinstance(inputs, str) else inputs or []
+    data = []
+    for index, text in enumerate(inputs):
+        # Deterministic vector, so equal texts embed identically
+        seed = sum(ord(char) * (position + 1) for position, char in enumerate(str(text)[:256]))
+        vector = [((seed * (dimension + 7)) % 1000) / 1000 - 0.5 for dimension in range(16)]
+        data.append({"object": "embedding", "index": index, "embedding": vector})
+    return web.json_response({"object": "list", "data": data, "model": body.get("model", "text-embedding-3-small"),
+                              "usage": {"prompt_tokens": 0, "total_tokens": 0}})
+
+
+async def mock_stats(request):
+    return web.json_response(dict(_state(request).stats(), config=asdict(_state(request).config)))
+
+
+def create_app(config=None):
+    """Build the mock API application."""
+    app = web.Application(middlewares=[latency_middleware], client_max_size=512 * 1024 * 1024)
+    app[state_key] = MockState(config or MockConfig())
+    routes = [
+        ("POST", "/v1/assistants", create_assistant),
+        ("GET", "/v1/assistants/{assistant_id}", retrieve_assistant),
+        ("POST", "/v1/assistants/{assistant_id}", update_assistant),
+        ("POST", "/v1/threads", create_thread),
+        ("POST", "/v1/threads/runs", create_thread_and_run),
+        ("GET", "/v1/threads/{thread_id}", retrieve_thread),
+        ("DELETE", "/v1/threads/{thread_id}", delete_thread),
+        ("POST", "/v1/threads/{thread_id}/messages", create_message),
+        ("GET", "/v1/threads/{thread_id}/messages", list_messages),
+        ("POST", "/v1/threads/{thread_id}/runs", create_run),
+        ("GET", "/v1/threads/{thread_id}/runs/{run_id}", retrieve_run),
+        ("POST", "/v1/threads/{thread_id}/runs/{run_id}/cancel", cancel_run),
+        ("POST", "/v1/files", create_file),
+        ("GET", "/v1/files/{file_id}/content", file_content),
+        ("DELETE", "/v1/files/{file_id}", delete_file),
+        ("POST", "/v1/uploads", create_upload),
+        ("POST", "/v1/uploads/{upload_id}/parts", add_upload_part),
+        ("POST", "/v1/uploads/{upload_id}/complete", complete_upload),
+        ("POST", "/v1/vector_stores", create_vector_store),
+        ("GET", "/v1/vector_stores/{vector_store_id}", retrieve_vector_store),
+        ("POST", "/v1/vector_stores/{vector_store_id}/files", create_vector_store_file),
+        ("GET", "/v1/vector_stores/{vector_store_id}/files", list_vector_store_files),
+        ("DELETE", "/v1/vector_stores/{vector_store_id}/files/{file_id}", delete_vector_store_file),
+        ("POST", "/v1/vector_stores/{vector_store_id}/file_batches", create_file_batch),
+        ("GET", "/v1/vector_stores/{vector_store_id}/file_batches/{batch_id}", retrieve_file_batch),
+        ("GET", "/v1/vector_stores/{vector_store_id}/file_batches/{batch_id}/files", list_vector_store_files),
+        ("POST", "/v1/chat/completions", chat_completion),
+        ("POST", "/v1/embeddings", create_embedding),
+        ("GET", "/mock/stats", mock_stats),
+    ]
+    for method, path, handler in routes:
+        app.router.add_route(method, path, handler)
+    return app
+
+
+class MockServer:
+    """Run the mock API on a background event loop, e.g. inside a benchmark process."""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.app = create_app(config)
+        self.host = host
+        self.port = port
+        self._loop = None
+        self._runner = None
+        self._ready = threading.Event()
+
+    @property
+    def state(self):
+        return self.app[state_key]
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._runner = web.AppRunner(self.app, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        self.port = self._runner.addresses[0][1]
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def start(self):
+        threading.Thread(target=self._serve, name="mock-openai", daemon=True).start()
+        self._ready.wait(10)
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI Assistants API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    defaults = MockConfig()
+    for name, value in asdict(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+    config = MockConfig(**{name: getattr(args, name) for name in asdict(defaults)})
+    print(f"Mock OpenAI API on http://{args.host}:{args.port}/v1 ({asdict(config)})")
+    web.run_app(create_app(config), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/bin/sh
+# Run STREAMLIT_WORKERS Streamlit processes behind nginx with sticky sessions.
+#
+# Every worker shares CACHE_DIR (conversations, response cache, email jobs,
+# digests, images), so any worker can serve any conversation.
+set -eu
+
+cd "$(dirname "$0")/.."
+
+WORKERS="${STREAMLIT_WORKERS:-$(nproc)}"
+BASE_PORT="${STREAMLIT_BASE_PORT:-8600}"
+METRICS_BASE_PORT="${METRICS_BASE_PORT:-9464}"
+PORT="${PORT:-8501}"
+export CACHE_DIR="${CACHE_DIR:-$(pwd)/.cache}"
+mkdir -p "$CACHE_DIR"
+
+servers=""
+upstreams=""
+routes=""
+addresses=""
+i=0
+while [ "$i" -lt "$WORKERS" ]; do
+    port=$((BASE_PORT + i))
+    metrics_port=$((METRICS_BASE_PORT + i))
+    # Restart a worker if it exits; its sessions reconnect to it through nginx
+    (
+        while true; do
+            METRICS_PORT="$metrics_port" streamlit run src/app.py \
+                --server.port="$port" \
+                --server.address=127.0.0.1 \
+                --server.headless=true || true
+            echo "Streamlit worker on port $port exited; restarting" >&2
+            sleep 1
+        done
+    ) &
+    servers="${servers}        server 127.0.0.1:${port} max_fails=3 fail_timeout=10s;\n"
+    upstreams="${upstreams}    upstream worker${i} {\n        server 127.0.0.1:${port};\n    }\n"
+    routes="${routes}        ${i} worker${i};\n"
+    addresses="${addresses}        127.0.0.1:${port} ${i};\n"
+    i=$((i + 1))
+done
+
+conf=/tmp/nginx.conf
+servers=$(printf '%b' "$servers")
+upstreams=$(printf '%b' "$upstreams")
+routes=$(printf '%b' "$routes")
+addresses=$(printf '%b' "$addresses")
+awk -v port="$PORT" -v servers="$servers" -v upstreams="$upstreams" -v routes="$routes" -v addresses="$addresses" \
+    '{
+        gsub(/\{\{PORT\}\}/, port); gsub(/\{\{SERVERS\}\}/, servers)
+        gsub(/\{\{WORKER_UPSTREAMS\}\}/, upstreams); gsub(/\{\{ROUTES\}\}/, routes)
+        gsub(/\{\{ADDRESSES\}\}/, addresses); print
+    }' \
+    deploy/nginx.conf.template > "$conf"
+
+echo "Serving $WORKERS Streamlit workers on port $PORT" >&2
+trap 'kill 0' INT TERM
+nginx -c "$conf" -g 'daemon off;' &
+wait
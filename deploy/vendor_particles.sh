@@ -0,0 +1,21 @@
+#!/bin/sh
+# Download particles.js into the background component so it loads without the CDN.
+#
+# Run once per checkout (the Docker build runs it too). An existing copy is kept,
+# so an image built from a checkout that already has it needs no network access.
+set -eu
+
+cd "$(dirname "$0")/.."
+
+URL="https://cdnjs.cloudflare.com/ajax/libs/particles.js/2.0.0/particles.min.js"
+TARGET="src/particles/frontend/particles.min.js"
+
+if [ -s "$TARGET" ]; then
+    echo "$TARGET is already vendored"
+    exit 0
+fi
+
+trap 'rm -f "$TARGET.tmp"' EXIT
+curl -fsSL --retry 3 "$URL" -o "$TARGET.tmp"
+mv "$TARGET.tmp" "$TARGET"
+echo "Vendored particles.js into $TARGET"
@@ -0,0 +1,322 @@
+"""
+Headless HTTP API for the assistant, independent of the Streamlit UI.
+
+Endpoints:
+    GET  /health                        liveness check
+    GET  /metrics                       phase timings and stats (Prometheus text format)
+    POST /v1/query                      {"query", "thread_id"?} -> the complete answer
+    POST /v1/stream                     {"query", "thread_id"?} -> Server-Sent Events
+    POST /v1/email                      {"email", "query"} -> queued email job
+    GET  /v1/email/{job_id}             email job status
+    POST /v1/vector-store/sync          {"directory"?, "vector_store_id"?, "preprocess"?} -> sync job
+    GET  /v1/vector-store/sync/{job_id} sync job status
+
+Run it with ``cd src && python api.py`` (API_HOST, API_PORT). When API_KEY is set,
+requests must send ``Authorization: Bearer <API_KEY>``.
+"""
+import os
+import hmac
+import json
+import time
+import uuid
+import asyncio
+import logging
+import argparse
+import contextlib
+from aiohttp import web
+from dotenv import load_dotenv
+from service.ai_service import AIAssistantManager
+from service.async_ai_service import AsyncAIAssistantManager
+from service.client import client_stats, get_async_client, operation_timeout
+from service.email_queue import get_email_queue
+from service.metrics import CONTENT_TYPE, Trace, get_metrics
+from service.response_cache import ResponseCache, get_response_cache
+from service.run import StreamResult
+
+
+# Run statuses that end a stream
+TERMINAL_EVENTS = {
+    "thread.run.completed": "completed",
+    "thread.run.failed": "failed",
+    "thread.run.cancelled": "cancelled",
+    "thread.run.expired": "expired",
+    "thread.run.incomplete": "incomplete",
+    "thread.run.requires_action": "requires_action",
+}
+
+manager_key = web.AppKey("manager", AsyncAIAssistantManager)
+sync_jobs_key = web.AppKey("sync_jobs", dict)
+
+
+async def run_events(manager, query, thread_id=None, timeout=None):
+    """
+    Stream a run for ``query`` as ``(event, data)`` pairs.
+
+    Yields "run" once the run exists, "delta" for each text chunk, "image" and
+    "tool" as they appear, and finally "done" with the assembled result.
+    """
+    timeout = timeout or float(os.getenv("API_RUN_TIMEOUT", "120"))
+    turn = Trace("api")
+    started = time.perf_counter()
+    first_token_at = None
+    run_id, status, output_tokens = None, None, None
+    texts, images, tools = [], [], []
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        async with manager.stream_query(query, thread_id=thread_id) as stream:
+            events = stream.__aiter__()
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.__anext__(), max(deadline - loop.time(), 0))
+                except StopAsyncIteration:
+                    break
+                if event.event == "thread.run.created":
+                    run_id, thread_id = event.data.id, event.data.thread_id
+                    turn.record("run_start", time.perf_counter() - started)
+                    yield "run", {"run_id": run_id, "thread_id": thread_id}
+                elif event.event == "thread.message.delta":
+                    for block in event.data.delta.content or []:
+                        if block.type == "text" and block.text and block.text.value:
+                            if first_token_at is None:
+                                first_token_at = time.perf_counter()
+                            texts.append(block.text.value)
+                            yield "delta", {"text": block.text.value}
+                        elif block.type == "image_file" and block.image_file:
+                            images.append(block.image_file.file_id)
+                            yield "image", {"file_id": block.image_file.file_id}
+                elif event.event == "thread.run.step.created" and event.data.type == "tool_calls":
+                    for tool_call in event.data.step_details.tool_calls:
+                        tools.append(tool_call.type)
+                        yield "tool", {"type": tool_call.type}
+                elif event.event in TERMINAL_EVENTS:
+                    status = TERMINAL_EVENTS[event.event]
+                    usage = getattr(event.data, "usage", None)
+                    output_tokens = usage.completion_tokens if usage else None
+    except asyncio.TimeoutError:
+        status = "timeout"
+    except (asyncio.CancelledError, GeneratorExit, ConnectionResetError):
+        # The client went away (or the consumer closed the events early); stop the run
+        # instead of letting it finish unread
+        if run_id and thread_id:
+            await asyncio.shield(_cancel_run(thread_id, run_id))
+        turn.end("disconnected")
+        raise
+    except Exception as e:
+        logging.error(f"Error processing query: {e}")
+        status = "failed"
+    if status == "timeout" and run_id:
+        await _cancel_run(thread_id, run_id)
+    result = StreamResult(
+        text="".join(texts), tool_calls=tools, image_file_ids=images, run_id=run_id, thread_id=thread_id,
+        status=status or "failed", time_to_first_token=first_token_at - started if first_token_at else None,
+        latency=time.perf_counter() - started, output_tokens=output_tokens,
+    )
+    turn.record_run(result)
+    turn.end(result.status)
+    yield "done", {
+        "run_id": result.run_id,
+        "thread_id": result.thread_id,
+        "status": result.status,
+        "text": result.text,
+        "image_file_ids": result.image_file_ids,
+        "tool_calls": result.tool_calls,
+        "time_to_first_token": result.time_to_first_token,
+        "latency": result.latency,
+        "output_tokens": result.output_tokens,
+    }
+
+
+async def _cancel_run(thread_id, run_id):
+    try:
+        await get_async_client().beta.threads.runs.cancel(
+            run_id, thread_id=thread_id, timeout=operation_timeout("default")
+        )
+    except Exception as e:
+        logging.warning(f"Could not cancel run {run_id}: {e}")
+
+
+async def _json_body(request, *required):
+    try:
+        body = await request.json()
+    except (ValueError, UnicodeDecodeError):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "Body must be JSON"}), content_type="application/json")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "Body must be a JSON object"}), content_type="application/json")
+    missing = [name for name in required if not body.get(name)]
+    if missing:
+        raise web.HTTPBadRequest(
+            text=json.dumps({"error": f"Missing field(s): {', '.join(missing)}"}), content_type="application/json"
+        )
+    return body
+
+
+def _cache_scope(manager):
+    return ResponseCache.scope(manager.assistant_id, os.getenv("VECTOR_STORE_ID"), os.getenv("VECTOR_STORE_VERSION"))
+
+
+@web.middleware
+async def auth_middleware(request, handler):
+    api_key = os.getenv("API_KEY")
+    if api_key and request.path != "/health":
+        authorization = request.headers.get("Authorization", "").encode("utf-8")
+        if not hmac.compare_digest(authorization, f"Bearer {api_key}".encode("utf-8")):
+            raise web.HTTPUnauthorized(text=json.dumps({"error": "Unauthorized"}), content_type="application/json")
+    return await handler(request)
+
+
+async def health(request):
+    return web.json_response({"status": "ok"})
+
+
+async def metrics(request):
+    """Phase timings and service stats in the Prometheus text format."""
+    body = await asyncio.to_thread(get_metrics().render)
+    return web.Response(body=body.encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+
+async def query(request):
+    """Answer a query and return the complete result."""
+    body = await _json_body(request, "query")
+    manager = request.app[manager_key]
+    thread_id = body.get("thread_id")
+
+    # Opening questions do not depend on earlier turns and share the UI's response cache
+    if not thread_id:
+        cached = await asyncio.to_thread(get_response_cache().get, body["query"], _cache_scope(manager))
+        if cached:
+            return web.json_response({
+                "status": "completed", "text": cached["response"], "image_file_ids": cached["images"],
+                "thread_id": None, "run_id": None, "cached": True,
+            })
+
+    result = None
+    async for event, data in run_events(manager, body["query"], thread_id=thread_id):
+        if event == "done":
+            result = data
+    if not thread_id and result["status"] == "completed" and result["text"]:
+        await asyncio.to_thread(
+            get_response_cache().put, body["query"], _cache_scope(manager), result["text"], result["image_file_ids"]
+        )
+    return web.json_response(dict(result, cached=False), status=200 if result["status"] == "completed" else 502)
+
+
+async def stream(request):
+    """Answer a query as Server-Sent Events: run, delta, image, tool and done."""
+    body = await _json_body(request, "query")
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    await response.prepare(request)
+    events = run_events(request.app[manager_key], body["query"], thread_id=body.get("thread_id"))
+    try:
+        # A failed write closes the events right away, which cancels the run and ends its trace
+        async with contextlib.aclosing(events):
+            async for event, data in events:
+                await response.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+    except ConnectionResetError:
+        logging.info("Client disconnected from the event stream")
+        return response
+    await response.write_eof()
+    return response
+
+
+async def submit_email(request):
+    """Queue an email report; it is answered and sent by the email workers."""
+    body = await _json_body(request, "email", "query")
+    job_id = await asyncio.to_thread(get_email_queue().submit, body["email"], body["query"])
+    return web.json_response({"job_id": job_id, "status": "queued"}, status=202)
+
+
+async def email_status(request):
+    job = await asyncio.to_thread(get_email_queue().status, request.match_info["job_id"])
+    if job is None:
+        raise web.HTTPNotFound(text=json.dumps({"error": "Unknown job"}), content_type="application/json")
+    return web.json_response(job)
+
+
+async def _run_sync_job(job, directory, vector_store_id, preprocess):
+    try:
+        job["vector_store_id"] = await asyncio.to_thread(
+            AIAssistantManager.sync_vector_store, vector_store_id, directory, None, preprocess
+        )
+        job["status"] = "completed" if job["vector_store_id"] else "failed"
+    except Exception as e:
+        logging.error(f"Vector store sync job {job['id']} failed: {e}")
+        job["status"] = "failed"
+    job["finished_at"] = time.time()
+
+
+def _prune_sync_jobs(jobs):
+    """Forget sync jobs that finished more than API_SYNC_JOB_TTL seconds ago."""
+    expired = time.time() - float(os.getenv("API_SYNC_JOB_TTL", "3600"))
+    for job_id in [job_id for job_id, job in jobs.items() if job["finished_at"] and job["finished_at"] < expired]:
+        del jobs[job_id]
+
+
+async def submit_sync(request):
+    """Start an incremental vector store sync of a directory under API_DATA_DIR."""
+    body = await _json_body(request)
+    _prune_sync_jobs(request.app[sync_jobs_key])
+    root = os.path.abspath(os.getenv("API_DATA_DIR", "data"))
+    directory = os.path.abspath(os.path.join(root, body.get("directory") or ""))
+    if os.path.commonpath([root, directory]) != root:
+        raise web.HTTPBadRequest(
+            text=json.dumps({"error": "directory must be inside API_DATA_DIR"}), content_type="application/json"
+        )
+    vector_store_id = body.get("vector_store_id") or os.getenv("VECTOR_STORE_ID")
+    job = {"id": uuid.uuid4().hex, "status": "running", "directory": directory,
+           "vector_store_id": vector_store_id, "started_at": time.time(), "finished_at": None}
+    request.app[sync_jobs_key][job["id"]] = job
+    job["task"] = asyncio.create_task(_run_sync_job(job, directory, vector_store_id, bool(body.get("preprocess"))))
+    return web.json_response({key: value for key, value in job.items() if key != "task"}, status=202)
+
+
+async def sync_status(request):
+    _prune_sync_jobs(request.app[sync_jobs_key])
+    job = request.app[sync_jobs_key].get(request.match_info["job_id"])
+    if job is None:
+        raise web.HTTPNotFound(text=json.dumps({"error": "Unknown job"}), content_type="application/json")
+    return web.json_response({key: value for key, value in job.items() if key != "task"})
+
+
+async def _startup(app):
+    app[manager_key].prewarm()
+    get_metrics().register_stats("sba_response_cache", lambda: get_response_cache().stats())
+    get_metrics().register_stats("sba_openai_client", client_stats, label="client")
+
+
+async def _cleanup(app):
+    for job in app[sync_jobs_key].values():
+        job["task"].cancel()
+    await app[manager_key].close()
+
+
+def create_app(manager=None):
+    """Build the aiohttp application."""
+    app = web.Application(middlewares=[auth_middleware])
+    app[manager_key] = manager or AsyncAIAssistantManager()
+    app[sync_jobs_key] = {}
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+    app.router.add_post("/v1/query", query)
+    app.router.add_post("/v1/stream", stream)
+    app.router.add_post("/v1/email", submit_email)
+    app.router.add_get("/v1/email/{job_id}", email_status)
+    app.router.add_post("/v1/vector-store/sync", submit_sync)
+    app.router.add_get("/v1/vector-store/sync/{job_id}", sync_status)
+    app.on_startup.append(_startup)
+    app.on_cleanup.append(_cleanup)
+    return app
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Headless assistant API")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8000")))
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port)
@@ -4,23 +4,44 @@ import logging
 import yaml
 import random
 import os
-import base64
 from datetime import datetime
 import time
 import re 
-import tempfile
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from PIL import Image
+from contextlib import nullcontext
 from dotenv import load_dotenv
-from openai import OpenAI
 from service.ai_service import AIAssistantManager
-from service.run import StreamlitEventHandler
-from styles import get_page_styling, get_particles_js, AVATAR_URLS
+from service.client import client_stats
+from service.thread_pool import get_thread_pool
+from service.image_cache import get_image_cache
+from service.response_cache import ResponseCache, get_response_cache
+from service.run import DeltaRenderer, StreamlitEventHandler
+from service.run_waiter import stream_run
+from service.email_queue import get_email_queue
+from service.conversation_store import get_conversation_store
+from service.compaction import ContextBudget, compact_conversation
+from service.digest import get_digest_scheduler
+from service.metrics import Trace, get_metrics
+from service.single_flight import get_single_flight
+from particles import particles
+from styles import get_page_styling, get_particles_js, get_avatar_urls, static_url, STATIC_DIR
 
 SETUP = 'interface'
 
+# Load environment variables
+load_dotenv()
+assistant_id = os.getenv("ASSISTANT_ID")
+vector_store_id = os.getenv("VECTOR_STORE_ID")
+
+# "component" keeps one particles.js iframe mounted across reruns, "inline"
+# re-sends the full page with every run, "off" disables the background
+PARTICLES_MODE = os.getenv("PARTICLES_MODE", "component")
+
+# Messages rendered in full; older ones are paged in on request
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", "20"))
+
+# Limits on how much conversation each run sends to the model
+CONTEXT_BUDGET = ContextBudget.from_env()
+
 # Welcome messages list
 WELCOME_MESSAGES = [
     "Welcome to the Snack Brands Australia Performance Hub! Here, you can explore detailed insights into your operational KPIs, assess plant performance, and find opportunities to enhance efficiency. Let's dive into the data and boost your production success!",
@@ -49,6 +70,61 @@ def display_welcome_banner():
         </div>
     """, unsafe_allow_html=True)
 
+@st.cache_resource
+def load_data(file_path, key):
+    """Parse a layout YAML file once per process"""
+    with open(file_path, "r") as file:
+        data = yaml.safe_load(file)
+        return data[key]
+
+def get_static_base_url():
+    """Base URL the browser reaches the app on, or None when static files are not served"""
+    if os.getenv("STATIC_URL_BASE"):
+        return os.getenv("STATIC_URL_BASE")
+    if not st.get_option("server.enableStaticServing"):
+        return None
+    headers = st.context.headers
+    host = headers.get("X-Forwarded-Host") or headers.get("Host")
+    if not host:
+        return None
+    scheme = headers.get("X-Forwarded-Proto", "http")
+    base_path = st.get_option("server.baseUrlPath").strip("/")
+    return f"{scheme}://{host}/{base_path}" if base_path else f"{scheme}://{host}"
+
+def start_conversation(welcome=False):
+    """Begin a new stored conversation and point the session and URL at it"""
+    store = get_conversation_store()
+    conversation_id = store.create()
+    if welcome:
+        store.append(conversation_id, "assistant", random.choice(WELCOME_MESSAGES))
+    st.query_params["conversation"] = conversation_id
+    st.session_state.conversation_id = conversation_id
+    st.session_state.thread_id = None
+    st.session_state.pending_context = []
+    st.session_state.history_pages_shown = 0
+    st.session_state.history_markdown = {}
+
+def resume_conversation(conversation_id):
+    """Load a stored conversation into the session; returns False if it does not exist"""
+    conversation = get_conversation_store().get(conversation_id) if conversation_id else None
+    if conversation is None:
+        return False
+    st.session_state.conversation_id = conversation_id
+    st.session_state.thread_id = conversation["thread_id"]
+    st.session_state.pending_context = conversation["pending_context"]
+    st.session_state.history_pages_shown = 0
+    st.session_state.history_markdown = {}
+    return True
+
+def add_message(role, content, images=None):
+    """Append a message to the session's conversation"""
+    get_conversation_store().append(st.session_state.conversation_id, role, content, images)
+
+def set_pending_context(messages):
+    """Replace the exchanges still to be added to the thread, persisting them with the conversation"""
+    st.session_state.pending_context = messages
+    get_conversation_store().update(st.session_state.conversation_id, pending_context=messages)
+
 st.set_page_config(
     page_title="Snack Brands Assistant",
     page_icon="✨",
@@ -64,135 +140,135 @@ if "show_animation" not in st.session_state:
     st.session_state.show_animation = True
 if "welcome_shown" not in st.session_state:
     st.session_state.welcome_shown = False
-if "conversation_history" not in st.session_state:
-    welcome_message = random.choice(WELCOME_MESSAGES)
-    st.session_state.conversation_history = [{"role": "assistant", "content": welcome_message}]
-if "thread_id" not in st.session_state:
-    st.session_state.thread_id = None
+if "email_jobs" not in st.session_state:
+    st.session_state.email_jobs = []
+if "compaction_retry_at" not in st.session_state:
+    # Message count per conversation before a failed summary is tried again
+    st.session_state.compaction_retry_at = {}
+if "conversation_id" not in st.session_state:
+    # Conversations are stored server-side; the URL carries the ID so a reload
+    # (or a redeploy) resumes the same conversation
+    if not resume_conversation(st.query_params.get("conversation")):
+        start_conversation(welcome=True)
+if "static_base_url" not in st.session_state:
+    st.session_state.static_base_url = get_static_base_url()
+    st.session_state.avatar_urls = get_avatar_urls(st.session_state.static_base_url)
 
 if st.session_state.show_animation:
-    components.html(get_particles_js(), height=800, scrolling=False)
-
-def load_data(file_path, key):
-    with open(file_path, "r") as file:
-        data = yaml.safe_load(file)
-        return data[key]
-
-def read_gif(file_path):
-    with open(file_path, "rb") as file:
-        contents = file.read()
-    gif = base64.b64encode(contents).decode("utf-8")
-    return gif
-
-# Load environment variables
-load_dotenv()
-assistant_id = os.getenv("ASSISTANT_ID")
-vector_store_id = os.getenv("VECTOR_STORE_ID")
+    if PARTICLES_MODE == "component":
+        particles(height=800)
+    elif PARTICLES_MODE == "inline":
+        components.html(get_particles_js(), height=800, scrolling=False)
+
+# Shown when a run ends in a state other than "completed"
+RUN_STATUS_MESSAGES = {
+    "failed": "Assistant run failed",
+    "cancelled": "Assistant run was cancelled",
+    "expired": "Assistant run expired",
+    "incomplete": "Assistant response was cut short",
+    "requires_action": "Assistant requested an unsupported action",
+    "timeout": "Request timed out",
+}
+
+def render_images(file_ids, turn=None):
+    """Display assistant-generated images, served from the image cache"""
+    span = turn.span if turn is not None and file_ids else lambda phase: nullcontext()
+    with span("image_fetch"):
+        images = get_image_cache().get_many(file_ids)
+    with span("render"):
+        for file_id, image_data in zip(file_ids, images):
+            if image_data is None:
+                st.error(f"Error processing image: {file_id}")
+                continue
+            st.image(image_data, use_column_width=True)
+
+
+# Phases of a turn as shown in the verbose sidebar; run phases count from the run request
+PHASE_LABELS = {
+    "cache_lookup": "Cache lookup",
+    "shared_run": "Shared run",
+    "compaction": "Context compaction",
+    "thread_acquire": "Thread acquisition",
+    "run_start": "Run start",
+    "first_token": "Time to first token",
+    "run": "Run",
+    "image_fetch": "Image fetch",
+    "render": "Render",
+    "total": "Total",
+}
+
+def render_turn_timings(turn):
+    """Show where the last turn spent its time"""
+    lines = [f"⏱️ **Turn timings** ({turn.status})"]
+    lines += [f"- {PHASE_LABELS.get(phase, phase)}: {seconds:.2f} s" for phase, seconds in turn.phases.items()]
+    if turn.tokens_per_second:
+        lines.append(f"- Generation: {turn.tokens_per_second:.0f} tokens/s")
+    st.sidebar.markdown("\n".join(lines))
+
+
+@st.cache_resource
+def start_metrics():
+    """Export phase timings and service stats on the local metrics endpoint, once per process"""
+    metrics = get_metrics()
+    metrics.register_stats("sba_thread_pool", lambda: get_thread_pool().stats())
+    metrics.register_stats("sba_image_cache", lambda: get_image_cache().stats())
+    metrics.register_stats("sba_response_cache", lambda: get_response_cache().stats())
+    metrics.register_stats("sba_single_flight", lambda: get_single_flight().stats())
+    metrics.register_stats("sba_conversations", lambda: get_conversation_store().stats())
+    metrics.register_stats("sba_openai_client", client_stats, label="client")
+    metrics.serve()
+    return metrics
+
+
+def process_query(query, output_area, cacheable=False):
+    """Process a user query and generate response"""
+    # Quick actions and the opening question of a conversation do not depend on
+    # earlier turns, so their answers can be shared through the response cache
+    response_cache = get_response_cache()
+    cache_scope = ResponseCache.scope(assistant_id, vector_store_id, os.getenv("VECTOR_STORE_VERSION"))
+    # Only a run on an empty thread gives an answer free of this conversation's context,
+    # so only such a run may fill the cache or be shared with other sessions
+    fresh = st.session_state.thread_id is None and not st.session_state.pending_context
+    use_cache = cacheable or fresh
+    turn = Trace("ui")
+    flight = None
+    if use_cache:
+        with turn.span("cache_lookup"):
+            cached = response_cache.get(query, cache_scope)
+        if cached:
+            output_area.markdown(cached["response"])
+            render_images(cached["images"], turn)
+            add_shared_answer(query, cached["response"], cached["images"])
+            turn.end("cached")
+            if st.session_state.verbose_logging:
+                st.sidebar.markdown(f"📝 **User Query:** {query}")
+                st.sidebar.markdown("⚡ **Served from response cache**")
+                render_turn_timings(turn)
+            return
+
+        # Sessions asking the same question at the same time share one run
+        if fresh:
+            flight, leader = get_single_flight().join(ResponseCache.key(query, cache_scope))
+            if not leader:
+                if follow_run(query, output_area, flight, turn):
+                    return
+                flight = None
 
-def send_email(to_email, content):
-    """Send email with the specified content"""
-    # Email configuration
-    from_email = "abdia980@gmail.com"
-    subject = "SBA Performance Hub - Your Requested Information"
-    
-    # Create message
-    msg = MIMEMultipart()
-    msg['From'] = from_email
-    msg['To'] = to_email
-    msg['Subject'] = subject
-    
-    # Add body
-    msg.attach(MIMEText(content, 'plain'))
-    
     try:
-        # Create SMTP session
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            password = os.getenv("EMAIL_PASSWORD")
-            if not password:
-                raise ValueError("EMAIL_PASSWORD environment variable is not set")
-            server.login(from_email, password)
-            text = msg.as_string()
-            server.sendmail(from_email, to_email, text)
-            return True
-    except Exception as e:
-        st.error(f"Failed to send email: {str(e)}")
-        return False
+        run_query(query, output_area, turn, flight, response_cache if fresh else None, cache_scope)
+    finally:
+        # Let followers fall back to their own run if this one did not complete
+        get_single_flight().finish(flight)
 
-def wait_for_run_completion(client, thread_id, run_id, timeout=60):
-    """Wait for the assistant's run to complete"""
-    start_time = time.time()
-    while True:
-        run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
-        if run.status == "completed":
-            return True
-        elif run.status == "failed":
-            st.error("Assistant run failed")
-            return False
-        elif time.time() - start_time > timeout:
-            st.error("Request timed out")
-            return False
-        time.sleep(1)
 
-def process_email_query(email, query):
-    """Process email query and send response"""
-    try:
+def run_query(query, output_area, turn, flight=None, response_cache=None, cache_scope=None):
+    """Answer a query with a run on this session's thread"""
+    with turn.span("compaction"):
+        compacted = compact_thread()
+    with turn.span("thread_acquire"):
         thread_id = get_thread_id()
-        if not thread_id:
-            st.sidebar.error("Failed to create thread.")
-            return False
-
-        client = AIAssistantManager.init_client()
-        if not client:
-            st.sidebar.error("Failed to initialize AI client.")
-            return False
-
-        # Create message in thread
-        message = client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=query,
-            timeout=30
-        )
-
-        # Run the assistant
-        run = client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=assistant_id
-        )
-
-        # Wait for completion
-        if not wait_for_run_completion(client, thread_id, run.id):
-            return False
-
-        # Get messages after completion
-        messages = client.beta.threads.messages.list(thread_id=thread_id)
-        latest_response = None
-
-        # Get the latest assistant response
-        for msg in messages.data:
-            if msg.role == "assistant":
-                latest_response = msg.content[0].text.value
-                break
-
-        if not latest_response:
-            st.sidebar.error("No response generated")
-            return False
-
-        # Send email
-        if send_email(email, latest_response):
-            return True
-        return False
-
-    except Exception as e:
-        st.sidebar.error(f"Error processing query: {str(e)}")
-        return False
-
-
-def process_query(query, output_area):
-    """Process a user query and generate response"""
-    thread_id = get_thread_id()
     if not thread_id:
+        turn.end("failed")
         st.error("Failed to create thread.")
         return
 
@@ -201,99 +277,172 @@ def process_query(query, output_area):
     # Log request for verbose mode
     if st.session_state.verbose_logging:
         st.sidebar.markdown(f"📝 **User Query:** {query}")
-        start_time = time.time()
-    
-    # Add message to thread
-    client.beta.threads.messages.create(
-        thread_id=thread_id,
-        role="user",
-        content=query,
-        timeout=30
-    )
-    
-    # Stream response
-    event_handler = StreamlitEventHandler(output_area)
+        if compacted:
+            st.sidebar.markdown(f"🗜️ **Context compacted:** {compacted} messages summarized into a new thread")
+
+    # The query (and any exchanges answered from the cache) is added to the
+    # thread as part of the run request itself
+    additional_messages = st.session_state.pending_context + [{"role": "user", "content": query}]
+
+    # Stream response; the event handler is the only consumer of the stream
+    event_handler = StreamlitEventHandler(output_area, broadcast=flight)
     try:
-        with client.beta.threads.runs.stream(
-            thread_id=thread_id,
-            assistant_id=assistant_id,
-            instructions="",
+        result = stream_run(
+            client, thread_id, assistant_id,
             event_handler=event_handler,
-            timeout=30
-        ) as stream:
-            current_response = ""
-            for delta in stream:
-                if hasattr(delta, 'data') and hasattr(delta.data, 'delta'):
-                    # Process content blocks
-                    content_blocks = getattr(delta.data.delta, 'content', [])
-                    if not content_blocks:
-                        continue  # Skip if no content blocks
-                    
-                    for block in content_blocks:
-                        # Handle text content
-                        if hasattr(block, 'text') and hasattr(block.text, 'value'):
-                            text_chunk = block.text.value
-                            current_response += text_chunk
-                            output_area.markdown(current_response)
-                        
-                        # Handle image content
-                        elif hasattr(block, 'image_file') and block.image_file:
-                            try:
-                                image_file = block.image_file.file_id
-                                if not image_file:
-                                    st.error("Image file ID is missing.")
-                                    continue
-                                
-                                # Fetch and process image
-                                image_data = client.files.content(image_file).read()
-                                temp_file = tempfile.NamedTemporaryFile(delete=False)
-                                temp_file.write(image_data)
-                                temp_file.close()
-                                
-                                # Open and display image
-                                image = Image.open(temp_file.name)
-                                st.image(image, use_column_width=True)
-                            except Exception as e:
-                                st.error(f"Error processing image: {e}")
-                            finally:
-                                # Clean up temporary file
-                                if temp_file:
-                                    os.unlink(temp_file.name)
-                        
-                        # Handle unknown content types
-                        else:
-                            st.warning(f"Unexpected content type: {block.type}")
-
-            # Log response time for verbose mode
-            if st.session_state.verbose_logging:
-                end_time = time.time()
-                response_time = round(end_time - start_time, 2)
-                st.sidebar.markdown(f"⏱️ **Response Time:** {response_time} seconds")
-                st.sidebar.markdown(f"**Response:** {content_blocks}")
-            
-            # Add complete response to conversation history
-            if current_response.strip():
-                st.session_state.conversation_history.append({
-                    "role": "assistant",
-                    "content": current_response.strip()
-                })
+            instructions="",
+            additional_messages=additional_messages,
+            **CONTEXT_BUDGET.run_options(truncate=st.session_state.conversation_id in st.session_state.compaction_retry_at)
+        )
+        turn.record_run(result, event_handler.render_seconds, event_handler.frames_sent)
+        if st.session_state.pending_context:
+            set_pending_context([])
+        if result.status != "completed":
+            st.warning(RUN_STATUS_MESSAGES.get(result.status, f"Assistant run {result.status}"))
+
+        if response_cache is not None and result.status == "completed" and result.text:
+            response_cache.put(query, cache_scope, result.text, result.image_file_ids)
+        # Cached first, so sessions arriving after the flight ends get a cache hit
+        get_single_flight().finish(flight, result)
+
+        # Display images generated by the assistant
+        render_images(result.image_file_ids, turn)
+
+        # Add complete response to conversation history
+        if result.text:
+            add_message("assistant", result.text, result.image_file_ids)
+        turn.end(result.status or "failed")
+
+        # Show where the turn spent its time in verbose mode
+        if st.session_state.verbose_logging:
+            render_turn_timings(turn)
+            st.sidebar.markdown(f"🖼️ **Frames:** {event_handler.frames_sent} sent for {event_handler.deltas_received} deltas")
+            st.sidebar.markdown(f"**Run:** {result.run_id} ({result.status}), tools: {result.tool_calls}, images: {result.image_file_ids}")
+            if flight is not None and flight.subscribers:
+                st.sidebar.markdown(f"🔗 **Shared with** {flight.subscribers} other session(s)")
     except Exception as e:
+        if turn.status is None:
+            turn.end("error")
         st.error(f"An error occurred: {e}")
         if st.session_state.verbose_logging:
             st.sidebar.error(f"An error occurred: {e}")
 
-     
 
+def follow_run(query, output_area, flight, turn):
+    """
+    Render another session's run of the same query as it streams.
+
+    Returns False, leaving the query to be run by this session, if that run
+    does not complete with an answer in time.
+    """
+    renderer = DeltaRenderer(output_area.markdown)
+    try:
+        with turn.span("shared_run"):
+            for chunk in flight.subscribe(get_single_flight().timeout):
+                renderer.append(chunk)
+    except TimeoutError as e:
+        logging.warning(f"{e}; running the query separately")
+        return False
+    result = flight.result
+    if result is None or result.status != "completed" or not result.text:
+        return False
+    output_area.markdown(result.text)
+    render_images(result.image_file_ids, turn)
+    add_shared_answer(query, result.text, result.image_file_ids)
+    turn.end("coalesced")
+    if st.session_state.verbose_logging:
+        st.sidebar.markdown(f"📝 **User Query:** {query}")
+        st.sidebar.markdown(f"🔗 **Answered by a run already in progress** ({result.run_id})")
+        render_turn_timings(turn)
+    return True
+
+
+def add_shared_answer(query, response, images):
+    """Record an answer that was not produced on this session's thread"""
+    # Replayed into the thread with the next run so follow-ups keep their context
+    set_pending_context(st.session_state.pending_context + [
+        {"role": "user", "content": query},
+        {"role": "assistant", "content": response},
+    ])
+    add_message("assistant", response, images)
+
+
+def compact_thread():
+    """
+    Move a conversation that outgrew its context budget onto a fresh thread.
+
+    Returns the number of messages summarized, or 0 if the thread was left as is.
+    """
+    if st.session_state.thread_id is None:
+        return 0
+    compacted = compact_conversation(
+        get_conversation_store(), get_thread_pool(), st.session_state.conversation_id,
+        CONTEXT_BUDGET, st.session_state.compaction_retry_at
+    )
+    if compacted is None:
+        return 0
+    st.session_state.thread_id, st.session_state.pending_context, summarized = compacted
+    return summarized
 
 def get_thread_id():
-    """Get or create thread ID"""
+    """Get a thread ID, taking a pre-created one from the pool if needed"""
     if st.session_state.thread_id is None:
-        st.session_state.thread_id = AIAssistantManager.create_thread()
+        st.session_state.thread_id = get_thread_pool().acquire()
+        if st.session_state.thread_id:
+            get_conversation_store().update(st.session_state.conversation_id, thread_id=st.session_state.thread_id)
     return st.session_state.thread_id
 
+EMAIL_JOB_LABELS = {
+    "queued": "⏳ Queued",
+    "running": "⚙️ Processing",
+    "retrying": "🔁 Retrying",
+    "sent": "✅ Sent",
+    "failed": "❌ Failed",
+}
+
+# Recurring digest schedules offered in the sidebar (cron expressions, server time)
+DIGEST_SCHEDULES = {
+    "Just once, now": None,
+    "Every weekday at 7:00": "0 7 * * 1-5",
+    "Every day at 7:00": "0 7 * * *",
+    "Every Monday at 7:00": "0 7 * * 1",
+}
+
+def render_email_jobs():
+    """Show the status of this session's email requests"""
+    if not st.session_state.email_jobs:
+        return
+    email_queue = get_email_queue()
+    for job_id in st.session_state.email_jobs[-5:]:
+        job = email_queue.status(job_id)
+        if not job:
+            continue
+        label = EMAIL_JOB_LABELS.get(job["status"], job["status"])
+        detail = f" ({job['error']})" if job["status"] == "failed" and job["error"] else ""
+        st.sidebar.markdown(
+            f"<small>{label}: {job['query'][:40]} → {job['email']}{detail}</small>",
+            unsafe_allow_html=True
+        )
+    if st.sidebar.button("Refresh status", key="refresh_email_jobs"):
+        st.rerun()
+
+def render_digest_subscriptions(email):
+    """List the recurring digests of an email address with an unsubscribe button each"""
+    scheduler = get_digest_scheduler()
+    for subscription in scheduler.subscriptions(email):
+        st.sidebar.markdown(
+            f"<small>🗓️ {subscription['query'][:40]} ({subscription['schedule']})</small>",
+            unsafe_allow_html=True
+        )
+        if st.sidebar.button("Unsubscribe", key=f"unsubscribe_{subscription['id']}"):
+            scheduler.unsubscribe(subscription["id"])
+            st.rerun()
+
 def render_sidebar():
     """Render sidebar with enhanced features"""
-    st.sidebar.image("assets/Snack-Brands.png", use_column_width=True)
+    base_url = st.session_state.static_base_url
+    logo = static_url("Snack-Brands.png", base_url) if base_url else os.path.join(STATIC_DIR, "Snack-Brands.png")
+    st.sidebar.image(logo, use_column_width=True)
     
     # Email notification section
     enable_email = st.sidebar.checkbox("📧 Enable Email Notifications", 
@@ -309,15 +458,24 @@ def render_sidebar():
                                          key="email_query",
                                          placeholder="E.g., Daily KPI summary, Weekly efficiency report...")
         
+        schedule = st.sidebar.selectbox("Delivery", list(DIGEST_SCHEDULES.keys()), key="email_schedule")
+
         if st.sidebar.button("Send to Email"):
             if not email or not email_query:
                 st.sidebar.error("Please provide both email and query.")
+            elif DIGEST_SCHEDULES[schedule]:
+                # Subscribers of the same report share one assistant run per delivery
+                get_digest_scheduler().subscribe(email, email_query, DIGEST_SCHEDULES[schedule])
+                st.sidebar.success(f"🗓️ Subscribed: {schedule.lower()}.")
             else:
-                with st.spinner("Processing your request..."):
-                    if process_email_query(email, email_query):
-                        st.sidebar.success("✅ Email sent successfully!")
-                    else:
-                        st.sidebar.error("❌ Failed to process request")
+                # Answered and emailed by background workers; the session is not blocked
+                job_id = get_email_queue().submit(email, email_query)
+                st.session_state.email_jobs.append(job_id)
+                st.sidebar.success("📨 Request queued. We'll email the answer shortly.")
+
+        render_email_jobs()
+        if email:
+            render_digest_subscriptions(email)
     
     
 
@@ -338,12 +496,50 @@ def render_sidebar():
                 if verbose_logging:
                     st.sidebar.markdown("<small>Verbose logging enabled.</small>", unsafe_allow_html=True)
 
+                pool_stats = get_thread_pool().stats()
+                st.sidebar.markdown(
+                    f"<small>Thread pool: {pool_stats['ready']}/{pool_stats['size']} ready, "
+                    f"{pool_stats['hits']} hits, {pool_stats['misses']} misses</small>",
+                    unsafe_allow_html=True
+                )
+
+                cache_stats = get_image_cache().stats()
+                st.sidebar.markdown(
+                    f"<small>Image cache: {cache_stats['hit_rate']:.0%} hit rate, "
+                    f"{cache_stats['memory_bytes'] // 1024} KB in memory, "
+                    f"{cache_stats['memory_evictions'] + cache_stats['disk_evictions']} evictions</small>",
+                    unsafe_allow_html=True
+                )
+
+                store_stats = get_conversation_store().stats()
+                st.sidebar.markdown(
+                    f"<small>Conversations: {store_stats['windows']} in memory "
+                    f"({store_stats['window_messages']} messages), {store_stats['loads']} loaded from disk, "
+                    f"{store_stats['evictions']} evicted</small>",
+                    unsafe_allow_html=True
+                )
+
+                response_stats = get_response_cache().stats()
+                st.sidebar.markdown(
+                    f"<small>Response cache: {response_stats['hit_rate']:.0%} hit rate "
+                    f"({response_stats['hits'] + response_stats['similar_hits']} hits, "
+                    f"{response_stats['misses']} misses, {response_stats['entries']} entries)</small>",
+                    unsafe_allow_html=True
+                )
+
+                for name, stats in client_stats().items():
+                    st.sidebar.markdown(
+                        f"<small>OpenAI pool ({name}): {stats['open_connections']} open, "
+                        f"{stats['idle_connections']} idle, {stats['reused_connections']} reused / "
+                        f"{stats['requests']} requests, {stats['tls_handshakes']} TLS handshakes</small>",
+                        unsafe_allow_html=True
+                    )
+
                 
     # Add refresh button at the top
     if st.sidebar.button("🔄 New Conversation", key="refresh_button",
                         help="Start a new conversation"):
-        st.session_state.conversation_history = []
-        st.session_state.thread_id = None
+        start_conversation()
         st.session_state.welcome_shown = False
         st.rerun()
     
@@ -406,7 +602,73 @@ def render_sidebar():
     
     return None
 
+HISTORY_ROLE_LABELS = {
+    "user": "🧑 **You**",
+    "assistant": "✨ **Assistant**",
+}
+
+def history_page(start, end):
+    """Markdown and image IDs of a page of finalized messages, built once and reused on every rerun"""
+    cache = st.session_state.history_markdown
+    if (start, end) not in cache:
+        messages = get_conversation_store().messages(st.session_state.conversation_id, start, end)
+        markdown = "\n\n---\n\n".join(
+            f"{HISTORY_ROLE_LABELS.get(message['role'], message['role'])}\n\n{message['content']}"
+            for message in messages
+        )
+        cache[(start, end)] = (markdown, [image for message in messages for image in message["images"]])
+    return cache[(start, end)]
+
+def show_earlier_messages():
+    st.session_state.history_pages_shown += 1
+
+def render_history():
+    """
+    Render the conversation history with bounded cost.
+
+    The last HISTORY_WINDOW messages are shown as chat messages. Older ones are
+    grouped into pages of the same size that are only rendered once the user
+    asks for them, each as a single pre-rendered markdown block.
+    """
+    conversation_id = st.session_state.conversation_id
+    store = get_conversation_store()
+    total = store.count(conversation_id)
+    older = max(total - HISTORY_WINDOW, 0)
+    if older:
+        pages = [(start, min(start + HISTORY_WINDOW, older)) for start in range(0, older, HISTORY_WINDOW)]
+        # Drop markdown of pages that no longer exist (the last page grows each turn)
+        for key in set(st.session_state.history_markdown) - set(pages):
+            del st.session_state.history_markdown[key]
+
+        shown = min(st.session_state.history_pages_shown, len(pages))
+        if shown < len(pages):
+            st.button(
+                f"⬆️ Show earlier messages ({pages[len(pages) - shown - 1][1]} more)",
+                key="show_earlier",
+                on_click=show_earlier_messages
+            )
+        for start, end in pages[len(pages) - shown:]:
+            with st.expander(f"Messages {start + 1}–{end}"):
+                markdown, images = history_page(start, end)
+                st.markdown(markdown)
+                render_images(images)
+
+    for message in store.messages(conversation_id, older, total):
+        with st.chat_message(
+            message["role"],
+            avatar=st.session_state.avatar_urls.get(message["role"])
+        ):
+            st.markdown(message["content"])
+            render_images(message.get("images", []))
+
 def main():
+    # Keep spare threads ready so the first query never waits on thread creation
+    get_thread_pool()
+    # Recurring email digests are sent from this process's scheduler thread
+    get_digest_scheduler()
+    # Phase timings and service stats are scraped from METRICS_PORT
+    start_metrics()
+
     # Show welcome animation only once per session
     if not st.session_state.welcome_shown:
         show_welcome_animation()
@@ -415,49 +677,31 @@ def main():
     # Render sidebar and get any quick action query
     quick_action_query = render_sidebar()
     
-    # Apply styling
-    st.markdown(get_page_styling(), unsafe_allow_html=True)
-    
-    # Add particles.js background
-    if st.session_state.show_animation:
-        components.html(get_particles_js(), height=0)
-
     # Display welcome banner
     display_welcome_banner()
     
     # Display conversation history with enhanced styling
-    for message in st.session_state.conversation_history:
-        with st.chat_message(
-            message["role"],
-            avatar=AVATAR_URLS.get(message["role"])
-        ):
-            st.write(message["content"])
+    render_history()
 
     # Process quick action if selected
     if quick_action_query:
-        with st.chat_message("user", avatar=AVATAR_URLS["user"]):
+        with st.chat_message("user", avatar=st.session_state.avatar_urls["user"]):
             st.write(quick_action_query)
         
-        st.session_state.conversation_history.append({
-            "role": "user",
-            "content": quick_action_query
-        })
+        add_message("user", quick_action_query)
         
-        with st.chat_message("assistant", avatar=AVATAR_URLS["assistant"]):
+        with st.chat_message("assistant", avatar=st.session_state.avatar_urls["assistant"]):
             output_area = st.empty()
-            process_query(quick_action_query, output_area)
+            process_query(quick_action_query, output_area, cacheable=True)
 
     # User input
     if user_query := st.chat_input("Enter your query..."):
-        with st.chat_message("user", avatar=AVATAR_URLS["user"]):
+        with st.chat_message("user", avatar=st.session_state.avatar_urls["user"]):
             st.write(user_query)
             
-        st.session_state.conversation_history.append({
-            "role": "user",
-            "content": user_query
-        })
+        add_message("user", user_query)
 
-        with st.chat_message("assistant", avatar=AVATAR_URLS["assistant"]):
+        with st.chat_message("assistant", avatar=st.session_state.avatar_urls["assistant"]):
             output_area = st.empty()
             process_query(user_query, output_area)
 
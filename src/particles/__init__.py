@@ -0,0 +1,20 @@
+import os
+import streamlit.components.v1 as components
+
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend")
+
+# Served by Streamlit's component file handler: the page and particles.json are
+# revalidated, particles.min.js is cached by the browser
+_particles = components.declare_component("particles", path=FRONTEND_DIR)
+
+
+def particles(height=800, key="particles"):
+    """
+    Render the particles.js background.
+
+    The iframe is created on the first run and kept mounted across reruns, so
+    each interaction only sends the component arguments instead of the page.
+    Call it at the same place in the script on every run.
+    """
+    return _particles(height=height, key=key, default=None)
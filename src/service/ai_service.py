@@ -1,24 +1,25 @@
 import os
 import logging
-import openai
 from typing import Dict, List
-from contextlib import ExitStack
+from pathlib import Path
+from service.client import get_client, operation_timeout
+from service.metrics import get_metrics
+from service.run_waiter import stream_run
+from service.scanner import batch_files, scan_files
+from service.vector_sync import VectorStoreSync
 
 
 class AIAssistantManager:
     @staticmethod
     def init_client():
-        """Initialize OpenAI client."""
+        """Return the shared, connection-pooled OpenAI client."""
         try:
-            # Set the OpenAI API key globally
-            openai.api_key = os.getenv("OPENAI_API_KEY")
-            
             # Validate the API key
-            if not openai.api_key:
+            if not os.getenv("OPENAI_API_KEY"):
                 raise ValueError("OpenAI API key is not set. Please configure the 'OPENAI_API_KEY' environment variable.")
             
-            # Return the OpenAI module for further use
-            return openai
+            # The client is created once per process and shared across sessions
+            return get_client()
         except Exception as e:
             logging.error(f"Error initializing OpenAI client: {e}")
             return None
@@ -40,7 +41,7 @@ class AIAssistantManager:
                 instructions=instructions,
                 model=model,
                 tools=tools,
-                timeout=30
+                timeout=operation_timeout("assistants.create")
             )
             logging.info(f"Successfully created AI assistant: {name}")
             return assistant.id
@@ -60,39 +61,62 @@ class AIAssistantManager:
                 raise ValueError(f"Directory not found: {directory}")
 
             # Create the vector store
-            vector_store = client.beta.vector_stores.create(name=vector_name)
-
-            # Upload files from the specified directory
-            file_streams = []
-            supported_formats = [".csv", ".txt", ".json", ".xlsx", ".py", ".docx", ".pdf"]
-            with ExitStack() as stack:
-                for file in os.listdir(directory):
-                    file_path = os.path.join(directory, file)
-
-                    # Check if the file format is supported
-                    if not any(file_path.endswith(fmt) for fmt in supported_formats):
-                        logging.warning(f"Unsupported file format: {file_path}")
-                        continue
-                    try:
-                        file_stream = stack.enter_context(open(file_path, "rb"))
-                        file_streams.append(file_stream)
-                    except Exception as e:
-                        logging.error(f"Error reading file: {file_path} - {e}")
-
-                if not file_streams:
-                    raise ValueError(f"No supported files found in directory: {directory}")
-
-            # Upload files to the vector store
-            file_batch = client.beta.vector_stores.file_batches.upload_and_poll(
-                vector_store_id=vector_store.id,
-                files=file_streams
+            vector_store = client.beta.vector_stores.create(
+                name=vector_name,
+                timeout=operation_timeout("vector_stores.create")
             )
+
+            # Upload files batch by batch; paths are opened by the client only while
+            # each file is being uploaded, so open handles stay bounded
+            uploaded = 0
+            for batch in batch_files(scan_files(directory)):
+                client.beta.vector_stores.file_batches.upload_and_poll(
+                    vector_store_id=vector_store.id,
+                    files=[Path(entry.path) for entry in batch]
+                )
+                uploaded += len(batch)
+
+            if not uploaded:
+                raise ValueError(f"No supported files found in directory: {directory}")
+
             logging.info(f"Successfully created vector store: {vector_name}")
             return vector_store.id
         except Exception as e:
             logging.error(f"Error creating vector store: {e}")
             return None
 
+    @staticmethod
+    def sync_vector_store(vector_store_id=None, directory=None, vector_name=None, preprocess=False):
+        """Incrementally sync a directory into a vector store, creating the store if needed."""
+        client = AIAssistantManager.init_client()
+        try:
+            directory = directory or "data"
+            if not os.path.isdir(directory):
+                raise ValueError(f"Directory not found: {directory}")
+
+            if preprocess:
+                # Convert spreadsheets to compact chunks and sync the staged copy instead
+                from service.preprocess import preprocess_directory
+                staging = os.path.join(
+                    os.getenv("CACHE_DIR", ".cache"), "preprocessed",
+                    os.path.basename(os.path.abspath(directory))
+                )
+                directory = preprocess_directory(directory, staging)
+
+            if not vector_store_id:
+                vector_store = client.beta.vector_stores.create(
+                    name=vector_name or "SBA-Manufacturing-Data",
+                    timeout=operation_timeout("vector_stores.create")
+                )
+                vector_store_id = vector_store.id
+
+            summary = VectorStoreSync(client, vector_store_id, directory).sync()
+            logging.info(f"Successfully synced vector store {vector_store_id}: {summary}")
+            return vector_store_id
+        except Exception as e:
+            logging.error(f"Error syncing vector store: {e}")
+            return None
+
     @staticmethod
     def update_assistant(assistant_id, vector_store_id, tool="file_search"):
         """Update an existing AI assistant with a vector store."""
@@ -103,11 +127,14 @@ class AIAssistantManager:
             if not vector_store_id:
                 raise ValueError("Vector Store ID must be provided.")
 
-            assistant = client.beta.assistants.retrieve(assistant_id)
+            assistant = client.beta.assistants.retrieve(
+                assistant_id, timeout=operation_timeout("assistants.retrieve")
+            )
 
             assistant = client.beta.assistants.update(
                 assistant_id,
                 tool_resources={tool: {"vector_store_ids": [vector_store_id]}},
+                timeout=operation_timeout("assistants.update")
             )
             logging.info(f"Successfully updated AI assistant {assistant_id} with vector store {vector_store_id}.")
             return assistant.id
@@ -120,7 +147,9 @@ class AIAssistantManager:
         """Retrieve metadata for an existing assistant."""
         client = AIAssistantManager.init_client()
         try:
-            assistant = client.beta.assistants.retrieve(assistant_id)
+            assistant = client.beta.assistants.retrieve(
+                assistant_id, timeout=operation_timeout("assistants.retrieve")
+            )
             return assistant
         except Exception as e:
             logging.error(f"Error retrieving assistant: {e}")
@@ -131,25 +160,106 @@ class AIAssistantManager:
         """Create a new thread for conversations."""
         client = AIAssistantManager.init_client()
         try:
-            thread =  client.beta.threads.create(timeout=30)
+            thread = client.beta.threads.create(timeout=operation_timeout("threads.create"))
             return thread.id
         except Exception as e:
             logging.error(f"Error creating thread: {e}")
             return None
 
+    @staticmethod
+    def delete_thread(thread_id):
+        """Delete a thread that is no longer needed."""
+        client = AIAssistantManager.init_client()
+        try:
+            client.beta.threads.delete(thread_id, timeout=operation_timeout("default"))
+            return True
+        except Exception as e:
+            logging.error(f"Error deleting thread {thread_id}: {e}")
+            return False
+
     @staticmethod
     def create_conversation(thread_id, query):
         """Initialize a conversation within a thread."""
         client = AIAssistantManager.init_client()
         try:
-            message = client.beta.threads.messages.create(
-                thread_id=thread_id,
-                role="user",
-                content=query
-            )
+            with get_metrics().time("messages_create"):
+                message = client.beta.threads.messages.create(
+                    thread_id=thread_id,
+                    role="user",
+                    content=query,
+                    timeout=operation_timeout("messages.create")
+                )
             return message
         except Exception as e:
             logging.error(f"Error creating conversation: {e}")
             return None
 
+    @staticmethod
+    def get_file_content(file_id):
+        """Download the raw bytes of a file, such as an assistant-generated image."""
+        client = AIAssistantManager.init_client()
+        try:
+            return client.files.content(file_id, timeout=operation_timeout("files.content")).read()
+        except Exception as e:
+            logging.error(f"Error downloading file {file_id}: {e}")
+            return None
+
+    @staticmethod
+    def create_embedding(text, model="text-embedding-3-small"):
+        """Return the embedding vector of a piece of text."""
+        client = AIAssistantManager.init_client()
+        try:
+            response = client.embeddings.create(
+                input=text, model=model, timeout=operation_timeout("embeddings.create")
+            )
+            return response.data[0].embedding
+        except Exception as e:
+            logging.error(f"Error creating embedding: {e}")
+            return None
+
+    @staticmethod
+    def summarize(text, instructions, model="gpt-4o-mini", max_tokens=500):
+        """Return a chat model's summary of ``text``, or None on failure."""
+        client = AIAssistantManager.init_client()
+        try:
+            response = client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": instructions},
+                    {"role": "user", "content": text},
+                ],
+                max_tokens=max_tokens,
+                timeout=operation_timeout("chat.completions.create"),
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            logging.error(f"Error summarizing text: {e}")
+            return None
+
+    @staticmethod
+    def answer_query(query, thread_id=None, assistant_id=None, timeout=60):
+        """
+        Run a query to completion without any UI.
 
+        Without a ``thread_id``, the query runs on a new thread that is deleted afterwards.
+
+        Returns:
+            The StreamResult of the run, or None if it could not be started.
+        """
+        client = AIAssistantManager.init_client()
+        created = thread_id is None
+        try:
+            thread_id = thread_id or AIAssistantManager.create_thread()
+            if not thread_id:
+                raise ValueError("Failed to create thread.")
+            return stream_run(
+                client, thread_id, assistant_id or os.getenv("ASSISTANT_ID"),
+                additional_messages=[{"role": "user", "content": query}],
+                timeout=timeout
+            )
+        except Exception as e:
+            logging.error(f"Error answering query: {e}")
+            return None
+        finally:
+            if created and thread_id:
+                AIAssistantManager.delete_thread(thread_id)
@@ -0,0 +1,175 @@
+import os
+import asyncio
+import logging
+from service.client import get_async_client, operation_timeout
+from service.metrics import get_metrics
+
+
+class AsyncAIAssistantManager:
+    """Asyncio counterpart of AIAssistantManager built on AsyncOpenAI."""
+
+    def __init__(self, assistant_id=None, spare_threads=None):
+        """
+        Initialize the manager.
+
+        Args:
+            assistant_id: Assistant to run queries against. Defaults to ASSISTANT_ID.
+            spare_threads: Number of empty threads kept ready for new conversations.
+        """
+        self.assistant_id = assistant_id or os.getenv("ASSISTANT_ID")
+        if spare_threads is None:
+            spare_threads = int(os.getenv("ASYNC_SPARE_THREADS", "2"))
+        self.spare_threads = spare_threads
+        self._spares = None
+        self._refill_task = None
+
+    @staticmethod
+    def init_client():
+        """Return the shared AsyncOpenAI client for the running event loop."""
+        try:
+            if not os.getenv("OPENAI_API_KEY"):
+                raise ValueError("OpenAI API key is not set. Please configure the 'OPENAI_API_KEY' environment variable.")
+            return get_async_client()
+        except Exception as e:
+            logging.error(f"Error initializing AsyncOpenAI client: {e}")
+            return None
+
+    async def create_thread(self):
+        """Create a new thread for conversations."""
+        client = self.init_client()
+        try:
+            thread = await client.beta.threads.create(timeout=operation_timeout("threads.create"))
+            return thread.id
+        except Exception as e:
+            logging.error(f"Error creating thread: {e}")
+            return None
+
+    async def delete_thread(self, thread_id):
+        """Delete a thread that is no longer needed."""
+        client = self.init_client()
+        try:
+            await client.beta.threads.delete(thread_id, timeout=operation_timeout("default"))
+            return True
+        except Exception as e:
+            logging.error(f"Error deleting thread {thread_id}: {e}")
+            return False
+
+    async def create_conversation(self, thread_id, query):
+        """Add a user message to an existing thread."""
+        client = self.init_client()
+        try:
+            with get_metrics().time("messages_create"):
+                return await client.beta.threads.messages.create(
+                    thread_id=thread_id,
+                    role="user",
+                    content=query,
+                    timeout=operation_timeout("messages.create")
+                )
+        except Exception as e:
+            logging.error(f"Error creating conversation: {e}")
+            return None
+
+    def _spare_queue(self):
+        if self._spares is None:
+            self._spares = asyncio.Queue()
+        return self._spares
+
+    async def _refill(self):
+        spares = self._spare_queue()
+        missing = self.spare_threads - spares.qsize()
+        if missing <= 0:
+            return
+        # Create the missing threads concurrently rather than one after another
+        thread_ids = await asyncio.gather(*(self.create_thread() for _ in range(missing)))
+        for thread_id in thread_ids:
+            if thread_id:
+                spares.put_nowait(thread_id)
+
+    def prewarm(self):
+        """Start refilling the spare thread pool in the background."""
+        if self.spare_threads <= 0:
+            return None
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.get_running_loop().create_task(self._refill())
+        return self._refill_task
+
+    def take_spare_thread(self):
+        """Return a pre-created thread ID, or None if the pool is empty."""
+        try:
+            thread_id = self._spare_queue().get_nowait()
+        except asyncio.QueueEmpty:
+            thread_id = None
+        self.prewarm()
+        return thread_id
+
+    async def acquire_thread(self):
+        """Return a spare thread ID, creating one only if the pool is empty."""
+        return self.take_spare_thread() or await self.create_thread()
+
+    def stream_query(self, query, thread_id=None, event_handler=None, **run_kwargs):
+        """
+        Start a streaming run for ``query`` with a single API call.
+
+        On an existing thread the user message is sent as ``additional_messages``
+        of the run. Without a thread a spare one is used if available; otherwise
+        the thread, its first message and the run are created together through
+        create-and-run.
+
+        Returns:
+            An AsyncAssistantStreamManager to be used with ``async with``.
+        """
+        client = self.init_client()
+        message = {"role": "user", "content": query}
+        thread_id = thread_id or self.take_spare_thread()
+        if thread_id:
+            return client.beta.threads.runs.stream(
+                thread_id=thread_id,
+                assistant_id=self.assistant_id,
+                additional_messages=[message],
+                event_handler=event_handler,
+                timeout=operation_timeout("runs.stream"),
+                **run_kwargs
+            )
+        return client.beta.threads.create_and_run_stream(
+            assistant_id=self.assistant_id,
+            thread={"messages": [message]},
+            event_handler=event_handler,
+            timeout=operation_timeout("runs.stream"),
+            **run_kwargs
+        )
+
+    async def ask(self, query, thread_id=None, **run_kwargs):
+        """
+        Run ``query`` to completion.
+
+        Returns:
+            A (thread_id, response_text) tuple, or (thread_id, None) on failure.
+        """
+        try:
+            async with self.stream_query(query, thread_id=thread_id, **run_kwargs) as stream:
+                await stream.until_done()
+                thread_id = stream.current_run.thread_id if stream.current_run else thread_id
+                texts = [
+                    block.text.value
+                    for message in await stream.get_final_messages()
+                    for block in message.content
+                    if block.type == "text"
+                ]
+            return thread_id, "\n".join(texts)
+        except Exception as e:
+            logging.error(f"Error processing query: {e}")
+            return thread_id, None
+
+    async def close(self):
+        """Stop refilling and delete spare threads that were never used."""
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        spares = self._spare_queue()
+        unused = []
+        while not spares.empty():
+            unused.append(spares.get_nowait())
+        await asyncio.gather(*(self.delete_thread(thread_id) for thread_id in unused))
@@ -0,0 +1,283 @@
+import os
+import atexit
+import logging
+import asyncio
+import threading
+import weakref
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from service.resilience import AsyncResilientTransport, ResilientTransport, get_call_guard
+
+
+# Per-operation timeouts in seconds. Each can be overridden with an
+# OPENAI_TIMEOUT_<OPERATION> variable, e.g. OPENAI_TIMEOUT_RUNS_STREAM=45.
+DEFAULT_TIMEOUTS = {
+    "default": 30.0,
+    "assistants.create": 30.0,
+    "assistants.retrieve": 15.0,
+    "assistants.update": 30.0,
+    "threads.create": 30.0,
+    "messages.create": 30.0,
+    "messages.list": 30.0,
+    "runs.create": 30.0,
+    "runs.retrieve": 15.0,
+    "runs.stream": 30.0,
+    "files.content": 60.0,
+    "embeddings.create": 15.0,
+    "chat.completions.create": 60.0,
+    "vector_stores.create": 30.0,
+    "vector_stores.upload": 300.0,
+}
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class ClientConfig:
+    """Connection pool settings for the shared OpenAI client."""
+
+    def __init__(self, max_connections=20, max_keepalive_connections=10,
+                 keepalive_expiry=60.0, http2=True, connect_timeout=5.0,
+                 timeouts=None):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.connect_timeout = connect_timeout
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+
+    @classmethod
+    def from_env(cls):
+        """Build the configuration from OPENAI_* environment variables."""
+        timeouts = {}
+        for operation in DEFAULT_TIMEOUTS:
+            env_name = "OPENAI_TIMEOUT_" + operation.upper().replace(".", "_")
+            if os.getenv(env_name):
+                timeouts[operation] = float(os.getenv(env_name))
+        return cls(
+            max_connections=int(os.getenv("OPENAI_POOL_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("OPENAI_POOL_MAX_KEEPALIVE", "10")),
+            keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60")),
+            http2=_env_bool("OPENAI_HTTP2", True),
+            connect_timeout=float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5")),
+            timeouts=timeouts,
+        )
+
+    def limits(self):
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def timeout(self, operation="default"):
+        seconds = self.timeouts.get(operation, self.timeouts["default"])
+        return httpx.Timeout(seconds, connect=self.connect_timeout)
+
+
+class ConnectionStats:
+    """Counts requests, new connections and TLS handshakes via httpcore tracing."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+
+    def _record(self, event_name):
+        with self._lock:
+            if event_name == "connection.connect_tcp.complete":
+                self.new_connections += 1
+            elif event_name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+
+    def trace(self, event_name, info):
+        self._record(event_name)
+
+    async def atrace(self, event_name, info):
+        self._record(event_name)
+
+    def on_request(self, request):
+        """httpx request hook that attaches the tracer to the outgoing request."""
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.trace
+
+    async def on_async_request(self, request):
+        """Async variant of ``on_request`` for httpx.AsyncClient."""
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.atrace
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": max(self.requests - self.new_connections, 0),
+                "tls_handshakes": self.tls_handshakes,
+            }
+
+
+def _pool_counts(transport):
+    """Return (open, idle) connection counts for an httpx transport."""
+    pool = getattr(transport, "_pool", None)
+    connections = list(getattr(pool, "connections", []) or [])
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return len(connections), idle
+
+
+class ClientRegistry:
+    """Process-wide, thread-safe registry of pooled OpenAI clients."""
+
+    def __init__(self, config=None):
+        self._lock = threading.Lock()
+        self._config = config
+        self._clients = {}
+        self._transports = {}
+        self._stats = {}
+        # Async connections are bound to the event loop that opened them
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    @property
+    def config(self):
+        if self._config is None:
+            self._config = ClientConfig.from_env()
+        return self._config
+
+    def _build_transport(self, http2):
+        try:
+            return httpx.HTTPTransport(limits=self.config.limits(), http2=http2)
+        except ImportError:
+            logging.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1.")
+            return httpx.HTTPTransport(limits=self.config.limits(), http2=False)
+
+    def get(self, name="default"):
+        """Return the shared client registered under ``name``, creating it on first use."""
+        client = self._clients.get(name)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(name)
+            if client is None:
+                stats = ConnectionStats()
+                transport = self._build_transport(self.config.http2)
+                # Rate limits, retries and the circuit breaker live in the shared call guard
+                http_client = httpx.Client(
+                    transport=ResilientTransport(transport, get_call_guard()),
+                    timeout=self.config.timeout(),
+                    event_hooks={"request": [stats.on_request]},
+                )
+                client = OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    http_client=http_client,
+                    max_retries=0,
+                    timeout=self.config.timeout(),
+                )
+                self._clients[name] = client
+                self._transports[name] = transport
+                self._stats[name] = stats
+                logging.info(f"Created shared OpenAI client '{name}' (http2={self.config.http2})")
+        return client
+
+    def _build_async_transport(self, http2):
+        try:
+            return httpx.AsyncHTTPTransport(limits=self.config.limits(), http2=http2)
+        except ImportError:
+            logging.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1.")
+            return httpx.AsyncHTTPTransport(limits=self.config.limits(), http2=False)
+
+    def get_async(self, name="default"):
+        """Return the shared AsyncOpenAI client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._async_clients.setdefault(loop, {})
+            entry = clients.get(name)
+            if entry is None:
+                stats = ConnectionStats()
+                transport = self._build_async_transport(self.config.http2)
+                http_client = httpx.AsyncClient(
+                    transport=AsyncResilientTransport(transport, get_call_guard()),
+                    timeout=self.config.timeout(),
+                    event_hooks={"request": [stats.on_async_request]},
+                )
+                client = AsyncOpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    http_client=http_client,
+                    max_retries=0,
+                    timeout=self.config.timeout(),
+                )
+                entry = clients[name] = (client, transport, stats)
+                logging.info(f"Created shared AsyncOpenAI client '{name}' (http2={self.config.http2})")
+        return entry[0]
+
+    def stats(self):
+        """Return connection statistics for every registered client."""
+        with self._lock:
+            entries = [
+                (name, self._transports[name], self._stats[name]) for name in self._clients
+            ]
+            for clients in list(self._async_clients.values()):
+                entries.extend(
+                    (f"{name} (async)", transport, stats)
+                    for name, (client, transport, stats) in clients.items()
+                )
+        result = {}
+        for name, transport, stats in entries:
+            open_connections, idle_connections = _pool_counts(transport)
+            result[name] = dict(
+                stats.snapshot(),
+                open_connections=open_connections,
+                idle_connections=idle_connections,
+            )
+        return result
+
+    async def aclose(self):
+        """Close the async clients bound to the running event loop."""
+        with self._lock:
+            clients = self._async_clients.pop(asyncio.get_running_loop(), {})
+        for client, transport, stats in clients.values():
+            try:
+                await client.close()
+            except Exception as e:
+                logging.error(f"Error closing AsyncOpenAI client: {e}")
+
+    def close(self):
+        """Close every pooled connection. Clients are rebuilt on next use."""
+        with self._lock:
+            clients, self._clients = self._clients, {}
+            self._transports = {}
+            self._stats = {}
+        for client in clients.values():
+            try:
+                client.close()
+            except Exception as e:
+                logging.error(f"Error closing OpenAI client: {e}")
+
+
+registry = ClientRegistry()
+atexit.register(registry.close)
+
+
+def get_client(name="default"):
+    """Return the process-wide pooled OpenAI client."""
+    return registry.get(name)
+
+
+def get_async_client(name="default"):
+    """Return the pooled AsyncOpenAI client for the running event loop."""
+    return registry.get_async(name)
+
+
+def operation_timeout(operation):
+    """Return the configured httpx timeout for an API operation."""
+    return registry.config.timeout(operation)
+
+
+def client_stats():
+    """Return open, idle and reused connection counts per registered client."""
+    return registry.stats()
@@ -0,0 +1,190 @@
+import os
+import re
+import logging
+from service.ai_service import AIAssistantManager
+
+
+# Words, numbers and single punctuation marks, roughly as a BPE tokenizer splits them
+TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+# Tokens added per message for role and formatting
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarize this conversation between a user and a manufacturing KPI assistant so it "
+    "can be continued without the full transcript. Keep every plant, period, metric and "
+    "figure that was asked about or reported, the conclusions reached and any open "
+    "questions. Be concise and use bullet points."
+)
+
+
+def estimate_tokens(text):
+    """
+    Estimate the token count of ``text`` without a tokenizer.
+
+    Letters are counted at about four characters per token, digits at about
+    three and punctuation as one token each: close enough to the OpenAI
+    tokenizers for budgeting, at a fraction of the cost.
+    """
+    tokens = 0
+    for piece in TOKEN_PATTERN.findall(text or ""):
+        if piece[0].isdigit():
+            tokens += -(-len(piece) // 3)
+        elif piece[0].isalpha():
+            tokens += -(-len(piece) // 4)
+        else:
+            tokens += 1
+    return tokens
+
+
+def estimate_message_tokens(messages):
+    """Estimate the prompt tokens of a list of ``{"role", "content"}`` messages."""
+    return sum(estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+class ContextBudget:
+    """How much conversation a thread may carry before runs get slower and costlier."""
+
+    def __init__(self, strategy="summarize", max_tokens=12000, max_turns=20, keep_messages=4,
+                 last_messages=10, max_prompt_tokens=None, summary_model="gpt-4o-mini", summary_tokens=500,
+                 retry_turns=5):
+        """
+        Initialize the budget.
+
+        Args:
+            strategy: "summarize" moves long conversations onto a fresh thread seeded
+                with a summary; "truncate" lets the API drop old messages from each
+                run's prompt; "off" disables both.
+            max_tokens: Estimated thread tokens that trigger a summary.
+            max_turns: User turns in a thread that trigger a summary.
+            keep_messages: Latest messages carried over verbatim into the new thread.
+            last_messages: Messages kept in the prompt by the "truncate" strategy.
+            max_prompt_tokens: Optional hard limit on prompt tokens per run.
+            summary_model: Chat model that writes the summary.
+            summary_tokens: Maximum length of the summary.
+            retry_turns: User turns to wait before trying again after a summary failed;
+                runs are truncated meanwhile.
+        """
+        self.strategy = strategy
+        self.max_tokens = max_tokens
+        self.max_turns = max_turns
+        self.keep_messages = keep_messages
+        self.last_messages = last_messages
+        self.max_prompt_tokens = max_prompt_tokens
+        self.summary_model = summary_model
+        self.summary_tokens = summary_tokens
+        self.retry_turns = retry_turns
+
+    @classmethod
+    def from_env(cls):
+        """Build the budget from CONTEXT_* environment variables."""
+        max_prompt_tokens = os.getenv("CONTEXT_MAX_PROMPT_TOKENS")
+        return cls(
+            strategy=os.getenv("CONTEXT_STRATEGY", "summarize"),
+            max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "12000")),
+            max_turns=int(os.getenv("CONTEXT_MAX_TURNS", "20")),
+            keep_messages=int(os.getenv("CONTEXT_KEEP_MESSAGES", "4")),
+            last_messages=int(os.getenv("CONTEXT_LAST_MESSAGES", "10")),
+            max_prompt_tokens=int(max_prompt_tokens) if max_prompt_tokens else None,
+            summary_model=os.getenv("CONTEXT_SUMMARY_MODEL", "gpt-4o-mini"),
+            summary_tokens=int(os.getenv("CONTEXT_SUMMARY_TOKENS", "500")),
+            retry_turns=int(os.getenv("CONTEXT_RETRY_TURNS", "5")),
+        )
+
+    def run_options(self, truncate=False):
+        """
+        Keyword arguments limiting the prompt of each run.
+
+        ``truncate`` applies the "truncate" strategy's limit regardless of the
+        configured strategy, e.g. while a summary cannot be written.
+        """
+        options = {}
+        if truncate or self.strategy == "truncate":
+            options["truncation_strategy"] = {"type": "last_messages", "last_messages": self.last_messages}
+        if self.max_prompt_tokens:
+            options["max_prompt_tokens"] = self.max_prompt_tokens
+        return options
+
+    def exceeded(self, messages):
+        """Return True if a thread holding ``messages`` should be compacted."""
+        if self.strategy != "summarize" or len(messages) <= self.keep_messages:
+            return False
+        turns = sum(1 for message in messages if message["role"] == "user")
+        return turns > self.max_turns or estimate_message_tokens(messages) > self.max_tokens
+
+
+def summarize_messages(messages, budget, previous_summary=None):
+    """Summarize ``messages`` (and the summary they continue); returns None on failure."""
+    transcript = "\n\n".join(f"{message['role'].upper()}: {message['content']}" for message in messages)
+    if previous_summary:
+        transcript = f"EARLIER SUMMARY:\n{previous_summary}\n\n{transcript}"
+    return AIAssistantManager.summarize(
+        transcript, SUMMARY_INSTRUCTIONS, model=budget.summary_model, max_tokens=budget.summary_tokens
+    )
+
+
+def compact(messages, budget, previous_summary=None):
+    """
+    Plan a fresh thread for a conversation that exceeded its budget.
+
+    Returns:
+        ``(summary, seed_messages)`` where ``seed_messages`` are the summary and
+        the latest ``budget.keep_messages`` messages, to be added to the new
+        thread with its first run; or None if the summary could not be written.
+    """
+    keep = messages[-budget.keep_messages:] if budget.keep_messages else []
+    older = messages[:len(messages) - len(keep)]
+    summary = summarize_messages(older, budget, previous_summary)
+    if not summary:
+        return None
+    seed = [{"role": "user", "content": f"Summary of our conversation so far:\n\n{summary}"}]
+    seed += [{"role": message["role"], "content": message["content"]} for message in keep]
+    logging.info(
+        f"Compacted {len(older)} messages (~{estimate_message_tokens(older)} tokens) "
+        f"into a summary of ~{estimate_tokens(summary)} tokens"
+    )
+    return summary, seed
+
+
+def compact_conversation(store, pool, conversation_id, budget, retry_at):
+    """
+    Move a stored conversation that outgrew ``budget`` onto a fresh thread.
+
+    Older messages are summarized; the summary and the latest messages become
+    the conversation's pending context, added to the new thread with the next
+    run, and the old thread is retired to ``pool``.
+
+    Args:
+        store: ConversationStore holding the conversation.
+        pool: ThreadPool providing the new thread.
+        conversation_id: The conversation; its last stored message is the query being answered.
+        budget: ContextBudget deciding when to compact.
+        retry_at: Dict of conversation ID to the message count before which a failed
+            compaction is not tried again; updated in place.
+
+    Returns:
+        ``(thread_id, seed_messages, summarized)``, or None if the thread was left as is.
+    """
+    conversation = store.get(conversation_id)
+    # The query being answered is already stored; it is sent with the run as usual
+    end = conversation["message_count"] - 1
+    messages = store.messages(conversation_id, conversation["thread_offset"], end)
+    if not budget.exceeded(messages):
+        return None
+    if conversation_id in retry_at and conversation["message_count"] < retry_at[conversation_id]:
+        return None
+    plan = compact(messages, budget, conversation["summary"])
+    thread_id = pool.acquire() if plan else None
+    if not thread_id:
+        # Runs are truncated instead until the next attempt, rather than summarizing on every turn
+        retry_at[conversation_id] = conversation["message_count"] + 2 * budget.retry_turns
+        return None
+    retry_at.pop(conversation_id, None)
+    summary, seed = plan
+    kept = len(seed) - 1
+    store.update(
+        conversation_id, thread_id=thread_id, pending_context=seed, thread_offset=end - kept, summary=summary
+    )
+    if conversation["thread_id"]:
+        pool.retire(conversation["thread_id"])
+    return thread_id, seed, len(messages) - kept
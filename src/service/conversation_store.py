@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    thread_id TEXT,
+    pending_context TEXT NOT NULL DEFAULT '[]',
+    thread_offset INTEGER NOT NULL DEFAULT 0,
+    summary TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conversations_thread ON conversations (thread_id);
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    images TEXT NOT NULL DEFAULT '[]',
+    created_at REAL NOT NULL,
+    PRIMARY KEY (conversation_id, position)
+);
+"""
+
+
+class _Window:
+    """The most recent messages of a conversation; ``offset`` is the position of the first one."""
+
+    __slots__ = ("offset", "messages", "accessed_at")
+
+    def __init__(self, offset, messages):
+        self.offset = offset
+        self.messages = messages
+        self.accessed_at = time.monotonic()
+
+
+class ConversationStore:
+    """
+    Append-only SQLite log of conversations with a bounded in-memory window per conversation.
+
+    Only the last ``window`` messages of recently used conversations are kept in
+    memory; older messages are read from disk on demand and idle windows are
+    evicted, so memory does not grow with session length or session count.
+    """
+
+    def __init__(self, path=None, window=None, idle_ttl=None, max_windows=None):
+        """
+        Initialize the store.
+
+        Args:
+            path: SQLite database file. Defaults to $CACHE_DIR/conversations.sqlite3.
+            window: Messages kept in memory per conversation. Defaults to CONVERSATION_WINDOW.
+            idle_ttl: Seconds after which an unused window is evicted. Defaults to CONVERSATION_IDLE_TTL.
+            max_windows: Maximum windows kept in memory. Defaults to CONVERSATION_MAX_WINDOWS.
+        """
+        self.path = path or os.path.join(os.getenv("CACHE_DIR", ".cache"), "conversations.sqlite3")
+        self.window = int(os.getenv("CONVERSATION_WINDOW", "40")) if window is None else window
+        self.idle_ttl = float(os.getenv("CONVERSATION_IDLE_TTL", "1800")) if idle_ttl is None else idle_ttl
+        self.max_windows = int(os.getenv("CONVERSATION_MAX_WINDOWS", "1000")) if max_windows is None else max_windows
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._windows = OrderedDict()
+        self.loads = 0
+        self.evictions = 0
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _message(row):
+        return {"role": row["role"], "content": row["content"], "images": json.loads(row["images"])}
+
+    def create(self, thread_id=None):
+        """Start a conversation and return its ID."""
+        conversation_id = uuid.uuid4().hex
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO conversations (id, thread_id, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            (conversation_id, thread_id, now, now),
+        )
+        with self._lock:
+            self._windows[conversation_id] = _Window(0, [])
+            self._evict()
+        return conversation_id
+
+    def get(self, conversation_id):
+        """
+        Return a conversation as a dict, or None.
+
+        Besides the thread ID and the pending context it holds ``thread_offset``,
+        the position of the first message carried verbatim by the current thread
+        (earlier ones are only in ``summary``), and ``message_count``.
+        """
+        row = self._connection().execute(
+            "SELECT c.*, (SELECT COUNT(*) FROM messages m WHERE m.conversation_id = c.id) AS message_count "
+            "FROM conversations c WHERE c.id = ?",
+            (conversation_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        conversation = dict(row)
+        conversation["pending_context"] = json.loads(conversation["pending_context"])
+        return conversation
+
+    def find_by_thread(self, thread_id):
+        """Return the ID of the conversation using ``thread_id``, or None."""
+        row = self._connection().execute(
+            "SELECT id FROM conversations WHERE thread_id = ? ORDER BY updated_at DESC LIMIT 1", (thread_id,)
+        ).fetchone()
+        return row["id"] if row else None
+
+    def update(self, conversation_id, thread_id=None, pending_context=None, thread_offset=None, summary=None):
+        """Record the conversation's thread, the context not yet added to it or its compaction state."""
+        assignments, values = ["updated_at = ?"], [time.time()]
+        if thread_id is not None:
+            assignments.append("thread_id = ?")
+            values.append(thread_id)
+        if pending_context is not None:
+            assignments.append("pending_context = ?")
+            values.append(json.dumps(pending_context))
+        if thread_offset is not None:
+            assignments.append("thread_offset = ?")
+            values.append(thread_offset)
+        if summary is not None:
+            assignments.append("summary = ?")
+            values.append(summary)
+        self._connection().execute(
+            f"UPDATE conversations SET {', '.join(assignments)} WHERE id = ?", (*values, conversation_id)
+        )
+
+    def append(self, conversation_id, role, content, images=None):
+        """Append a message and return its position in the conversation."""
+        images = list(images or [])
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            position = connection.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM messages WHERE conversation_id = ?",
+                (conversation_id,),
+            ).fetchone()[0]
+            connection.execute(
+                "INSERT INTO messages (conversation_id, position, role, content, images, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (conversation_id, position, role, content, json.dumps(images), now),
+            )
+            connection.execute("UPDATE conversations SET updated_at = ? WHERE id = ?", (now, conversation_id))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        with self._lock:
+            window = self._windows.get(conversation_id)
+            if window is not None and window.offset + len(window.messages) == position:
+                window.messages.append({"role": role, "content": content, "images": images})
+                overflow = len(window.messages) - self.window
+                if overflow > 0:
+                    del window.messages[:overflow]
+                    window.offset += overflow
+            elif window is not None:
+                # Another process appended meanwhile; reload on next access
+                del self._windows[conversation_id]
+        return position
+
+    def count(self, conversation_id):
+        offset, messages = self.recent(conversation_id)
+        return offset + len(messages)
+
+    def recent(self, conversation_id):
+        """
+        Return ``(offset, messages)``: the in-memory window of the latest messages.
+
+        ``offset`` is the position of the first message in the window, i.e. the
+        number of older messages only available through ``messages``.
+        """
+        # Another worker sharing the database may have appended since the window was loaded
+        count = self._connection().execute(
+            "SELECT COALESCE(MAX(position) + 1, 0) FROM messages WHERE conversation_id = ?", (conversation_id,)
+        ).fetchone()[0]
+        with self._lock:
+            window = self._windows.get(conversation_id)
+            if window is not None and window.offset + len(window.messages) == count:
+                window.accessed_at = time.monotonic()
+                self._windows.move_to_end(conversation_id)
+                return window.offset, list(window.messages)
+
+        rows = self._connection().execute(
+            "SELECT * FROM messages WHERE conversation_id = ? ORDER BY position DESC LIMIT ?",
+            (conversation_id, self.window),
+        ).fetchall()
+        messages = [self._message(row) for row in reversed(rows)]
+        offset = rows[-1]["position"] if rows else 0
+        with self._lock:
+            self.loads += 1
+            self._windows[conversation_id] = _Window(offset, messages)
+            self._evict()
+        return offset, list(messages)
+
+    def messages(self, conversation_id, start, end):
+        """Return the messages at positions ``start`` to ``end`` (exclusive)."""
+        with self._lock:
+            window = self._windows.get(conversation_id)
+            if window is not None and start >= window.offset:
+                return list(window.messages[start - window.offset:end - window.offset])
+        rows = self._connection().execute(
+            "SELECT * FROM messages WHERE conversation_id = ? AND position >= ? AND position < ? ORDER BY position",
+            (conversation_id, start, end),
+        ).fetchall()
+        return [self._message(row) for row in rows]
+
+    def _evict(self):
+        """Drop idle windows and the least recently used ones over ``max_windows``. Caller holds the lock."""
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._windows:
+            conversation_id, window = next(iter(self._windows.items()))
+            if window.accessed_at >= cutoff and len(self._windows) <= self.max_windows:
+                break
+            del self._windows[conversation_id]
+            self.evictions += 1
+
+    def evict_idle(self):
+        with self._lock:
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "windows": len(self._windows),
+                "window_messages": sum(len(window.messages) for window in self._windows.values()),
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_conversation_store():
+    """Return the process-wide conversation store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ConversationStore()
+    return _store
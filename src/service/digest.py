@@ -0,0 +1,363 @@
+import os
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+from collections import defaultdict
+from service import mailer
+from service.ai_service import AIAssistantManager
+from service.response_cache import normalize_query
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS digest_subscriptions (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    query TEXT NOT NULL,
+    normalized_query TEXT NOT NULL,
+    schedule TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_run_minute TEXT,
+    UNIQUE (email, normalized_query, schedule)
+);
+"""
+
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 7 * * *",
+    "@weekdays": "0 7 * * 1-5",
+    "@weekly": "0 7 * * 1",
+    "@monthly": "0 7 1 * *",
+}
+
+# (minimum, maximum) of each cron field
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+# Longest gap between ticks that is caught up on, e.g. after the machine slept
+MAX_CATCH_UP = timedelta(days=1)
+
+# Longest query text used in a digest's email subject
+MAX_SUBJECT_QUERY = 60
+
+
+def digest_subject(query):
+    """Email subject of a digest: the query's first line, whitespace collapsed and truncated."""
+    line = next((line for line in query.splitlines() if line.strip()), "")
+    line = " ".join(line.split())
+    if len(line) > MAX_SUBJECT_QUERY:
+        line = line[:MAX_SUBJECT_QUERY - 3].rstrip() + "..."
+    return f"SBA Performance Hub - {line}" if line else mailer.DEFAULT_SUBJECT
+
+
+class CronSpec:
+    """A five-field cron expression: minute hour day-of-month month day-of-week."""
+
+    def __init__(self, expression):
+        self.expression = CRON_ALIASES.get(expression.strip(), expression.strip())
+        fields = self.expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Invalid cron expression: {expression!r}")
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, CRON_FIELDS)
+        )
+        # Sunday may be written as 0 or 7
+        if 7 in self.weekdays:
+            self.weekdays = (self.weekdays - {7}) | {0}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step = part.split("/", 1)
+                step = int(step)
+            if part == "*":
+                start, end = low, high
+            elif "-" in part:
+                start, end = map(int, part.split("-", 1))
+            else:
+                start = end = int(part)
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"Invalid cron field: {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def matches(self, moment):
+        """Return True if the schedule fires in the minute of ``moment``."""
+        if moment.minute not in self.minutes or moment.hour not in self.hours:
+            return False
+        if moment.month not in self.months:
+            return False
+        day_match = moment.day in self.days
+        weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+        # As in cron, a restricted day-of-month and day-of-week match either one
+        if self._any_day or self._any_weekday:
+            return day_match and weekday_match
+        return day_match or weekday_match
+
+
+class DigestScheduler:
+    """Runs recurring digests, answering each distinct query once per tick for all subscribers."""
+
+    def __init__(self, path=None, answer=None, send_batch=None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            path: SQLite database of subscriptions. Defaults to $CACHE_DIR/digests.sqlite3.
+            answer: Callable(query) returning the response text, or None on failure.
+            send_batch: Callable(recipients, content, subject) delivering the digest.
+        """
+        self.path = path or os.path.join(os.getenv("CACHE_DIR", ".cache"), "digests.sqlite3")
+        self.answer = answer or self._answer
+        self.send_batch = send_batch or mailer.send_batch
+        self._local = threading.local()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._last_tick = None
+        self.runs = 0
+        self.deliveries = 0
+
+    @staticmethod
+    def _answer(query):
+        result = AIAssistantManager.answer_query(query)
+        if result is None or result.status != "completed" or not result.text:
+            return None
+        return result.text
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def subscribe(self, email, query, schedule):
+        """
+        Add a subscription and return its ID; an existing identical subscription's ID
+        is returned instead of adding a duplicate. Invalid schedules raise ValueError.
+        """
+        CronSpec(schedule)
+        subscription_id = uuid.uuid4().hex
+        connection = self._connection()
+        inserted = connection.execute(
+            "INSERT OR IGNORE INTO digest_subscriptions "
+            "(id, email, query, normalized_query, schedule, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (subscription_id, email, query, normalize_query(query), schedule, time.time()),
+        ).rowcount
+        if not inserted:
+            subscription_id = connection.execute(
+                "SELECT id FROM digest_subscriptions WHERE email = ? AND normalized_query = ? AND schedule = ?",
+                (email, normalize_query(query), schedule),
+            ).fetchone()["id"]
+        return subscription_id
+
+    def unsubscribe(self, subscription_id):
+        self._connection().execute("DELETE FROM digest_subscriptions WHERE id = ?", (subscription_id,))
+
+    def subscriptions(self, email=None):
+        """Return subscriptions, optionally only those of one email address."""
+        if email:
+            rows = self._connection().execute(
+                "SELECT * FROM digest_subscriptions WHERE email = ? ORDER BY created_at", (email,)
+            )
+        else:
+            rows = self._connection().execute("SELECT * FROM digest_subscriptions ORDER BY created_at")
+        return [dict(row) for row in rows]
+
+    def _due(self, start, moment):
+        """
+        Return subscriptions due between their last run, or ``start`` if they never ran,
+        and ``moment``, grouped by normalized query as [(row, minute)].
+        """
+        earliest = moment - MAX_CATCH_UP
+        minutes = int((moment - earliest).total_seconds()) // 60
+        latest = {}  # schedule -> latest minute it fired in the catch-up window
+        pending = defaultdict(list)
+        for row in self._connection().execute("SELECT * FROM digest_subscriptions").fetchall():
+            schedule = row["schedule"]
+            if schedule not in latest:
+                try:
+                    spec = CronSpec(schedule)
+                except ValueError as e:
+                    logging.error(f"Skipping digest subscription {row['id']}: {e}")
+                    continue
+                moments = (moment - timedelta(minutes=offset) for offset in range(minutes + 1))
+                latest[schedule] = next((candidate for candidate in moments if spec.matches(candidate)), None)
+            due_at = latest.get(schedule)
+            if due_at is None:
+                continue
+            # Runs that failed left last_run_minute behind, so they are retried here.
+            # A subscription due several times in a missed stretch is sent once, for its latest time
+            if row["last_run_minute"]:
+                since = datetime.strptime(row["last_run_minute"], "%Y-%m-%dT%H:%M") + timedelta(minutes=1)
+            else:
+                since = start
+            if due_at >= since:
+                pending[row["normalized_query"]].append((dict(row), due_at.strftime("%Y-%m-%dT%H:%M")))
+        return pending
+
+    def _claim(self, candidates):
+        """Mark the subscriptions of one query group as run and return those this call claimed."""
+        connection = self._connection()
+        claimed = []
+        # A whole query group is claimed in one transaction, so schedulers of several
+        # processes ticking at once never split its subscribers into separate runs
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for row, minute in candidates:
+                if connection.execute(
+                    "UPDATE digest_subscriptions SET last_run_minute = ? "
+                    "WHERE id = ? AND (last_run_minute IS NULL OR last_run_minute < ?)",
+                    (minute, row["id"], minute),
+                ).rowcount:
+                    claimed.append((row, minute))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return claimed
+
+    def _release(self, claimed):
+        """Undo a claim after a failed run, so the next tick retries it."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for row, minute in claimed:
+                # A subscription that never ran is marked as run up to the minute before
+                previous = row["last_run_minute"] or (
+                    datetime.strptime(minute, "%Y-%m-%dT%H:%M") - timedelta(minutes=1)
+                ).strftime("%Y-%m-%dT%H:%M")
+                connection.execute(
+                    "UPDATE digest_subscriptions SET last_run_minute = ? WHERE id = ? AND last_run_minute = ?",
+                    (previous, row["id"], minute),
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def run_pending(self, moment=None):
+        """
+        Run every digest due at ``moment``, or in a minute since the previous call.
+
+        Minutes skipped because an earlier call ran long are caught up on (up to
+        MAX_CATCH_UP), as are digests whose run or delivery failed. Subscriptions are
+        grouped by normalized query, so N subscribers of the same report cost one
+        assistant run and one batched delivery.
+
+        Returns:
+            Number of distinct queries run.
+        """
+        moment = (moment or datetime.now()).replace(second=0, microsecond=0)
+        with self._lock:
+            previous = self._last_tick
+            self._last_tick = max(moment, previous) if previous else moment
+        start = previous + timedelta(minutes=1) if previous and previous < moment else moment
+        start = max(start, moment - MAX_CATCH_UP)
+
+        runs = 0
+        for candidates in self._due(start, moment).values():
+            # Claimed right before running, so a failure here leaves later groups unclaimed
+            claimed = self._claim(candidates)
+            if not claimed:
+                continue
+            runs += 1
+            query = claimed[0][0]["query"]
+            recipients = [row["email"] for row, _ in claimed]
+            try:
+                content = self.answer(query)
+            except Exception as e:
+                logging.error(f"Error answering digest '{query}': {e}")
+                content = None
+            with self._lock:
+                self.runs += 1
+            if not content:
+                logging.error(f"Digest '{query}' produced no response; retrying {len(recipients)} recipient(s)")
+                self._release(claimed)
+                continue
+            try:
+                refused = self.send_batch(recipients, content, digest_subject(query))
+            except Exception as e:
+                logging.error(f"Error delivering digest '{query}': {e}")
+                self._release(claimed)
+                continue
+            with self._lock:
+                self.deliveries += len(recipients) - len(refused or {})
+            logging.info(f"Delivered digest '{query}' to {len(recipients)} recipient(s)")
+        return runs
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                logging.error(f"Error running digests: {e}")
+            # Wake up at the start of the next minute
+            self._stopped.wait(60 - time.time() % 60 + 0.5)
+
+    def start(self):
+        """Start the background scheduler thread if it is not already running."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="digest-scheduler", daemon=True)
+                self._thread.start()
+
+    def shutdown(self, timeout=5.0):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_digest_scheduler():
+    """Return the process-wide digest scheduler, starting it on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = DigestScheduler()
+    _scheduler.start()
+    return _scheduler
+
+
+if __name__ == "__main__":
+    # python -m service.digest add manager@example.com "Daily KPI summary" "0 7 * * 1-5"
+    import argparse
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Manage and run scheduled KPI digests.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="subscribe an address to a digest")
+    add.add_argument("email")
+    add.add_argument("query")
+    add.add_argument("schedule", help="cron expression or @hourly/@daily/@weekdays/@weekly/@monthly")
+    commands.add_parser("list", help="list subscriptions")
+    commands.add_parser("run", help="run the scheduler in the foreground")
+    args = parser.parse_args()
+
+    scheduler = DigestScheduler()
+    if args.command == "add":
+        print(scheduler.subscribe(args.email, args.query, args.schedule))
+    elif args.command == "list":
+        for subscription in scheduler.subscriptions():
+            print(f"{subscription['id']}  {subscription['schedule']:<15} {subscription['email']:<30} {subscription['query']}")
+    else:
+        scheduler._run()
@@ -0,0 +1,235 @@
+import os
+import time
+import uuid
+import random
+import sqlite3
+import logging
+import threading
+from service import mailer
+from service.ai_service import AIAssistantManager
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS email_jobs (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    query TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    response TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS email_jobs_pending ON email_jobs (status, next_attempt_at);
+"""
+
+# Run statuses that are worth retrying with a fresh run
+TRANSIENT_RUN_STATUSES = frozenset({"failed", "expired", "timeout"})
+
+
+class TransientJobError(Exception):
+    """A job failure that should be retried."""
+
+
+def answer_email_query(query):
+    """Answer ``query`` with the assistant and return the response text."""
+    result = AIAssistantManager.answer_query(query)
+    if result is None or result.status in TRANSIENT_RUN_STATUSES:
+        raise TransientJobError(f"Assistant run {result.status if result else 'could not start'}")
+    if result.status != "completed" or not result.text:
+        raise ValueError(f"No response generated (run {result.status})")
+    return result.text
+
+
+def send_email_report(email, response):
+    """Email ``response`` to ``email``."""
+    try:
+        mailer.send_email(email, response)
+    except Exception as e:
+        if mailer.is_transient_smtp_error(e):
+            raise TransientJobError(str(e)) from e
+        raise
+
+
+class EmailJobQueue:
+    """Persistent queue of email report jobs processed by background worker threads."""
+
+    def __init__(self, path=None, workers=None, max_attempts=None, retry_delay=None,
+                 stale_after=600, answer=None, send=None):
+        """
+        Initialize the queue.
+
+        Args:
+            path: SQLite database file. Defaults to $CACHE_DIR/email_jobs.sqlite3.
+            workers: Number of worker threads. Defaults to EMAIL_WORKERS.
+            max_attempts: Attempts before a job is marked failed. Defaults to EMAIL_MAX_ATTEMPTS.
+            retry_delay: Base delay in seconds of the jittered exponential retry backoff.
+            stale_after: Seconds after which a "running" job is assumed abandoned and requeued.
+                The abandoned run counts as an attempt.
+            answer: Callable(query) returning the response text; raises on failure.
+            send: Callable(email, response) delivering it; raises on failure.
+                The response is stored once answered, so a retry after a failed
+                send only sends again.
+        """
+        self.path = path or os.path.join(os.getenv("CACHE_DIR", ".cache"), "email_jobs.sqlite3")
+        self.workers = int(os.getenv("EMAIL_WORKERS", "2")) if workers is None else workers
+        self.max_attempts = int(os.getenv("EMAIL_MAX_ATTEMPTS", "3")) if max_attempts is None else max_attempts
+        self.retry_delay = float(os.getenv("EMAIL_RETRY_DELAY", "10")) if retry_delay is None else retry_delay
+        self.stale_after = stale_after
+        self.answer = answer or answer_email_query
+        self.send = send or send_email_report
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            columns = {row["name"] for row in connection.execute("PRAGMA table_info(email_jobs)")}
+            if "response" not in columns:
+                # Queues created before responses were stored
+                connection.execute("ALTER TABLE email_jobs ADD COLUMN response TEXT")
+            self._local.connection = connection
+        return connection
+
+    def start(self):
+        """Start the worker threads if they are not already running."""
+        with self._lock:
+            if self._threads or self.workers <= 0:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"email-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, email, query):
+        """Queue a job and return its ID."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO email_jobs (id, email, query, status, created_at, updated_at, next_attempt_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+            (job_id, email, query, now, now, now),
+        )
+        self._wakeup.set()
+        return job_id
+
+    def status(self, job_id):
+        """Return a job as a dict, or None if it does not exist."""
+        row = self._connection().execute(
+            "SELECT id, email, query, status, attempts, error, created_at, updated_at "
+            "FROM email_jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def _claim(self):
+        """Atomically move the next due job to "running" and return it."""
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # Requeue jobs left running by a worker that died; that run used up an attempt
+            stale = now - self.stale_after
+            connection.execute(
+                "UPDATE email_jobs SET status = 'failed', error = 'Abandoned by its worker', updated_at = ? "
+                "WHERE status = 'running' AND updated_at < ? AND attempts >= ?",
+                (now, stale, self.max_attempts),
+            )
+            connection.execute(
+                "UPDATE email_jobs SET status = 'retrying', error = 'Abandoned by its worker' "
+                "WHERE status = 'running' AND updated_at < ?",
+                (stale,),
+            )
+            row = connection.execute(
+                "SELECT * FROM email_jobs WHERE status IN ('queued', 'retrying') AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE email_jobs SET status = 'running', attempts = attempts + 1, updated_at = ? "
+                    "WHERE id = ?",
+                    (now, row["id"]),
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return row
+
+    def _finish(self, job_id, status, error=None, next_attempt_at=None):
+        now = time.time()
+        self._connection().execute(
+            "UPDATE email_jobs SET status = ?, error = ?, updated_at = ?, next_attempt_at = ? WHERE id = ?",
+            (status, error, now, next_attempt_at or now, job_id),
+        )
+
+    def _process(self, job):
+        attempts = job["attempts"] + 1
+        try:
+            response = job["response"]
+            if response is None:
+                response = self.answer(job["query"])
+                self._connection().execute(
+                    "UPDATE email_jobs SET response = ?, updated_at = ? WHERE id = ?",
+                    (response, time.time(), job["id"]),
+                )
+            self.send(job["email"], response)
+            self._finish(job["id"], "sent")
+        except TransientJobError as e:
+            if attempts >= self.max_attempts:
+                self._finish(job["id"], "failed", str(e))
+            else:
+                delay = self.retry_delay * 2 ** (attempts - 1) * random.uniform(0.5, 1.5)
+                logging.warning(f"Email job {job['id']} failed (attempt {attempts}), retrying in {delay:.0f}s: {e}")
+                self._finish(job["id"], "retrying", str(e), time.time() + delay)
+        except Exception as e:
+            logging.error(f"Email job {job['id']} failed: {e}")
+            self._finish(job["id"], "failed", str(e))
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                logging.error(f"Error claiming email job: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(1.0)
+                self._wakeup.clear()
+                continue
+            self._process(job)
+
+    def shutdown(self, timeout=5.0):
+        """Stop the workers; unfinished jobs stay queued for the next start."""
+        self._stopped.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_email_queue():
+    """Return the process-wide email job queue, starting its workers on first use."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = EmailJobQueue()
+    _queue.start()
+    return _queue
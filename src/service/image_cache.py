@@ -0,0 +1,217 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from service.ai_service import AIAssistantManager
+
+
+class ImageCache:
+    """In-memory plus on-disk LRU cache of assistant-generated files keyed by file_id."""
+
+    def __init__(self, directory=None, max_memory_bytes=None, max_disk_bytes=None,
+                 max_workers=4, fetch=None, scan_interval=None):
+        """
+        Initialize the cache.
+
+        Args:
+            directory: Directory for the on-disk tier. Defaults to $CACHE_DIR/images.
+            max_memory_bytes: Size limit of the in-memory tier. Defaults to IMAGE_CACHE_MEMORY_MB.
+            max_disk_bytes: Size limit of the on-disk tier. Defaults to IMAGE_CACHE_DISK_MB.
+            max_workers: Concurrent downloads when fetching several files.
+            fetch: Callable returning the bytes of a file_id (or None on failure).
+            scan_interval: Seconds the measured size of the shared directory is trusted before
+                it is scanned again. Defaults to IMAGE_CACHE_SCAN_INTERVAL.
+        """
+        self.directory = directory or os.path.join(os.getenv("CACHE_DIR", ".cache"), "images")
+        if max_memory_bytes is None:
+            max_memory_bytes = int(float(os.getenv("IMAGE_CACHE_MEMORY_MB", "64")) * 1024 * 1024)
+        if max_disk_bytes is None:
+            max_disk_bytes = int(float(os.getenv("IMAGE_CACHE_DISK_MB", "512")) * 1024 * 1024)
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.max_workers = max_workers
+        self.scan_interval = (
+            float(os.getenv("IMAGE_CACHE_SCAN_INTERVAL", "60")) if scan_interval is None else scan_interval
+        )
+        self._fetch = fetch or AIAssistantManager.get_file_content
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        # Size of the directory at the last scan plus what this process wrote since
+        self._disk_bytes = None
+        self._scanned_at = 0.0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+
+    def _path(self, file_id):
+        return os.path.join(self.directory, hashlib.sha256(file_id.encode("utf-8")).hexdigest())
+
+    def _remember(self, file_id, data):
+        """Store ``data`` in the memory tier, evicting least recently used entries."""
+        if len(data) > self.max_memory_bytes:
+            return
+        with self._lock:
+            if file_id in self._memory:
+                self._memory.move_to_end(file_id)
+                return
+            self._memory[file_id] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+                self.memory_evictions += 1
+
+    def _disk_files(self):
+        """Return ``(mtime, size, path)`` of the cached files, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        with os.scandir(self.directory) as entries:
+            return sorted(
+                (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                for entry in entries if entry.is_file() and not entry.name.endswith(".tmp")
+            )
+
+    def _disk_usage(self):
+        # Measured from the directory, which worker processes share, rather than counted per process
+        return sum(size for _, size, _ in self._disk_files())
+
+    def _read_disk(self, file_id):
+        path = self._path(file_id)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            # Refresh the access time used for LRU eviction
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.warning(f"Error reading cached image {file_id}: {e}")
+            return None
+
+    def _write_disk(self, file_id, data):
+        if len(data) > self.max_disk_bytes:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(file_id)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+            self._evict_disk(len(data))
+        except OSError as e:
+            logging.warning(f"Error caching image {file_id} on disk: {e}")
+
+    def _evict_disk(self, written):
+        """
+        Count ``written`` bytes and delete least recently used files until the disk tier fits its limit.
+
+        The directory is only scanned when the count exceeds the limit or the last scan is
+        older than ``scan_interval``, which bounds how far other workers' writes can
+        push the tier over its limit unnoticed.
+        """
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += written
+                if (self._disk_bytes <= self.max_disk_bytes
+                        and time.monotonic() - self._scanned_at < self.scan_interval):
+                    return
+            files = self._disk_files()
+            total = sum(size for _, size, _ in files)
+            for _, size, path in files:
+                if total <= self.max_disk_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    self.disk_evictions += 1
+                except FileNotFoundError:
+                    # Already evicted by another worker
+                    pass
+                except OSError:
+                    continue
+                total -= size
+            self._disk_bytes = total
+            self._scanned_at = time.monotonic()
+
+    def _lookup(self, file_id):
+        """Return cached bytes from memory or disk, or None."""
+        with self._lock:
+            data = self._memory.get(file_id)
+            if data is not None:
+                self._memory.move_to_end(file_id)
+                self.memory_hits += 1
+                return data
+        data = self._read_disk(file_id)
+        if data is not None:
+            with self._lock:
+                self.disk_hits += 1
+            self._remember(file_id, data)
+        return data
+
+    def _download(self, file_id):
+        with self._lock:
+            self.misses += 1
+        data = self._fetch(file_id)
+        if data is not None:
+            self._remember(file_id, data)
+            self._write_disk(file_id, data)
+        return data
+
+    def get(self, file_id):
+        """Return the bytes of ``file_id``, downloading them on a cache miss."""
+        data = self._lookup(file_id)
+        if data is None:
+            data = self._download(file_id)
+        return data
+
+    def get_many(self, file_ids):
+        """Return bytes for every file_id in order, downloading misses concurrently."""
+        results = {file_id: self._lookup(file_id) for file_id in file_ids}
+        missing = [file_id for file_id, data in results.items() if data is None]
+        if len(missing) == 1:
+            results[missing[0]] = self._download(missing[0])
+        elif missing:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+                for file_id, data in zip(missing, executor.map(self._download, missing)):
+                    results[file_id] = data
+        return [results[file_id] for file_id in file_ids]
+
+    def stats(self):
+        """Return hit, miss, size and eviction counters; ``disk_bytes`` is the last measured size."""
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._disk_usage()
+                self._scanned_at = time.monotonic()
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+                "memory_evictions": self.memory_evictions,
+                "disk_evictions": self.disk_evictions,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_image_cache():
+    """Return the process-wide image cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ImageCache()
+    return _cache
@@ -0,0 +1,249 @@
+import os
+import time
+import atexit
+import socket
+import smtplib
+import threading
+from contextlib import contextmanager
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+
+DEFAULT_SUBJECT = "SBA Performance Hub - Your Requested Information"
+
+# Failures worth retrying: dropped connections, timeouts and 4xx SMTP replies
+TRANSIENT_SMTP_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    ConnectionError,
+    TimeoutError,
+    socket.timeout,
+)
+
+
+def is_transient_smtp_error(error):
+    """Return True if a send failure is likely to succeed when retried."""
+    if isinstance(error, TRANSIENT_SMTP_ERRORS):
+        return True
+    code = getattr(error, "smtp_code", None)
+    return isinstance(code, int) and 400 <= code < 500
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def build_message(from_email, to_email, content, subject=DEFAULT_SUBJECT):
+    """Build a plain-text email message."""
+    msg = MIMEMultipart()
+    msg['From'] = from_email
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(content, 'plain'))
+    return msg
+
+
+class SMTPConfig:
+    """SMTP server and sender settings."""
+
+    def __init__(self, host="smtp.gmail.com", port=587, starttls=True, auth=True,
+                 from_email="abdia980@gmail.com", username=None, password=None, timeout=30.0):
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.auth = auth
+        self.from_email = from_email
+        self.username = username or from_email
+        self.password = password
+        self.timeout = timeout
+
+    @classmethod
+    def from_env(cls):
+        """Build the configuration from SMTP_* and EMAIL_* environment variables."""
+        from_email = os.getenv("EMAIL_FROM", "abdia980@gmail.com")
+        return cls(
+            host=os.getenv("SMTP_HOST", "smtp.gmail.com"),
+            port=int(os.getenv("SMTP_PORT", "587")),
+            starttls=_env_bool("SMTP_STARTTLS", True),
+            auth=_env_bool("SMTP_AUTH", True),
+            from_email=from_email,
+            username=os.getenv("SMTP_USER", from_email),
+            password=os.getenv("EMAIL_PASSWORD"),
+            timeout=float(os.getenv("SMTP_TIMEOUT", "30")),
+        )
+
+
+class SMTPPool:
+    """Bounded pool of authenticated SMTP sessions reused across messages."""
+
+    def __init__(self, config=None, size=None, idle_timeout=None, batch_size=None):
+        """
+        Initialize the pool.
+
+        Args:
+            config: SMTPConfig. Defaults to SMTPConfig.from_env().
+            size: Maximum concurrent connections. Defaults to SMTP_POOL_SIZE.
+            idle_timeout: Seconds an idle session is kept before reconnecting.
+                Defaults to SMTP_IDLE_TIMEOUT; keep it below the server's own timeout.
+            batch_size: Maximum recipients per message in ``send_batch``. Defaults to SMTP_BATCH_SIZE.
+        """
+        self.config = config or SMTPConfig.from_env()
+        self.size = int(os.getenv("SMTP_POOL_SIZE", "2")) if size is None else size
+        self.idle_timeout = float(os.getenv("SMTP_IDLE_TIMEOUT", "60")) if idle_timeout is None else idle_timeout
+        self.batch_size = int(os.getenv("SMTP_BATCH_SIZE", "50")) if batch_size is None else batch_size
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._idle = []  # (server, last_used)
+        self.connections_opened = 0
+        self.messages_sent = 0
+
+    def _connect(self):
+        config = self.config
+        server = smtplib.SMTP(config.host, config.port, timeout=config.timeout)
+        try:
+            if config.starttls:
+                server.starttls()
+            if config.auth:
+                if not config.password:
+                    raise ValueError("EMAIL_PASSWORD environment variable is not set")
+                server.login(config.username, config.password)
+        except Exception:
+            server.close()
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        return server
+
+    @staticmethod
+    def _discard(server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _checkout(self):
+        """Return a live session, reusing an idle one when it is still usable."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used = self._idle.pop()
+            if time.monotonic() - last_used > self.idle_timeout:
+                self._discard(server)
+                continue
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self._discard(server)
+        return self._connect()
+
+    def _checkin(self, server):
+        with self._lock:
+            self._idle.append((server, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        """Borrow an authenticated session; it is returned to the pool unless it failed."""
+        with self._slots:
+            server = self._checkout()
+            try:
+                yield server
+            except BaseException:
+                self._discard(server)
+                raise
+            else:
+                self._checkin(server)
+
+    def _send(self, recipients, message):
+        try:
+            with self.connection() as server:
+                refused = server.sendmail(self.config.from_email, recipients, message)
+        except smtplib.SMTPServerDisconnected:
+            # The pooled session was dropped by the server; retry once on a fresh one
+            with self.connection() as server:
+                refused = server.sendmail(self.config.from_email, recipients, message)
+        with self._lock:
+            self.messages_sent += 1
+        return refused
+
+    def send(self, to_email, content, subject=DEFAULT_SUBJECT):
+        """Send one message to one recipient."""
+        msg = build_message(self.config.from_email, to_email, content, subject)
+        self._send([to_email], msg.as_string())
+        return True
+
+    def send_batch(self, recipients, content, subject=DEFAULT_SUBJECT):
+        """
+        Deliver the same content to many recipients over pooled sessions.
+
+        Recipients are grouped into messages of at most ``batch_size`` envelope
+        recipients. The To header only names the sender, so recipients do not
+        see each other.
+
+        Returns:
+            A dict of refused recipients to the server's (code, message) reply.
+        """
+        recipients = list(dict.fromkeys(recipients))
+        msg = build_message(self.config.from_email, self.config.from_email, content, subject).as_string()
+        refused = {}
+        for start in range(0, len(recipients), max(self.batch_size, 1)):
+            group = recipients[start:start + self.batch_size]
+            try:
+                refused.update(self._send(group, msg))
+            except smtplib.SMTPRecipientsRefused as e:
+                refused.update(e.recipients)
+        return refused
+
+    def stats(self):
+        with self._lock:
+            return {
+                "idle_connections": len(self._idle),
+                "connections_opened": self.connections_opened,
+                "messages_sent": self.messages_sent,
+            }
+
+    def close(self):
+        """Close every idle session."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._discard(server)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_smtp_pool():
+    """Return the process-wide SMTP connection pool."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SMTPPool()
+                atexit.register(_pool.close)
+    return _pool
+
+
+def send_email(to_email, content, subject=DEFAULT_SUBJECT):
+    """
+    Send an email over a pooled SMTP session, raising on failure.
+
+    The server is configured with SMTP_HOST, SMTP_PORT, SMTP_STARTTLS and
+    SMTP_AUTH, and the sender with EMAIL_FROM; point them at a local stand-in
+    such as ``python -m aiosmtpd -n -l localhost:8025`` (with SMTP_STARTTLS and
+    SMTP_AUTH set to false) to send without a real mailbox.
+    """
+    return get_smtp_pool().send(to_email, content, subject)
+
+
+def send_batch(recipients, content, subject=DEFAULT_SUBJECT):
+    """Send the same content to many recipients; returns the refused recipients."""
+    return get_smtp_pool().send_batch(recipients, content, subject)
@@ -0,0 +1,359 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+# Upper bounds of the generation speed buckets, in output tokens per second
+RATE_BUCKETS = (5, 10, 20, 30, 40, 50, 60, 80, 100, 150, 200)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+class Counter:
+    """A monotonically increasing count, optionally split by labels."""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [(f"{self.name}_total", list(zip(self.labels, key)), value) for key, value in values.items()]
+
+
+class Histogram(Counter):
+    """Observations counted into cumulative buckets, with their sum and count."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def value(self, **labels):
+        """Return ``(count, sum)`` of the observations with these labels."""
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return (entry[2], entry[1]) if entry else (0, 0.0)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(buckets), total, count) for key, (buckets, total, count) in self._values.items()}
+        samples = []
+        for key, (buckets, total, count) in values.items():
+            labels = list(zip(self.labels, key))
+            for bound, bucket_count in zip(self.buckets, buckets):
+                samples.append((f"{self.name}_bucket", labels + [("le", _format_value(bound))], bucket_count))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class MetricsRegistry:
+    """Counters, histograms and ``stats()`` snapshots rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labels, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter, name, documentation, labels)
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, documentation, labels, buckets=buckets)
+
+    def register_stats(self, prefix, stats, label=None):
+        """
+        Export the numbers returned by ``stats()`` as gauges named ``<prefix>_<key>``.
+
+        With ``label``, ``stats()`` returns one dict per item (e.g. per client)
+        and the item name becomes that label.
+        """
+        with self._lock:
+            self._stats[prefix] = (stats, label)
+
+    def _stats_families(self):
+        families = {}
+        with self._lock:
+            sources = list(self._stats.items())
+        for prefix, (stats, label) in sources:
+            try:
+                snapshot = stats()
+            except Exception as e:
+                logging.warning(f"Error collecting {prefix} stats: {e}")
+                continue
+            items = snapshot.items() if label else [(None, snapshot)]
+            for item, values in items:
+                for key, value in values.items():
+                    if isinstance(value, (int, float)):
+                        labels = [(label, item)] if label else []
+                        families.setdefault(f"{prefix}_{key}", []).append((f"{prefix}_{key}", labels, value))
+        return families
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for name, samples in self._stats_families().items():
+            lines.append(f"# TYPE {name} gauge")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class Metrics(MetricsRegistry):
+    """The registry with the assistant's own instruments."""
+
+    def __init__(self):
+        super().__init__()
+        self.phase_seconds = self.histogram(
+            "sba_phase_seconds", "Time spent in each phase of a turn.", ("phase", "source")
+        )
+        self.turns = self.counter("sba_turns", "Turns answered, by source and outcome.", ("source", "status"))
+        self.output_tokens = self.counter("sba_output_tokens", "Tokens generated by assistant runs.", ("source",))
+        self.tokens_per_second = self.histogram(
+            "sba_tokens_per_second", "Generation speed of assistant runs after the first token.",
+            ("source",), buckets=RATE_BUCKETS
+        )
+        self.render_frames = self.counter("sba_render_frames", "Streamed UI frames sent.")
+        self._server = None
+
+    @contextmanager
+    def time(self, phase, source="worker"):
+        """Observe the duration of the block as ``phase``, outside any turn."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds.observe(time.perf_counter() - started, phase=phase, source=source)
+
+    def serve(self, host=None, port=None):
+        """
+        Serve ``/metrics`` on a local port in a background thread.
+
+        Defaults to METRICS_HOST (127.0.0.1) and METRICS_PORT (9464); a port of 0
+        disables the endpoint. Returns the bound port, or None.
+        """
+        with self._lock:
+            if self._server is not None:
+                return self._server.server_address[1]
+            host = host or os.getenv("METRICS_HOST", "127.0.0.1")
+            port = int(os.getenv("METRICS_PORT", "9464")) if port is None else port
+            if not port:
+                return None
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+            registry = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = registry.render().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", CONTENT_TYPE)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            try:
+                self._server = ThreadingHTTPServer((host, port), Handler)
+            except OSError as e:
+                logging.warning(f"Could not serve metrics on {host}:{port}: {e}")
+                return None
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+            logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+            return port
+
+
+_otel = None
+
+
+def _otel_tracer():
+    """Return ``(trace module, tracer)`` if OpenTelemetry tracing is enabled and installed, else None."""
+    global _otel
+    if _otel is None:
+        _otel = False
+        if os.getenv("OTEL_TRACES", "false").lower() == "true":
+            try:
+                from opentelemetry import trace
+            except ImportError:
+                logging.warning("OTEL_TRACES is set but 'opentelemetry-api' is not installed; traces are disabled.")
+            else:
+                _configure_otel(trace)
+                _otel = (trace, trace.get_tracer("sba-performance-hub"))
+    return _otel or None
+
+
+def _configure_otel(trace):
+    """Export spans over OTLP unless a tracer provider is already set up (e.g. by opentelemetry-instrument)."""
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        logging.info("OpenTelemetry SDK or OTLP exporter not installed; using the configured tracer provider.")
+        return
+    if type(trace.get_tracer_provider()).__name__ != "ProxyTracerProvider":
+        return
+    service_name = os.getenv("OTEL_SERVICE_NAME", "sba-performance-hub")
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+
+
+class Trace:
+    """
+    Phase timings of one turn.
+
+    Phases are summed per turn and observed once each in ``sba_phase_seconds``
+    when the turn ends. With OTEL_TRACES=true every phase is also exported as a
+    child span of a span covering the whole turn.
+    """
+
+    def __init__(self, source="ui", metrics=None, **attributes):
+        self.source = source
+        self.metrics = metrics or get_metrics()
+        self.phases = {}
+        self.started = time.perf_counter()
+        self.status = None
+        self.tokens_per_second = None
+        otel = _otel_tracer()
+        self._otel, self._span = otel, None
+        if otel:
+            self._span = otel[1].start_span("turn", attributes=dict(attributes, source=source))
+
+    @contextmanager
+    def span(self, phase, **attributes):
+        """Time the block as ``phase``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - started, **attributes)
+
+    def record(self, phase, seconds, **attributes):
+        """Add ``seconds`` that ended just now to ``phase``."""
+        if seconds is None:
+            return
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        if self._span is not None:
+            trace, tracer = self._otel
+            end = time.time_ns()
+            span = tracer.start_span(
+                phase, context=trace.set_span_in_context(self._span),
+                start_time=end - int(seconds * 1e9), attributes=attributes
+            )
+            span.end(end_time=end)
+
+    def record_run(self, result, render_seconds=None, frames=0):
+        """Record the phases and generation speed of a StreamResult."""
+        self.record("run_start", result.time_to_run_start)
+        self.record("first_token", result.time_to_first_token)
+        self.record("run", result.latency)
+        self.record("render", render_seconds)
+        if frames:
+            self.metrics.render_frames.inc(frames)
+        if result.output_tokens:
+            self.metrics.output_tokens.inc(result.output_tokens, source=self.source)
+            generating = (result.latency or 0.0) - (result.time_to_first_token or 0.0)
+            if generating > 0:
+                self.tokens_per_second = result.output_tokens / generating
+                self.metrics.tokens_per_second.observe(self.tokens_per_second, source=self.source)
+
+    def end(self, status="completed"):
+        """Close the turn and export its phases; returns the total seconds."""
+        total = time.perf_counter() - self.started
+        self.status = status
+        self.phases["total"] = total
+        for phase, seconds in self.phases.items():
+            self.metrics.phase_seconds.observe(seconds, phase=phase, source=self.source)
+        self.metrics.turns.inc(source=self.source, status=status)
+        if self._span is not None:
+            self._span.set_attribute("status", status)
+            self._span.end()
+        return total
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide metrics registry."""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = Metrics()
+    return _metrics
@@ -0,0 +1,239 @@
+import os
+import re
+import json
+import shutil
+import logging
+import pandas as pd
+from openpyxl import load_workbook
+from concurrent.futures import ProcessPoolExecutor
+from service.scanner import scan_files
+
+
+SPREADSHEET_FORMATS = frozenset({".csv", ".xlsx"})
+
+# Column name words used for the summary header of each chunk; names are split
+# into words, so "Deadline" is not a line and "Downtime min" is not a period
+PLANT_WORDS = frozenset({"plant", "site", "factory", "line"})
+PERIOD_WORDS = frozenset({"date", "period", "month", "week", "shift", "time", "day", "year", "quarter"})
+
+
+def _read_chunks(path, chunk_rows):
+    """Yield (sheet name, DataFrame) chunks without loading the whole file."""
+    if path.lower().endswith(".csv"):
+        for chunk in pd.read_csv(path, chunksize=chunk_rows, low_memory=False):
+            yield None, chunk
+        return
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            columns = [str(name) if name is not None else f"column_{i}" for i, name in enumerate(header)]
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= chunk_rows:
+                    yield sheet.title, pd.DataFrame(batch, columns=columns)
+                    batch = []
+            if batch:
+                yield sheet.title, pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+def _clean(chunk, seen):
+    """Drop empty columns and rows, and rows already emitted by an earlier chunk."""
+    chunk = chunk.dropna(axis=1, how="all").dropna(axis=0, how="all")
+    if chunk.empty:
+        return chunk
+    hashes = pd.util.hash_pandas_object(chunk.astype(str), index=False)
+    keep = ~hashes.duplicated() & ~hashes.isin(seen)
+    seen.update(hashes[keep].tolist())
+    return chunk[keep.values]
+
+
+def _words(column):
+    """Lower-case words of a column name: "Cycle Time s" and "CycleTime" give ["cycle", "time", ...]."""
+    return [word.lower() for word in re.findall(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+", str(column))]
+
+
+def _date_range(values):
+    """Return "first to last" of the dates in a column, or None if it holds no dates."""
+    values = values.dropna()
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        # Numbers would parse as nanosecond timestamps
+        if pd.to_numeric(values, errors="coerce").notna().sum() * 2 > len(values):
+            return None
+        values = pd.to_datetime(values.astype(str), errors="coerce", format="mixed")
+    dates = values.dropna()
+    if dates.empty:
+        return None
+    return f"{dates.min():%Y-%m-%d} to {dates.max():%Y-%m-%d}"
+
+
+def _number_range(values):
+    """Return "first to last" of week, shift or day numbers, or None if the column holds other values."""
+    numbers = pd.to_numeric(values.dropna(), errors="coerce")
+    if numbers.empty or numbers.isna().sum() * 2 >= len(numbers):
+        return None
+    numbers = numbers.dropna()
+    if not (numbers == numbers.round()).all():
+        return None
+    return f"{numbers.min():g} to {numbers.max():g}"
+
+
+def _summary(chunk, source, sheet):
+    """Describe a chunk by plant, period and KPI columns for retrieval."""
+    summary = {"source": source}
+    if sheet:
+        summary["sheet"] = sheet
+    dimensions = set()
+    dates = numbers = None
+    for column in chunk.columns:
+        words = _words(column)
+        values = chunk[column]
+        numeric = pd.api.types.is_numeric_dtype(values)
+        if PLANT_WORDS.intersection(words) and not numeric:
+            summary.setdefault("plant", []).extend(values.dropna().astype(str).unique()[:10].tolist())
+            dimensions.add(column)
+        elif pd.api.types.is_datetime64_any_dtype(values) or (PERIOD_WORDS.intersection(words) and not numeric):
+            dimensions.add(column)
+            # The first column holding dates wins; week numbers only count without one
+            dates = dates or _date_range(values)
+            numbers = numbers or _number_range(values)
+        elif numeric and words and words[0] in PERIOD_WORDS and not pd.api.types.is_bool_dtype(values):
+            # "Week" or "Shift no" numbers, but not a measure such as "Cycle Time s"
+            period = _number_range(values)
+            if period:
+                dimensions.add(column)
+                numbers = numbers or period
+    if dates or numbers:
+        summary["period"] = dates or numbers
+    # Period columns such as week numbers are not KPIs
+    kpis = [str(column) for column in chunk.select_dtypes("number").columns if column not in dimensions]
+    if kpis:
+        summary["kpis"] = kpis
+    summary["rows"] = len(chunk)
+    return summary
+
+
+def convert_spreadsheet(path, output_dir, chunk_rows=2000, output_format="csv", source=None):
+    """
+    Convert a .csv or .xlsx file into compact, deduplicated chunk files.
+
+    Each chunk starts with a summary header (source, plant, period, KPI columns).
+    CSV chunks carry it as ``#`` comment lines; JSONL chunks as a first
+    ``{"summary": ...}`` record.
+
+    Returns:
+        List of the chunk files written.
+    """
+    source = source or os.path.basename(path)
+    # The full file name, extension included, so neither data.csv and data.xlsx
+    # nor a.b.csv and a_b.csv share chunk names
+    stem = os.path.basename(path)
+    os.makedirs(output_dir, exist_ok=True)
+    seen = set()
+    outputs = []
+    for sheet, chunk in _read_chunks(path, chunk_rows):
+        chunk = _clean(chunk, seen)
+        if chunk.empty:
+            continue
+        try:
+            summary = _summary(chunk, source, sheet)
+        except Exception as e:
+            logging.warning(f"Could not summarize a chunk of {path}: {e}")
+            summary = {"source": source, "rows": len(chunk)}
+        sheet_part = f"__{re.sub(r'[^A-Za-z0-9_-]+', '_', sheet)}" if sheet else ""
+        # file_search does not accept .jsonl, so JSONL chunks are uploaded as text
+        extension = "jsonl.txt" if output_format == "jsonl" else output_format
+        output = os.path.join(output_dir, f"{stem}{sheet_part}__part{len(outputs) + 1:04d}.{extension}")
+        with open(output, "w", encoding="utf-8", newline="") as file:
+            if output_format == "jsonl":
+                file.write(json.dumps({"summary": summary}, default=str) + "\n")
+                chunk.to_json(file, orient="records", lines=True, date_format="iso", default_handler=str)
+            else:
+                for key, value in summary.items():
+                    if isinstance(value, list):
+                        value = ", ".join(map(str, value))
+                    file.write(f"# {key}: {value}\n")
+                chunk.to_csv(file, index=False)
+        outputs.append(output)
+    return outputs
+
+
+def _convert(args):
+    path, output_dir, chunk_rows, output_format, source = args
+    try:
+        return source, convert_spreadsheet(path, output_dir, chunk_rows, output_format, source)
+    except Exception as e:
+        logging.error(f"Error converting spreadsheet {path}: {e}")
+        return source, None
+
+
+def _copy(path, target_dir):
+    os.makedirs(target_dir, exist_ok=True)
+    target = os.path.join(target_dir, os.path.basename(path))
+    shutil.copy2(path, target)
+    return target
+
+
+def preprocess_directory(source_dir, output_dir, max_workers=None, chunk_rows=None, output_format=None):
+    """
+    Stage ``source_dir`` for upload into ``output_dir``.
+
+    Spreadsheets are converted in a process pool; other supported files, and
+    spreadsheets that fail to convert, are copied as-is. Files unchanged since the previous run are skipped and the
+    outputs of deleted files are removed.
+
+    Returns:
+        The staging directory, ready to be uploaded or synced.
+    """
+    chunk_rows = chunk_rows or int(os.getenv("PREPROCESS_CHUNK_ROWS", "2000"))
+    output_format = output_format or os.getenv("PREPROCESS_FORMAT", "csv")
+    manifest_path = os.path.join(output_dir, ".preprocess.json")
+    try:
+        with open(manifest_path, "r") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        manifest = {}
+
+    current, conversions = {}, []
+    for entry in scan_files(source_dir):
+        rel = os.path.relpath(entry.path, source_dir)
+        stamp = [os.path.getmtime(entry.path), entry.size, chunk_rows, output_format]
+        current[rel] = stamp
+        previous = manifest.get(rel)
+        if previous and previous["stamp"] == stamp and all(map(os.path.exists, previous["outputs"])):
+            continue
+        for output in (previous or {}).get("outputs", []):
+            if os.path.exists(output):
+                os.remove(output)
+        target_dir = os.path.join(output_dir, os.path.dirname(rel))
+        if os.path.splitext(entry.path)[1].lower() in SPREADSHEET_FORMATS:
+            conversions.append((entry.path, target_dir, chunk_rows, output_format, rel))
+        else:
+            manifest[rel] = {"stamp": stamp, "outputs": [_copy(entry.path, target_dir)]}
+
+    if conversions:
+        max_workers = max_workers or int(os.getenv("PREPROCESS_WORKERS", "0")) or None
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for (path, target_dir, *_), (rel, outputs) in zip(conversions, executor.map(_convert, conversions)):
+                if outputs is None:
+                    # Upload the original rather than dropping the file from the vector store
+                    outputs = [_copy(path, target_dir)]
+                manifest[rel] = {"stamp": current[rel], "outputs": outputs}
+
+    for rel in [rel for rel in manifest if rel not in current]:
+        for output in manifest.pop(rel)["outputs"]:
+            if os.path.exists(output):
+                os.remove(output)
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(manifest_path, "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    logging.info(f"Preprocessed {len(conversions)} spreadsheet(s) from {source_dir} into {output_dir}")
+    return output_dir
@@ -0,0 +1,444 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import functools
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+import httpx
+from service.metrics import get_metrics
+
+
+# Responses worth retrying: timeouts, lock conflicts, rate limits and server errors
+RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+# Errors raised before the request reached the server, so it is always safe to resend
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Endpoints that run a model and count against the tokens-per-minute limit
+MODEL_PATH_SUFFIXES = ("/runs", "/chat/completions", "/embeddings")
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+
+class TokenBucket:
+    """Rate limiter refilling ``per_minute`` tokens a minute, with a burst of one minute's worth."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """
+        Take ``amount`` tokens and return the seconds to wait before using them.
+
+        Tokens not yet available are borrowed from the future, so concurrent
+        callers queue in arrival order without polling.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def available(self):
+        with self._lock:
+            elapsed = time.monotonic() - self.updated
+            return min(self.capacity, self.tokens + elapsed * self.rate)
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated server failures instead of piling more requests on.
+
+    After ``failure_threshold`` consecutive failures the circuit opens for
+    ``reset_timeout`` seconds; then a single probe request is let through and
+    its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opens = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a request may be sent now."""
+        if not self.failure_threshold:
+            return True
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return self.state == "closed"
+
+    def abandon(self):
+        """Forget a request that was let through but ended without an outcome, e.g. was cancelled."""
+        with self._lock:
+            self._probing = False
+
+    def record(self, success):
+        with self._lock:
+            self._probing = False
+            if success:
+                self.failures = 0
+                self.state = "closed"
+                return
+            self.failures += 1
+            if self.state == "half_open" or (self.failure_threshold and self.failures >= self.failure_threshold):
+                if self.state != "open":
+                    self.opens += 1
+                    logging.warning(f"OpenAI circuit breaker opened after {self.failures} consecutive failures")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+class ConcurrencyLimit:
+    """
+    Bounds requests in flight across every session and client of the process.
+
+    Waiters, from threads and event loops alike, are served in arrival order: a
+    released slot is handed straight to the longest waiting one.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self._waiters = deque()  # callables granting a slot to a waiter
+        self._lock = threading.Lock()
+
+    def _take(self):
+        # Called with the lock held; newcomers do not jump the queue
+        if self._waiters or (self.limit and self.active >= self.limit):
+            return False
+        self.active += 1
+        return True
+
+    def _abandon(self, grant):
+        """Withdraw a waiter that gave up; a slot granted to it meanwhile is passed on."""
+        with self._lock:
+            if grant in self._waiters:
+                self._waiters.remove(grant)
+                return
+        self.release()
+
+    def acquire(self, timeout=None):
+        """Take a slot, raising httpx.PoolTimeout if none is free within ``timeout`` seconds."""
+        event = threading.Event()
+        grant = event.set
+        with self._lock:
+            if self._take():
+                return
+            self._waiters.append(grant)
+        try:
+            granted = event.wait(timeout)
+        except BaseException:
+            self._abandon(grant)
+            raise
+        if not granted:
+            self._abandon(grant)
+            raise httpx.PoolTimeout(f"No OpenAI request slot was free within {timeout} s")
+
+    async def acquire_async(self, timeout=None):
+        """Async counterpart of ``acquire``."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        grant = functools.partial(loop.call_soon_threadsafe, _resolve, future)
+        with self._lock:
+            if self._take():
+                return
+            self._waiters.append(grant)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._abandon(grant)
+            raise httpx.PoolTimeout(f"No OpenAI request slot was free within {timeout} s") from None
+        except BaseException:
+            self._abandon(grant)
+            raise
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self.active -= 1
+                return
+            grant = self._waiters.popleft()
+        grant()
+
+    def waiting(self):
+        with self._lock:
+            return len(self._waiters)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _retry_after(response):
+    """Seconds the server asked us to wait, from retry-after-ms or Retry-After, or None."""
+    if response is None:
+        return None
+    try:
+        return float(response.headers["retry-after-ms"]) / 1000
+    except (KeyError, ValueError):
+        pass
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class CallGuard:
+    """Rate limiting, concurrency limiting, retries and circuit breaking shared by all OpenAI clients."""
+
+    def __init__(self, rpm=0, tpm=0, max_concurrency=0, max_retries=2, backoff=0.5, max_backoff=20.0,
+                 failure_threshold=5, reset_timeout=30.0, run_tokens=2000):
+        """
+        Initialize the guard.
+
+        Args:
+            rpm: Requests per minute allowed to start; 0 disables the limit.
+            tpm: Estimated tokens per minute allowed to start; 0 disables the limit.
+            max_concurrency: Requests in flight at once; 0 is unbounded. A streamed response stops
+                counting once its headers arrive, so long runs do not hold up other calls.
+            max_retries: Retries of a failed request.
+            backoff: Base of the exponential backoff, in seconds; delays are fully jittered.
+            max_backoff: Cap of a single backoff delay, in seconds.
+            failure_threshold: Consecutive failures that open the circuit; 0 disables the breaker.
+            reset_timeout: Seconds the circuit stays open before a probe request.
+            run_tokens: Tokens assumed for a run on top of its request, since runs read the whole thread.
+        """
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.slots = ConcurrencyLimit(max_concurrency)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.run_tokens = run_tokens
+
+        metrics = get_metrics()
+        self.queued = metrics.counter("sba_openai_queued", "OpenAI calls that waited for the rate limiter or a slot.")
+        self.queue_seconds = metrics.histogram("sba_openai_queue_seconds", "Time OpenAI calls waited before being sent.")
+        self.throttled = metrics.counter(
+            "sba_openai_throttled", "OpenAI calls delayed by the local limiter or rejected with 429.", ("reason",)
+        )
+        self.retries = metrics.counter("sba_openai_retries", "Retried OpenAI calls.", ("reason",))
+        self.rejected = metrics.counter(
+            "sba_openai_circuit_rejections", "OpenAI calls failed fast while the circuit breaker was open."
+        )
+        metrics.register_stats("sba_openai_guard", self.stats)
+
+    @classmethod
+    def from_env(cls):
+        """Build the guard from OPENAI_* environment variables."""
+        return cls(
+            rpm=int(os.getenv("OPENAI_RPM", "0")),
+            tpm=int(os.getenv("OPENAI_TPM", "0")),
+            max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", os.getenv("OPENAI_POOL_MAX_CONNECTIONS", "20"))),
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "2")),
+            backoff=float(os.getenv("OPENAI_RETRY_BACKOFF", "0.5")),
+            max_backoff=float(os.getenv("OPENAI_RETRY_MAX_BACKOFF", "20")),
+            failure_threshold=int(os.getenv("OPENAI_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("OPENAI_BREAKER_RESET", "30")),
+            run_tokens=int(os.getenv("OPENAI_TPM_RUN_TOKENS", "2000")),
+        )
+
+    def _estimate_tokens(self, request):
+        """Rough token cost of a model request: its body at ~4 bytes a token, plus runs' thread context."""
+        path = request.url.path
+        if request.method != "POST" or not path.endswith(MODEL_PATH_SUFFIXES):
+            return 0
+        body = request.content if isinstance(request.stream, httpx.ByteStream) else b""
+        return len(body) // 4 + (self.run_tokens if path.endswith("/runs") else 0)
+
+    def admit(self, request):
+        """Check the circuit and reserve rate limit capacity; returns the seconds to wait."""
+        if not self.breaker.allow():
+            self.rejected.inc()
+            raise CircuitOpenError("OpenAI API circuit breaker is open after repeated failures; try again shortly")
+        wait = 0.0
+        if self.requests is not None:
+            requests_wait = self.requests.reserve()
+            if requests_wait:
+                self.throttled.inc(reason="rpm")
+            wait = max(wait, requests_wait)
+        cost = self._estimate_tokens(request) if self.tokens is not None else 0
+        if cost:
+            tokens_wait = self.tokens.reserve(cost)
+            if tokens_wait:
+                self.throttled.inc(reason="tpm")
+            wait = max(wait, tokens_wait)
+        return wait
+
+    def record_wait(self, seconds):
+        if seconds > 0.001:
+            self.queued.inc()
+        self.queue_seconds.observe(seconds)
+
+    def retry_delay(self, attempt, response=None, error=None):
+        """Return the seconds to wait before retrying, or None if the call should not be retried."""
+        if response is not None:
+            self.breaker.record(response.status_code < 500)
+            if response.status_code == 429:
+                self.throttled.inc(reason="server")
+            if response.status_code not in RETRY_STATUSES or response.headers.get("x-should-retry") == "false":
+                return None
+            reason = str(response.status_code)
+        else:
+            self.breaker.record(False)
+            if not isinstance(error, RETRY_ERRORS):
+                return None
+            reason = type(error).__name__
+        if attempt >= self.max_retries:
+            return None
+        self.retries.inc(reason=reason)
+        jitter = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        retry_after = _retry_after(response)
+        # Honor the server's delay, spread out so throttled sessions do not return in lockstep
+        return min(retry_after, 60.0) + jitter * 0.25 if retry_after is not None else jitter
+
+    def stats(self):
+        return {
+            "in_flight": self.slots.active,
+            "waiting": self.slots.waiting(),
+            "max_concurrency": self.slots.limit,
+            "circuit_open": int(self.breaker.state != "closed"),
+            "consecutive_failures": self.breaker.failures,
+            "circuit_opens": self.breaker.opens,
+            "rpm_available": self.requests.available() if self.requests else 0,
+            "tpm_available": self.tokens.available() if self.tokens else 0,
+        }
+
+
+def _pool_timeout(request):
+    """The request's pool timeout, which also bounds the wait for a slot."""
+    return request.extensions.get("timeout", {}).get("pool")
+
+
+class ResilientTransport(httpx.BaseTransport):
+    """httpx transport applying a CallGuard to every request of the wrapped transport."""
+
+    def __init__(self, transport, guard):
+        self.transport = transport
+        self.guard = guard
+
+    def handle_request(self, request):
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            wait = self.guard.admit(request)
+            try:
+                if wait:
+                    time.sleep(wait)
+                self.guard.slots.acquire(_pool_timeout(request))
+            except BaseException:
+                self.guard.breaker.abandon()
+                raise
+            self.guard.record_wait(time.monotonic() - started)
+            try:
+                response = self.transport.handle_request(request)
+            except Exception as e:
+                delay = self.guard.retry_delay(attempt, error=e)
+                if delay is None:
+                    raise
+            except BaseException:
+                # Interrupted without an outcome; let another request probe the circuit
+                self.guard.breaker.abandon()
+                raise
+            else:
+                delay = self.guard.retry_delay(attempt, response=response)
+                if delay is None:
+                    return response
+                response.close()
+            finally:
+                # The slot is freed once the headers arrive, so an open stream (e.g. a run) does not
+                # hold up other calls, including the one cancelling it
+                self.guard.slots.release()
+            logging.info(f"Retrying {request.method} {request.url.path} in {delay:.2f}s (attempt {attempt + 1})")
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncResilientTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of ResilientTransport."""
+
+    def __init__(self, transport, guard):
+        self.transport = transport
+        self.guard = guard
+
+    async def handle_async_request(self, request):
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            wait = self.guard.admit(request)
+            try:
+                if wait:
+                    await asyncio.sleep(wait)
+                await self.guard.slots.acquire_async(_pool_timeout(request))
+            except BaseException:
+                self.guard.breaker.abandon()
+                raise
+            self.guard.record_wait(time.monotonic() - started)
+            try:
+                response = await self.transport.handle_async_request(request)
+            except Exception as e:
+                delay = self.guard.retry_delay(attempt, error=e)
+                if delay is None:
+                    raise
+            except BaseException:
+                # Cancelled, e.g. by a timeout around the call; let another request probe the circuit
+                self.guard.breaker.abandon()
+                raise
+            else:
+                delay = self.guard.retry_delay(attempt, response=response)
+                if delay is None:
+                    return response
+                await response.aclose()
+            finally:
+                self.guard.slots.release()
+            logging.info(f"Retrying {request.method} {request.url.path} in {delay:.2f}s (attempt {attempt + 1})")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+_guard = None
+_guard_lock = threading.Lock()
+
+
+def get_call_guard():
+    """Return the process-wide call guard."""
+    global _guard
+    if _guard is None:
+        with _guard_lock:
+            if _guard is None:
+                _guard = CallGuard.from_env()
+    return _guard
@@ -0,0 +1,252 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+from service.ai_service import AIAssistantManager
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    scope TEXT NOT NULL,
+    query TEXT NOT NULL,
+    response TEXT NOT NULL,
+    images TEXT NOT NULL DEFAULT '[]',
+    embedding BLOB,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_scope ON responses (scope, accessed_at);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def normalize_query(query):
+    """Normalize a query so trivially different phrasings share a cache entry."""
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip(" ?!.")
+
+
+# Embeddings of recent lookups kept in memory, so storing a missed query does not embed it again
+EMBEDDINGS_KEPT = 256
+
+
+class ResponseCache:
+    """SQLite-backed cache of assistant answers shared by every worker on a host."""
+
+    def __init__(
+        self, path=None, ttl=None, max_entries=None, embed=None, similarity_threshold=None, similarity_candidates=None
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            path: SQLite database file. Defaults to $CACHE_DIR/responses.sqlite3.
+            ttl: Seconds an answer stays valid. Defaults to RESPONSE_CACHE_TTL.
+            max_entries: Entries kept before least recently used ones are evicted.
+                Defaults to RESPONSE_CACHE_MAX_ENTRIES.
+            embed: Optional callable returning an embedding vector for a query, enabling
+                similarity lookups when there is no exact match. It is called on every
+                miss, on the request path; ``put`` reuses the vector of the missed lookup.
+            similarity_threshold: Minimum cosine similarity for a similarity hit.
+                Defaults to RESPONSE_CACHE_SIMILARITY.
+            similarity_candidates: Most recently used entries compared on a similarity lookup.
+                Defaults to RESPONSE_CACHE_SIMILARITY_CANDIDATES.
+        """
+        self.path = path or os.path.join(os.getenv("CACHE_DIR", ".cache"), "responses.sqlite3")
+        self.ttl = float(os.getenv("RESPONSE_CACHE_TTL", "3600")) if ttl is None else ttl
+        self.max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "500")) if max_entries is None else max_entries
+        if similarity_threshold is None:
+            similarity_threshold = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))
+        self.similarity_threshold = similarity_threshold
+        if similarity_candidates is None:
+            similarity_candidates = int(os.getenv("RESPONSE_CACHE_SIMILARITY_CANDIDATES", "200"))
+        self.similarity_candidates = similarity_candidates
+        self.embed = embed
+        self._local = threading.local()
+        self._embeddings = OrderedDict()  # normalized query -> vector of recent lookups
+        self._embeddings_lock = threading.Lock()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def scope(assistant_id, vector_store_id, vector_store_version=None):
+        """Return the cache scope; answers never cross assistants or vector store versions."""
+        return f"{assistant_id}|{vector_store_id}|{vector_store_version or ''}"
+
+    @staticmethod
+    def key(query, scope):
+        return hashlib.sha256(f"{scope}\n{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def _count(self, connection, name):
+        connection.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def _embedding(self, query):
+        if self.embed is None:
+            return None
+        text = normalize_query(query)
+        with self._embeddings_lock:
+            embedding = self._embeddings.get(text)
+            if embedding is not None:
+                self._embeddings.move_to_end(text)
+                return embedding
+        try:
+            embedding = self.embed(text)
+        except Exception as e:
+            logging.warning(f"Error embedding query for response cache: {e}")
+            return None
+        if embedding is not None:
+            # Stored as packed float32, the same as in the database
+            embedding = np.asarray(embedding, dtype=np.float32)
+            with self._embeddings_lock:
+                self._embeddings[text] = embedding
+                while len(self._embeddings) > EMBEDDINGS_KEPT:
+                    self._embeddings.popitem(last=False)
+        return embedding
+
+    def get(self, query, scope):
+        """
+        Look up a cached answer.
+
+        Returns:
+            A dict with ``response`` and ``images``, or None on a miss.
+        """
+        try:
+            connection = self._connection()
+            now = time.time()
+            row = connection.execute(
+                "SELECT key, response, images FROM responses WHERE key = ? AND created_at > ?",
+                (self.key(query, scope), now - self.ttl),
+            ).fetchone()
+            counter = "hits"
+            if row is None and self.embed is not None:
+                row = self._similar(connection, query, scope, now)
+                counter = "similar_hits"
+            if row is None:
+                self._count(connection, "misses")
+                return None
+            connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, row[0]))
+            self._count(connection, counter)
+            return {"response": row[1], "images": json.loads(row[2])}
+        except Exception as e:
+            logging.error(f"Error reading response cache: {e}")
+            return None
+
+    def _similar(self, connection, query, scope, now):
+        embedding = self._embedding(query)
+        if embedding is None:
+            return None
+        rows = connection.execute(
+            "SELECT key, response, images, embedding FROM responses "
+            "WHERE scope = ? AND created_at > ? AND embedding IS NOT NULL "
+            "ORDER BY accessed_at DESC LIMIT ?",
+            (scope, now - self.ttl, self.similarity_candidates),
+        ).fetchall()
+        # Entries of another embedding model (or older JSON-encoded ones) are not comparable
+        rows = [row for row in rows if isinstance(row[3], bytes) and len(row[3]) == embedding.nbytes]
+        if not rows:
+            return None
+        vectors = np.frombuffer(b"".join(row[3] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(embedding)
+        scores = np.divide(vectors @ embedding, norms, out=np.zeros(len(rows), dtype=np.float32), where=norms > 0)
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        return rows[best][:3]
+
+    def put(self, query, scope, response, images=None):
+        """Store an answer and evict expired and least recently used entries."""
+        try:
+            connection = self._connection()
+            now = time.time()
+            embedding = self._embedding(query)
+            connection.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, scope, query, response, images, embedding, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.key(query, scope), scope, normalize_query(query), response,
+                    json.dumps(images or []), embedding.tobytes() if embedding is not None else None, now, now,
+                ),
+            )
+            self._evict(connection, now)
+        except Exception as e:
+            logging.error(f"Error writing response cache: {e}")
+
+    def _evict(self, connection, now):
+        expired = connection.execute(
+            "DELETE FROM responses WHERE created_at <= ?", (now - self.ttl,)
+        ).rowcount
+        evicted = connection.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        if expired or evicted:
+            connection.execute(
+                "INSERT INTO counters (name, value) VALUES ('evictions', ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (expired + evicted,),
+            )
+
+    def stats(self):
+        """Return hit, miss and eviction counters shared by all workers."""
+        try:
+            connection = self._connection()
+            counters = dict(connection.execute("SELECT name, value FROM counters"))
+            entries = connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        except Exception as e:
+            logging.error(f"Error reading response cache stats: {e}")
+            counters, entries = {}, 0
+        hits = counters.get("hits", 0) + counters.get("similar_hits", 0)
+        lookups = hits + counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "hits": counters.get("hits", 0),
+            "similar_hits": counters.get("similar_hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide response cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                model = os.getenv("RESPONSE_CACHE_EMBEDDING_MODEL")
+
+                def embed(text):
+                    return AIAssistantManager.create_embedding(text, model)
+
+                _cache = ResponseCache(embed=embed if model else None)
+    return _cache
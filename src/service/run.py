@@ -1,34 +1,219 @@
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
 from typing_extensions import override
 from openai import AssistantEventHandler
 
-class StreamlitEventHandler(AssistantEventHandler):
+
+class DeltaRenderer:
+    """Coalesces streamed text deltas into throttled UI frames."""
+
+    def __init__(self, render, interval=None, min_chars=None):
+        """
+        Initialize the renderer.
+
+        Args:
+            render: Callable receiving the full accumulated text for each frame.
+            interval: Minimum seconds between frames. Defaults to STREAM_RENDER_INTERVAL.
+            min_chars: Send a frame early once this many characters are pending.
+                Defaults to STREAM_RENDER_MIN_CHARS. When both are 0 every delta is rendered.
+        """
+        self.render = render
+        self.interval = float(os.getenv("STREAM_RENDER_INTERVAL", "0.1")) if interval is None else interval
+        self.min_chars = int(os.getenv("STREAM_RENDER_MIN_CHARS", "0")) if min_chars is None else min_chars
+        self._parts = []
+        self._pending = 0
+        self._last_frame = 0.0
+        self.deltas_received = 0
+        self.frames_sent = 0
+        self.render_seconds = 0.0
+
+    @property
+    def text(self):
+        """Return the accumulated text, joining buffered parts only once."""
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def _frame_due(self):
+        if not self.interval and not self.min_chars:
+            return True
+        if self.min_chars and self._pending >= self.min_chars:
+            return True
+        return bool(self.interval) and time.monotonic() - self._last_frame >= self.interval
+
+    def append(self, chunk):
+        """Buffer a delta and send a frame if one is due."""
+        if not chunk:
+            return
+        self._parts.append(chunk)
+        self._pending += len(chunk)
+        self.deltas_received += 1
+        if self._frame_due():
+            self.flush()
+
+    def flush(self):
+        """Render any pending text immediately."""
+        if not self._pending:
+            return
+        started = time.perf_counter()
+        self.render(self.text)
+        self.render_seconds += time.perf_counter() - started
+        self._pending = 0
+        self._last_frame = time.monotonic()
+        self.frames_sent += 1
+
+
+@dataclass
+class StreamResult:
+    """Everything a streamed run produced, assembled by the event handler."""
+
+    text: str = ""
+    tool_calls: List[str] = field(default_factory=list)
+    image_file_ids: List[str] = field(default_factory=list)
+    run_id: Optional[str] = None
+    thread_id: Optional[str] = None
+    status: Optional[str] = None
+    time_to_run_start: Optional[float] = None
+    time_to_first_token: Optional[float] = None
+    latency: Optional[float] = None
+    output_tokens: Optional[int] = None
+
+
+class CollectingEventHandler(AssistantEventHandler):
+    """Event handler that assembles a StreamResult without touching the UI."""
+
+    def __init__(self, broadcast=None):
+        """
+        Initialize the handler.
+
+        Args:
+            broadcast: Optional Broadcast that receives every text delta, for
+                sessions following this run (see service.single_flight).
+        """
+        super().__init__()
+        self.broadcast = broadcast
+        self._parts = []
+        self._tool_calls = []
+        self._image_file_ids = []
+        self.started_at = time.monotonic()
+        self.run_created_at = None
+        self.first_token_at = None
+        self.ended_at = None
+
+    @property
+    def current_text(self):
+        return "".join(self._parts)
+
+    def on_text(self, chunk):
+        """Called for every piece of response text; override to render it."""
+
+    def _emit(self, chunk):
+        self._parts.append(chunk)
+        self.on_text(chunk)
+        if self.broadcast is not None:
+            self.broadcast.publish(chunk)
+
+    @override
+    def on_event(self, event):
+        """Record when the run was accepted."""
+        if event.event == "thread.run.created" and self.run_created_at is None:
+            self.run_created_at = time.monotonic()
+
+    @override
+    def on_text_created(self, text):
+        """Separate consecutive text blocks of a response."""
+        if self._parts:
+            self._emit("\n\n")
+
+    @override
+    def on_text_delta(self, delta, snapshot):
+        """Collect text deltas."""
+        if delta.value:
+            if self.first_token_at is None:
+                self.first_token_at = time.monotonic()
+            self._emit(delta.value)
+
+    @override
+    def on_tool_call_created(self, tool_call):
+        """Record tool invocations."""
+        self._tool_calls.append(tool_call.type)
+
+    @override
+    def on_image_file_done(self, image_file):
+        """Record generated image files."""
+        if image_file.file_id:
+            self._image_file_ids.append(image_file.file_id)
+
+    @override
+    def on_end(self):
+        """Record when the stream finished."""
+        self.ended_at = time.monotonic()
+
+    @property
+    def result(self):
+        """Return the StreamResult assembled so far."""
+        run = self.current_run
+        first_token_at, ended_at = self.first_token_at, self.ended_at or time.monotonic()
+        usage = getattr(run, "usage", None)
+        return StreamResult(
+            text=self.current_text.strip(),
+            tool_calls=list(self._tool_calls),
+            image_file_ids=list(self._image_file_ids),
+            run_id=run.id if run else None,
+            thread_id=run.thread_id if run else None,
+            status=run.status if run else None,
+            time_to_run_start=self.run_created_at - self.started_at if self.run_created_at else None,
+            time_to_first_token=first_token_at - self.started_at if first_token_at else None,
+            latency=ended_at - self.started_at,
+            output_tokens=usage.completion_tokens if usage else None,
+        )
+
+
+class StreamlitEventHandler(CollectingEventHandler):
     """Custom Streamlit-compatible event handler for real-time streaming."""
 
-    def __init__(self, output_area):
+    def __init__(self, output_area, render_interval=None, min_chars=None, broadcast=None):
         """
         Initialize with a Streamlit output area.
 
         Args:
             output_area: A Streamlit placeholder or container for updating text.
+            render_interval: Minimum seconds between UI frames (see DeltaRenderer).
+            min_chars: Pending characters that force an early frame (see DeltaRenderer).
+            broadcast: Optional Broadcast shared with sessions following this run.
         """
-        super().__init__()  # Initialize the base class
+        super().__init__(broadcast)  # Initialize the base class
         self.output_area = output_area
-        self.current_text = ""
+        self.renderer = DeltaRenderer(output_area.markdown, interval=render_interval, min_chars=min_chars)
 
-    def on_text_created(self, text):
-        """Handle when the assistant starts responding."""
-        self.current_text += "Assistant started responding:\n"
-        self.output_area.text(self.current_text)
+    @property
+    def frames_sent(self):
+        return self.renderer.frames_sent
 
-    def on_text_delta(self, delta, snapshot):
-        """Stream text deltas dynamically to the UI."""
-        self.current_text += delta.value
-        self.output_area.text(self.current_text)
+    @property
+    def deltas_received(self):
+        return self.renderer.deltas_received
 
-    def on_tool_call_created(self, tool_call):
-        """Handle tool invocation events."""
-        self.current_text += f"\n[Tool Invoked: {tool_call.type}]\n"
-        self.output_area.text(self.current_text)
+    @property
+    def render_seconds(self):
+        return self.renderer.render_seconds
 
+    @override
+    def on_text(self, chunk):
+        """Render response text in throttled frames."""
+        self.renderer.append(chunk)
+
+    @override
+    def on_tool_call_created(self, tool_call):
+        """Show a placeholder while a tool runs before any text arrives."""
+        super().on_tool_call_created(tool_call)
+        if not self.renderer.text:
+            self.output_area.markdown(f"_Running {tool_call.type.replace('_', ' ')}…_")
 
- 
+    @override
+    def on_end(self):
+        """Render whatever is still buffered once the stream finishes."""
+        super().on_end()
+        self.renderer.flush()
@@ -0,0 +1,74 @@
+import time
+import logging
+import httpx
+from openai import APITimeoutError
+from service.client import operation_timeout
+from service.run import CollectingEventHandler
+
+
+def cancel_run(client, thread_id, run_id):
+    """Cancel a run, ignoring runs that already finished."""
+    try:
+        client.beta.threads.runs.cancel(run_id, thread_id=thread_id, timeout=operation_timeout("runs.retrieve"))
+    except Exception as e:
+        logging.warning(f"Error cancelling run {run_id}: {e}")
+
+
+def stream_run(client, thread_id, assistant_id, event_handler=None, timeout=None,
+               cancel_event=None, **run_kwargs):
+    """
+    Start a run and consume its event stream until a terminal event.
+
+    The stream replaces polling: text arrives as it is generated, and
+    time-to-first-token and total latency are measured by the handler.
+
+    Args:
+        client: OpenAI client.
+        thread_id: Thread to run.
+        assistant_id: Assistant to run.
+        event_handler: A CollectingEventHandler (or subclass). A plain one is used if omitted.
+        timeout: Total seconds before the run is cancelled. None waits for the stream to end;
+            a stream that stalls is still abandoned after the runs.stream read timeout.
+        cancel_event: Optional threading.Event; setting it cancels the run.
+        **run_kwargs: Extra arguments for ``runs.stream`` (e.g. additional_messages).
+
+    Returns:
+        The handler's StreamResult; ``status`` is the run status, or "timeout".
+    """
+    handler = event_handler or CollectingEventHandler()
+    started = time.monotonic()
+    status = None
+    request_timeout = operation_timeout("runs.stream")
+    if timeout is not None:
+        # The deadline is checked as events arrive, so a stalled stream needs a read timeout as well
+        request_timeout = httpx.Timeout(
+            connect=request_timeout.connect, read=min(request_timeout.read, timeout),
+            write=request_timeout.write, pool=request_timeout.pool,
+        )
+    try:
+        with client.beta.threads.runs.stream(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            event_handler=handler,
+            timeout=request_timeout,
+            **run_kwargs
+        ) as stream:
+            for _ in stream:
+                cancelled = cancel_event is not None and cancel_event.is_set()
+                timed_out = timeout is not None and time.monotonic() - started > timeout
+                if (cancelled or timed_out) and handler.current_run:
+                    cancel_run(client, thread_id, handler.current_run.id)
+                    status = "cancelled" if cancelled else "timeout"
+                    break
+    except (httpx.TimeoutException, APITimeoutError) as e:
+        logging.warning(f"Run stream on thread {thread_id} stalled: {e!r}")
+        if handler.current_run:
+            cancel_run(client, thread_id, handler.current_run.id)
+        status = "timeout"
+
+    result = handler.result
+    if status:
+        result.status = status
+    elif result.status == "requires_action":
+        cancel_run(client, thread_id, result.run_id)
+    return result
@@ -0,0 +1,92 @@
+import os
+import logging
+
+
+SUPPORTED_FORMATS = frozenset({".csv", ".txt", ".json", ".xlsx", ".py", ".docx", ".pdf"})
+
+# File search limits: 512 MB per file and 500 files per vector store file batch
+MAX_FILE_BYTES = 512 * 1024 * 1024
+MAX_BATCH_FILES = 500
+
+
+class FileEntry:
+    """A file found by ``scan_files``."""
+
+    __slots__ = ("path", "size")
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+
+    def __repr__(self):
+        return f"FileEntry({self.path!r}, {self.size})"
+
+
+def scan_files(directory, extensions=SUPPORTED_FORMATS, max_file_bytes=MAX_FILE_BYTES, recursive=True):
+    """
+    Lazily yield supported files under ``directory``.
+
+    Directories are walked with ``os.scandir`` one at a time, so memory use does
+    not grow with the number of files and no file is opened. Hidden files and
+    directories are skipped.
+
+    Args:
+        directory: Root directory to scan.
+        extensions: Set of lowercase extensions (with the dot) to include.
+        max_file_bytes: Files larger than this are skipped. None disables the limit.
+        recursive: Descend into subdirectories.
+
+    Yields:
+        FileEntry objects with the path and size of each matching file.
+    """
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                pending.append(entry.path)
+                            continue
+                        if not entry.is_file():
+                            continue
+                        if os.path.splitext(entry.name)[1].lower() not in extensions:
+                            logging.debug(f"Unsupported file format: {entry.path}")
+                            continue
+                        size = entry.stat().st_size
+                    except OSError as e:
+                        logging.error(f"Error reading file: {entry.path} - {e}")
+                        continue
+                    if max_file_bytes is not None and size > max_file_bytes:
+                        logging.warning(f"Skipping file over the size limit ({size} bytes): {entry.path}")
+                        continue
+                    yield FileEntry(entry.path, size)
+        except OSError as e:
+            logging.error(f"Error scanning directory: {current} - {e}")
+
+
+def batch_files(entries, max_files=MAX_BATCH_FILES, max_bytes=None):
+    """
+    Group scanned files into batches within the API's per-batch limits.
+
+    Args:
+        entries: Iterable of FileEntry objects, typically from ``scan_files``.
+        max_files: Maximum number of files per batch.
+        max_bytes: Maximum total size per batch. None disables the limit.
+
+    Yields:
+        Lists of FileEntry objects.
+    """
+    batch, batch_bytes = [], 0
+    for entry in entries:
+        if batch and (len(batch) >= max_files or (max_bytes and batch_bytes + entry.size > max_bytes)):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(entry)
+        batch_bytes += entry.size
+    if batch:
+        yield batch
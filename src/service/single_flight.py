@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from dataclasses import asdict
+from service.metrics import get_metrics
+from service.run import StreamResult
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flights (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    subscribers INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS flights_key ON flights (key, started_at);
+CREATE TABLE IF NOT EXISTS flight_chunks (
+    flight_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    chunk TEXT NOT NULL,
+    PRIMARY KEY (flight_id, position)
+);
+"""
+
+
+class Broadcast:
+    """
+    Text of one in-flight run, shared with every session waiting for the same answer.
+
+    The run's owner publishes deltas and finally the StreamResult; subscribers
+    replay everything published so far and then follow the stream live, so a
+    session that joins late still renders the full answer. Deltas are kept in
+    the registry's SQLite database, so subscribers in other worker processes
+    follow the run too.
+    """
+
+    def __init__(self, registry, flight_id, key, subscribers=0):
+        self.registry = registry
+        self.id = flight_id
+        self.key = key
+        self.started_at = time.monotonic()
+        self.result = None
+        self.done = False
+        self.subscribers = subscribers
+        self._pending = []  # deltas not yet written
+        self._position = 0
+        self._flushed_at = time.monotonic()
+
+    def _flush(self, connection):
+        rows = [(self.id, self._position + offset, chunk) for offset, chunk in enumerate(self._pending)]
+        connection.executemany("INSERT INTO flight_chunks (flight_id, position, chunk) VALUES (?, ?, ?)", rows)
+        self._position += len(rows)
+        self._pending = []
+        self._flushed_at = time.monotonic()
+
+    def publish(self, chunk):
+        """Append a text delta; deltas are written for the subscribers every ``flush_interval`` seconds."""
+        if not chunk:
+            return
+        self._pending.append(chunk)
+        if time.monotonic() - self._flushed_at >= self.registry.flush_interval:
+            connection = self.registry._connection()
+            with connection:
+                connection.execute("BEGIN")
+                self._flush(connection)
+
+    def finish(self, result=None):
+        """Mark the run as finished; ``result`` is None if it failed before producing one."""
+        self.result = result
+        self.done = True
+        connection = self.registry._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._flush(connection)
+            connection.execute(
+                "UPDATE flights SET done = 1, result = ? WHERE id = ?",
+                (json.dumps(asdict(result)) if result is not None else None, self.id),
+            )
+            row = connection.execute("SELECT subscribers FROM flights WHERE id = ?", (self.id,)).fetchone()
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        if row is not None:
+            self.subscribers = row["subscribers"]
+
+    def subscribe(self, timeout=None):
+        """
+        Yield the published text deltas, starting from the first one.
+
+        Returns once the run has finished; the outcome is then in ``result``.
+        Raises TimeoutError if the run has not finished within ``timeout`` seconds.
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        connection = self.registry._connection()
+        position = 0
+        while True:
+            # Read the state before the deltas: a finished run has written all of them
+            flight = connection.execute("SELECT done, result FROM flights WHERE id = ?", (self.id,)).fetchone()
+            chunks = [
+                row["chunk"] for row in connection.execute(
+                    "SELECT chunk FROM flight_chunks WHERE flight_id = ? AND position >= ? ORDER BY position",
+                    (self.id, position),
+                )
+            ]
+            position += len(chunks)
+            yield from chunks
+            if flight is None or flight["done"]:
+                self.done = True
+                if flight is not None and flight["result"]:
+                    self.result = StreamResult(**json.loads(flight["result"]))
+                return
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Shared run for {self.key} did not finish in {timeout} s")
+            time.sleep(self.registry.poll_interval)
+
+
+class SingleFlight:
+    """Coalesces identical queries in flight in any worker process onto a single run."""
+
+    def __init__(self, timeout=None, path=None, poll_interval=None, flush_interval=None):
+        """
+        Initialize the registry.
+
+        Args:
+            timeout: Seconds a session follows another session's run before giving up
+                and starting its own. Defaults to SINGLE_FLIGHT_TIMEOUT; 0 disables coalescing.
+            path: SQLite database shared by the worker processes. Defaults to $CACHE_DIR/single_flight.sqlite3.
+            poll_interval: Seconds between a subscriber's reads of new deltas. Defaults to SINGLE_FLIGHT_POLL_INTERVAL.
+            flush_interval: Minimum seconds between the owner's writes of deltas. Defaults to poll_interval.
+        """
+        self.timeout = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "120")) if timeout is None else timeout
+        self.path = path or os.path.join(os.getenv("CACHE_DIR", ".cache"), "single_flight.sqlite3")
+        self.poll_interval = (
+            float(os.getenv("SINGLE_FLIGHT_POLL_INTERVAL", "0.05")) if poll_interval is None else poll_interval
+        )
+        self.flush_interval = self.poll_interval if flush_interval is None else flush_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.coalesced = get_metrics().counter(
+            "sba_coalesced_queries", "Queries answered by following another session's identical run."
+        )
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def join(self, key):
+        """
+        Return ``(broadcast, leader)`` for the query ``key``.
+
+        The first caller becomes the leader: it runs the query, publishes to the
+        broadcast and must call ``finish``. Later callers get the same broadcast
+        to subscribe to. Returns ``(None, True)`` when coalescing is disabled.
+        """
+        if not self.timeout:
+            return None, True
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # A flight older than the timeout has no followers left; its owner likely died
+            row = connection.execute(
+                "SELECT id FROM flights WHERE key = ? AND done = 0 AND started_at > ? "
+                "ORDER BY started_at DESC LIMIT 1",
+                (key, now - self.timeout),
+            ).fetchone()
+            if row is not None:
+                connection.execute("UPDATE flights SET subscribers = subscribers + 1 WHERE id = ?", (row["id"],))
+                broadcast, leader = Broadcast(self, row["id"], key), False
+            else:
+                self._purge(connection, now)
+                flight_id = uuid.uuid4().hex
+                connection.execute(
+                    "INSERT INTO flights (id, key, started_at) VALUES (?, ?, ?)", (flight_id, key, now)
+                )
+                broadcast, leader = Broadcast(self, flight_id, key), True
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        with self._lock:
+            if leader:
+                self.leaders += 1
+            else:
+                self.followers += 1
+        return broadcast, leader
+
+    def _purge(self, connection, now):
+        # Followers join within the timeout and follow for at most as long again
+        cutoff = now - 2 * self.timeout
+        connection.execute(
+            "DELETE FROM flight_chunks WHERE flight_id IN (SELECT id FROM flights WHERE started_at < ?)", (cutoff,)
+        )
+        connection.execute("DELETE FROM flights WHERE started_at < ?", (cutoff,))
+
+    def finish(self, broadcast, result=None):
+        """End the leader's flight; new callers for the same key start a fresh run."""
+        if broadcast is None or broadcast.done:
+            return
+        broadcast.finish(result)
+        if result is not None and result.status == "completed":
+            self.coalesced.inc(broadcast.subscribers)
+
+    def stats(self):
+        row = self._connection().execute(
+            "SELECT COUNT(*) AS in_flight, COALESCE(SUM(subscribers), 0) AS waiting FROM flights "
+            "WHERE done = 0 AND started_at > ?",
+            (time.time() - self.timeout,),
+        ).fetchone()
+        with self._lock:
+            return {
+                "in_flight": row["in_flight"],
+                "waiting": row["waiting"],
+                "leaders": self.leaders,
+                "followers": self.followers,
+            }
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    """Return the process-wide single-flight registry."""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
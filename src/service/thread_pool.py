@@ -0,0 +1,199 @@
+import os
+import time
+import atexit
+import sqlite3
+import logging
+import threading
+from service.ai_service import AIAssistantManager
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ready_threads (
+    thread_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ready_threads_created ON ready_threads (created_at);
+"""
+
+
+class ThreadPool:
+    """
+    Bounded pool of pre-created assistant threads, refilled in the background.
+
+    Ready threads are kept in SQLite, so every worker process sharing CACHE_DIR
+    draws from and refills one pool of ``size`` threads.
+    """
+
+    def __init__(self, size=None, ttl=None, refill_interval=5.0,
+                 create_thread=None, delete_thread=None, path=None):
+        """
+        Initialize the pool.
+
+        Args:
+            size: Number of ready threads to keep across all processes. Defaults to THREAD_POOL_SIZE.
+            ttl: Seconds a ready thread may wait before it is evicted. Defaults to THREAD_POOL_TTL.
+            refill_interval: Seconds between refill and eviction passes.
+            create_thread: Callable returning a new thread ID (or None on failure).
+            delete_thread: Callable deleting a thread by ID.
+            path: SQLite database of ready threads. Defaults to $CACHE_DIR/thread_pool.sqlite3.
+        """
+        self.size = int(os.getenv("THREAD_POOL_SIZE", "4")) if size is None else size
+        self.ttl = float(os.getenv("THREAD_POOL_TTL", "3600")) if ttl is None else ttl
+        self.refill_interval = refill_interval
+        self._create_thread = create_thread or AIAssistantManager.create_thread
+        self._delete_thread = delete_thread or AIAssistantManager.delete_thread
+        self.path = path or os.path.join(os.getenv("CACHE_DIR", ".cache"), "thread_pool.sqlite3")
+        self._local = threading.local()
+        self._retired = []  # threads no longer used, deleted by the worker
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._worker = None
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.evicted = 0
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _ready_count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM ready_threads").fetchone()[0]
+
+    def start(self):
+        """Start the background refill worker if it is not already running."""
+        with self._lock:
+            if self.size <= 0 or self._stopped.is_set():
+                return
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="thread-pool-refill", daemon=True)
+                self._worker.start()
+
+    def acquire(self):
+        """Return a ready thread ID, creating one synchronously if the pool is empty."""
+        # Claimed in one statement, so two processes never get the same thread;
+        # expired threads are left for the worker to delete
+        row = self._connection().execute(
+            "DELETE FROM ready_threads WHERE thread_id = ("
+            "SELECT thread_id FROM ready_threads WHERE created_at > ? ORDER BY created_at DESC LIMIT 1"
+            ") RETURNING thread_id",
+            (time.time() - self.ttl,),
+        ).fetchone()
+        thread_id = row[0] if row else None
+        with self._lock:
+            if thread_id:
+                self.hits += 1
+            else:
+                self.misses += 1
+        self._wakeup.set()
+        if thread_id:
+            return thread_id
+        return self._create_thread()
+
+    def retire(self, thread_id):
+        """Delete a thread that is no longer used, in the background when the worker runs."""
+        with self._lock:
+            queued = self._worker is not None and self._worker.is_alive()
+            if queued:
+                self._retired.append(thread_id)
+        if queued:
+            self._wakeup.set()
+        else:
+            self._delete_thread(thread_id)
+
+    def _delete_retired(self):
+        with self._lock:
+            retired, self._retired = self._retired, []
+        for thread_id in retired:
+            self._delete_thread(thread_id)
+
+    def _evict_expired(self):
+        # Also trims the oldest threads beyond ``size``, left by processes refilling at the same time
+        expired = [row[0] for row in self._connection().execute(
+            "DELETE FROM ready_threads WHERE created_at <= ? OR thread_id NOT IN ("
+            "SELECT thread_id FROM ready_threads ORDER BY created_at DESC LIMIT ?"
+            ") RETURNING thread_id",
+            (time.time() - self.ttl, self.size),
+        ).fetchall()]
+        with self._lock:
+            self.evicted += len(expired)
+        for thread_id in expired:
+            self._delete_thread(thread_id)
+
+    def _fill(self):
+        while not self._stopped.is_set():
+            if self._ready_count() >= self.size:
+                return
+            thread_id = self._create_thread()
+            if not thread_id:
+                # Back off until the next pass rather than hammering the API
+                return
+            self._connection().execute(
+                "INSERT INTO ready_threads (thread_id, created_at) VALUES (?, ?)", (thread_id, time.time())
+            )
+            with self._lock:
+                self.created += 1
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self._delete_retired()
+                self._evict_expired()
+                self._fill()
+            except Exception as e:
+                logging.error(f"Error refilling thread pool: {e}")
+            self._wakeup.wait(self.refill_interval)
+            self._wakeup.clear()
+
+    def stats(self):
+        """Return the shared pool's size and this process's hit/miss counters."""
+        ready = self._ready_count()
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "ready": ready,
+                "size": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / requests, 3) if requests else 0.0,
+                "created": self.created,
+                "evicted": self.evicted,
+            }
+
+    def shutdown(self, timeout=5.0):
+        """
+        Stop the worker and delete the retired threads.
+
+        Ready threads stay in the shared pool for the other processes; whichever
+        worker runs next evicts them once they expire.
+        """
+        self._stopped.set()
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+        self._delete_retired()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_thread_pool():
+    """Return the process-wide handle on the shared thread pool, starting its worker on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPool()
+                atexit.register(_pool.shutdown)
+    _pool.start()
+    return _pool
@@ -0,0 +1,232 @@
+import os
+import json
+import hashlib
+import logging
+import mimetypes
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from service.client import operation_timeout
+from service.scanner import MAX_BATCH_FILES, scan_files
+
+# Mime types the standard library does not know on every platform
+MIME_TYPES = {
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".py": "text/x-python",
+}
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hash a file in fixed-size chunks so memory use does not depend on file size."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class VectorStoreSync:
+    """Incrementally mirrors a local directory into an OpenAI vector store."""
+
+    def __init__(self, client, vector_store_id, directory, manifest_path=None,
+                 max_workers=None, large_file_bytes=None, part_size=None):
+        """
+        Initialize the sync.
+
+        Args:
+            client: OpenAI client.
+            vector_store_id: Vector store to keep in sync.
+            directory: Local directory whose supported files are mirrored.
+            manifest_path: JSON manifest of uploaded content hashes.
+                Defaults to $CACHE_DIR/vector_sync/<vector_store_id>.json.
+            max_workers: Parallel uploads and deletions. Defaults to VECTOR_SYNC_WORKERS.
+            large_file_bytes: Files at least this large are uploaded in parts.
+            part_size: Size of each part of a chunked upload.
+        """
+        self.client = client
+        self.vector_store_id = vector_store_id
+        self.directory = directory
+        self.manifest_path = manifest_path or os.path.join(
+            os.getenv("CACHE_DIR", ".cache"), "vector_sync", f"{vector_store_id}.json"
+        )
+        self.max_workers = int(os.getenv("VECTOR_SYNC_WORKERS", "8")) if max_workers is None else max_workers
+        self.large_file_bytes = large_file_bytes or 32 * 1024 * 1024
+        self.part_size = part_size or 16 * 1024 * 1024
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, "r") as file:
+                manifest = json.load(file)
+            if manifest.get("vector_store_id") == self.vector_store_id:
+                return manifest.get("files", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable vector store manifest {self.manifest_path}: {e}")
+        return {}
+
+    def save_manifest(self, files):
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump({"vector_store_id": self.vector_store_id, "files": files}, file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+
+    def local_files(self):
+        """Return {relative path: absolute path} for every supported file under the directory."""
+        return {
+            os.path.relpath(entry.path, self.directory): entry.path
+            for entry in scan_files(self.directory)
+        }
+
+    def _upload(self, path):
+        """Upload one file, in parts when it is large. Returns the new file ID."""
+        size = os.path.getsize(path)
+        if size >= self.large_file_bytes:
+            extension = os.path.splitext(path)[1].lower()
+            mime_type = MIME_TYPES.get(extension) or mimetypes.guess_type(path)[0] or "application/octet-stream"
+            upload = self.client.uploads.upload_file_chunked(
+                file=Path(path),
+                mime_type=mime_type,
+                purpose="assistants",
+                part_size=self.part_size,
+            )
+            return upload.file.id
+        with open(path, "rb") as file:
+            uploaded = self.client.files.create(
+                file=file, purpose="assistants", timeout=operation_timeout("vector_stores.upload")
+            )
+        return uploaded.id
+
+    def _delete(self, file_id):
+        """Detach a file from the vector store and delete it."""
+        try:
+            self.client.beta.vector_stores.files.delete(
+                file_id, vector_store_id=self.vector_store_id, timeout=operation_timeout("default")
+            )
+        except Exception as e:
+            logging.warning(f"Error detaching file {file_id} from vector store: {e}")
+        try:
+            self.client.files.delete(file_id, timeout=operation_timeout("default"))
+        except Exception as e:
+            logging.warning(f"Error deleting file {file_id}: {e}")
+
+    def _attach(self, file_ids):
+        """Add uploaded files to the vector store in one file batch. Returns the IDs that were indexed."""
+        try:
+            batch = self.client.beta.vector_stores.file_batches.create_and_poll(
+                vector_store_id=self.vector_store_id,
+                file_ids=file_ids,
+            )
+        except Exception as e:
+            logging.error(f"Error adding {len(file_ids)} files to vector store {self.vector_store_id}: {e}")
+            return set()
+        if batch.status == "completed" and not batch.file_counts.failed and not batch.file_counts.cancelled:
+            return set(file_ids)
+        logging.error(
+            f"File batch {batch.id} ended {batch.status}: {batch.file_counts.failed} failed, "
+            f"{batch.file_counts.cancelled} cancelled of {batch.file_counts.total}"
+        )
+        try:
+            return {
+                file.id for file in self.client.beta.vector_stores.file_batches.list_files(
+                    batch.id, vector_store_id=self.vector_store_id, filter="completed",
+                    timeout=operation_timeout("default"),
+                )
+            }
+        except Exception as e:
+            logging.error(f"Error listing files of batch {batch.id}: {e}")
+            return set()
+
+    def sync(self):
+        """
+        Upload new and changed files and delete removed ones.
+
+        Returns:
+            A dict counting uploaded, updated, deleted, unchanged and failed files.
+        """
+        manifest = self.load_manifest()
+        local = self.local_files()
+        summary = {"uploaded": 0, "updated": 0, "deleted": 0, "unchanged": 0, "failed": 0}
+
+        stats = {rel: os.stat(path) for rel, path in local.items()}
+
+        def fingerprint(rel):
+            # Files with the size and modification time recorded in the manifest are not read again
+            entry = manifest.get(rel, {})
+            if entry.get("size") == stats[rel].st_size and entry.get("mtime") == stats[rel].st_mtime:
+                return entry["sha256"]
+            return file_sha256(local[rel])
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            hashes = dict(zip(local, executor.map(fingerprint, local)))
+
+            changed = [rel for rel in local if manifest.get(rel, {}).get("sha256") != hashes[rel]]
+            removed = [rel for rel in manifest if rel not in local]
+            summary["unchanged"] = len(local) - len(changed)
+
+            def upload(rel):
+                try:
+                    return rel, self._upload(local[rel])
+                except Exception as e:
+                    logging.error(f"Error uploading {local[rel]}: {e}")
+                    return rel, None
+
+            uploaded = {}
+            for rel, file_id in executor.map(upload, changed):
+                if file_id:
+                    uploaded[rel] = file_id
+                else:
+                    summary["failed"] += 1
+
+            # Attach the new files in batches within the API limit; a failed batch only loses its own files
+            if uploaded:
+                file_ids = list(uploaded.values())
+                attached = set()
+                for start in range(0, len(file_ids), MAX_BATCH_FILES):
+                    attached |= self._attach(file_ids[start:start + MAX_BATCH_FILES])
+                failed = [rel for rel, file_id in uploaded.items() if file_id not in attached]
+                # Failed files keep their previous manifest entry, so the next sync retries them
+                list(executor.map(self._delete, [uploaded.pop(rel) for rel in failed]))
+                summary["failed"] += len(failed)
+
+            stale = [manifest[rel]["file_id"] for rel in removed]
+            stale += [manifest[rel]["file_id"] for rel in uploaded if rel in manifest]
+            list(executor.map(self._delete, stale))
+
+        for rel, file_id in uploaded.items():
+            summary["updated" if rel in manifest else "uploaded"] += 1
+            manifest[rel] = {"sha256": hashes[rel], "file_id": file_id}
+        for rel in local:
+            # Unchanged files touched since the last sync are not hashed again next time
+            if manifest.get(rel, {}).get("sha256") == hashes[rel]:
+                manifest[rel].update(size=stats[rel].st_size, mtime=stats[rel].st_mtime)
+        for rel in removed:
+            del manifest[rel]
+            summary["deleted"] += 1
+        self.save_manifest(manifest)
+
+        logging.info(f"Synced vector store {self.vector_store_id}: {summary}")
+        return summary
+
+
+if __name__ == "__main__":
+    # Nightly refresh: python -m service.vector_sync data --vector-store-id vs_...
+    import argparse
+    from dotenv import load_dotenv
+    from service.ai_service import AIAssistantManager
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Incrementally sync a directory into a vector store.")
+    parser.add_argument("directory", nargs="?", default="data")
+    parser.add_argument("--vector-store-id", default=os.getenv("VECTOR_STORE_ID"))
+    parser.add_argument("--preprocess", action="store_true",
+                        help="convert spreadsheets to compact CSV/JSONL chunks before uploading")
+    args = parser.parse_args()
+    vector_store_id = AIAssistantManager.sync_vector_store(
+        args.vector_store_id, args.directory, preprocess=args.preprocess
+    )
+    print(vector_store_id or "Sync failed; see the log for details.")
@@ -1,5 +1,17 @@
 import base64
 import os
+from functools import lru_cache
+
+# Served by Streamlit at /app/static/<name> when server.enableStaticServing is on
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+PARTICLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "particles", "frontend")
+
+AVATAR_FILES = {
+    "assistant": "assistant.gif",
+    "user": "user.gif",
+}
+
+@lru_cache(maxsize=None)
 def get_page_styling():
     return """
     <style>
@@ -43,7 +55,17 @@ def get_page_styling():
     </style>
     """
 
+@lru_cache(maxsize=None)
 def get_particles_js():
+    """Self-contained particles.js page for ``components.html`` (inlines the vendored library if present)"""
+    with open(os.path.join(PARTICLES_DIR, "particles.json"), "r") as f:
+        config = f.read()
+    try:
+        with open(os.path.join(PARTICLES_DIR, "particles.min.js"), "r", encoding="utf-8") as f:
+            # "</" would end the inline script early
+            library = "<script>%s</script>" % f.read().replace("</", "<\\/")
+    except FileNotFoundError:
+        library = '<script src="https://cdnjs.cloudflare.com/ajax/libs/particles.js/2.0.0/particles.min.js"></script>'
     return """<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -70,129 +92,32 @@ def get_particles_js():
   <div id="particles-js"></div>
   <div class="content">
   </div>
-  <script src="https://cdnjs.cloudflare.com/ajax/libs/particles.js/2.0.0/particles.min.js"></script>
+  %s
   <script>
-    particlesJS("particles-js", {
-      "particles": {
-        "number": {
-          "value": 300,
-          "density": {
-            "enable": true,
-            "value_area": 800
-          }
-        },
-        "color": {
-          "value": "#ffffff"
-        },
-        "shape": {
-          "type": "circle",
-          "stroke": {
-            "width": 0,
-            "color": "#000000"
-          },
-          "polygon": {
-            "nb_sides": 5
-          }
-        },
-        "opacity": {
-          "value": 0.5,
-          "random": false,
-          "anim": {
-            "enable": false,
-            "speed": 1,
-            "opacity_min": 0.2,
-            "sync": false
-          }
-        },
-        "size": {
-          "value": 2,
-          "random": true,
-          "anim": {
-            "enable": false,
-            "speed": 40,
-            "size_min": 0.1,
-            "sync": false
-          }
-        },
-        "line_linked": {
-          "enable": true,
-          "distance": 100,
-          "color": "#ffffff",
-          "opacity": 0.22,
-          "width": 1
-        },
-        "move": {
-          "enable": true,
-          "speed": 0.2,
-          "direction": "none",
-          "random": false,
-          "straight": false,
-          "out_mode": "out",
-          "bounce": true,
-          "attract": {
-            "enable": false,
-            "rotateX": 600,
-            "rotateY": 1200
-          }
-        }
-      },
-      "interactivity": {
-        "detect_on": "canvas",
-        "events": {
-          "onhover": {
-            "enable": true,
-            "mode": "grab"
-          },
-          "onclick": {
-            "enable": true,
-            "mode": "repulse"
-          },
-          "resize": true
-        },
-        "modes": {
-          "grab": {
-            "distance": 100,
-            "line_linked": {
-              "opacity": 1
-            }
-          },
-          "bubble": {
-            "distance": 400,
-            "size": 2,
-            "duration": 2,
-            "opacity": 0.5,
-            "speed": 1
-          },
-          "repulse": {
-            "distance": 200,
-            "duration": 0.4
-          },
-          "push": {
-            "particles_nb": 2
-          },
-          "remove": {
-            "particles_nb": 3
-          }
-        }
-      },
-      "retina_detect": true
-    });
+    particlesJS("particles-js", %s);
   </script>
 </body>
 </html>
-"""
-# read gif file
+""" % (library, config)
+@lru_cache(maxsize=None)
 def read_gif(file_name):
-    with open(os.path.join(os.getcwd(),file_name),'rb') as f:
-        contents=f.read()
-        data_url=base64.b64encode(contents).decode('utf-8')
-    return data_url
+    """Base64-encode a GIF once per process"""
+    with open(os.path.join(STATIC_DIR, file_name), 'rb') as f:
+        contents = f.read()
+    return base64.b64encode(contents).decode('utf-8')
 
-# create variables for gif files
-ASSISTANT_GIF = read_gif('assets/assistant.gif')
-USER_GIF = read_gif('assets/user.gif')
+def static_url(file_name, base_url):
+    """URL of a file in STATIC_DIR served under ``base_url`` (e.g. http://host:8501)"""
+    return f"{base_url.rstrip('/')}/app/static/{file_name}"
 
-AVATAR_URLS = {
-    "assistant": f"data:image/gif;base64,{ASSISTANT_GIF}",
-    "user": f"data:image/gif;base64,{USER_GIF}",
-}
\ No newline at end of file
+def get_avatar_urls(base_url=None):
+    """
+    Avatar image URLs by role.
+
+    With a ``base_url`` the avatars are referenced as static files the browser
+    fetches and caches once; otherwise they fall back to data URIs, which are
+    embedded in every chat message.
+    """
+    if base_url:
+        return {role: static_url(name, base_url) for role, name in AVATAR_FILES.items()}
+    return {role: f"data:image/gif;base64,{read_gif(name)}" for role, name in AVATAR_FILES.items()}
@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The app imports its modules relative to src/, as `streamlit run src/app.py` does
+sys.path.insert(0, os.path.join(ROOT, "src"))
+# The local Assistants API stand-in used by the benchmarks
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
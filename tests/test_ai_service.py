@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+from service import ai_service
+from service.ai_service import AIAssistantManager
+
+
+def _stub_threads(monkeypatch, stream_run):
+    deleted = []
+    monkeypatch.setattr(AIAssistantManager, "init_client", staticmethod(lambda: object()))
+    monkeypatch.setattr(AIAssistantManager, "create_thread", staticmethod(lambda: "thread_new"))
+    monkeypatch.setattr(AIAssistantManager, "delete_thread", staticmethod(deleted.append))
+    monkeypatch.setattr(ai_service, "stream_run", stream_run)
+    return deleted
+
+
+def test_answer_query_deletes_the_thread_it_created(monkeypatch):
+    result = SimpleNamespace(status="completed", text="Sales are up.")
+    deleted = _stub_threads(monkeypatch, lambda client, thread_id, assistant_id, **kwargs: result)
+
+    assert AIAssistantManager.answer_query("Weekly sales", assistant_id="asst_test") is result
+    assert deleted == ["thread_new"]
+
+
+def test_answer_query_deletes_the_thread_after_a_failed_run(monkeypatch):
+    def stream_run(client, thread_id, assistant_id, **kwargs):
+        raise RuntimeError("run failed")
+
+    deleted = _stub_threads(monkeypatch, stream_run)
+
+    assert AIAssistantManager.answer_query("Weekly sales", assistant_id="asst_test") is None
+    assert deleted == ["thread_new"]
+
+
+def test_answer_query_keeps_a_thread_it_was_given(monkeypatch):
+    result = SimpleNamespace(status="completed", text="Sales are up.")
+    deleted = _stub_threads(monkeypatch, lambda client, thread_id, assistant_id, **kwargs: result)
+
+    assert AIAssistantManager.answer_query("Weekly sales", thread_id="thread_own", assistant_id="asst_test") is result
+    assert deleted == []
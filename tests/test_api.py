@@ -0,0 +1,159 @@
+import json
+import time
+import asyncio
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from mock_openai import MockConfig, MockServer
+from api import create_app, sync_jobs_key
+from service import response_cache
+from service.async_ai_service import AsyncAIAssistantManager
+from service.response_cache import ResponseCache
+
+
+@pytest.fixture
+def mock_api(monkeypatch, tmp_path):
+    """Start the mock Assistants API with the given MockConfig fields and point the clients at it."""
+    servers = []
+
+    def start(**config):
+        server = MockServer(MockConfig(latency=0, run_start=0.01, ttft=0.01, **config)).start()
+        servers.append(server)
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        return server
+
+    monkeypatch.setenv("OPENAI_API_KEY", "mock")
+    monkeypatch.setenv("API_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.delenv("API_KEY", raising=False)
+    monkeypatch.setattr(response_cache, "_cache", ResponseCache(path=str(tmp_path / "responses.sqlite3")))
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def _call(test):
+    """Run ``test(client)`` against a fresh API app on its own event loop."""
+    async def main():
+        app = create_app(AsyncAIAssistantManager(assistant_id="asst_mock", spare_threads=0))
+        async with TestClient(TestServer(app)) as client:
+            return await test(client)
+
+    return asyncio.run(main())
+
+
+def _events(body):
+    """Parse a Server-Sent Events body into (event, data) pairs."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_query_answers_and_then_serves_from_cache(mock_api):
+    server = mock_api(tokens_per_second=1000, response_tokens=8)
+
+    async def test(client):
+        first = await client.post("/v1/query", json={"query": "Overall KPIs"})
+        second = await client.post("/v1/query", json={"query": "overall KPIs?"})
+        return first.status, await first.json(), second.status, await second.json()
+
+    first_status, first, second_status, second = _call(test)
+    assert (first_status, first["status"], first["cached"]) == (200, "completed", False)
+    assert first["text"].startswith("OEE at the Smithfield plant")
+    assert (second_status, second["cached"], second["text"]) == (200, True, first["text"])
+    assert len(server.state.runs) == 1
+
+
+def test_stream_sends_server_sent_events(mock_api):
+    mock_api(tokens_per_second=1000, response_tokens=5)
+
+    async def test(client):
+        response = await client.post("/v1/stream", json={"query": "Overall KPIs"})
+        return response.headers["Content-Type"], await response.text()
+
+    content_type, body = _call(test)
+    events = _events(body)
+    assert content_type == "text/event-stream"
+    assert events[0][0] == "run"
+    deltas = [data["text"] for event, data in events if event == "delta"]
+    assert len(deltas) == 5
+    assert events[-1][0] == "done"
+    assert events[-1][1]["status"] == "completed"
+    assert events[-1][1]["text"] == "".join(deltas)
+
+
+def test_client_disconnect_cancels_the_run(mock_api):
+    server = mock_api(tokens_per_second=10, response_tokens=200)
+
+    async def test(client):
+        response = await client.post("/v1/stream", json={"query": "Overall KPIs"})
+        run = None
+        while True:
+            line = (await response.content.readline()).decode("utf-8")
+            if line.startswith("data: ") and run is None:
+                run = json.loads(line[len("data: "):])
+            if line.startswith("event: delta"):
+                break
+        response.close()
+        for _ in range(100):
+            if server.state.runs[run["run_id"]]["cancelled"]:
+                break
+            await asyncio.sleep(0.05)
+        return run["run_id"]
+
+    run_id = _call(test)
+    assert server.state.runs[run_id]["cancelled"]
+
+
+def test_bad_requests_are_rejected(mock_api):
+    mock_api()
+
+    async def test(client):
+        statuses = []
+        for path, data in (
+            ("/v1/query", "not json"),
+            ("/v1/query", json.dumps(["Overall KPIs"])),
+            ("/v1/query", json.dumps({"thread_id": "thread_1"})),
+            ("/v1/vector-store/sync", json.dumps({"directory": "../../etc"})),
+        ):
+            response = await client.post(path, data=data, headers={"Content-Type": "application/json"})
+            statuses.append(response.status)
+        return statuses
+
+    assert _call(test) == [400, 400, 400, 400]
+
+
+def test_api_key_is_required_when_set(mock_api, monkeypatch):
+    mock_api()
+    monkeypatch.setenv("API_KEY", "secret")
+
+    async def test(client):
+        health = await client.get("/health")
+        missing = await client.get("/metrics")
+        wrong = await client.get("/metrics", headers={"Authorization": "Bearer wrong"})
+        right = await client.get("/metrics", headers={"Authorization": "Bearer secret"})
+        return health.status, missing.status, wrong.status, right.status, await right.text()
+
+    health, missing, wrong, right, metrics = _call(test)
+    assert (health, missing, wrong, right) == (200, 401, 401, 200)
+    assert "sba_response_cache" in metrics
+
+
+def test_finished_sync_jobs_expire(mock_api, monkeypatch):
+    mock_api()
+    monkeypatch.setenv("API_SYNC_JOB_TTL", "60")
+
+    async def test(client):
+        jobs = client.server.app[sync_jobs_key]
+        now = time.time()
+        for job_id, finished_at in (("old", now - 120), ("recent", now - 10), ("running", None)):
+            jobs[job_id] = {
+                "id": job_id, "status": "completed" if finished_at else "running", "started_at": now - 300,
+                "finished_at": finished_at, "task": asyncio.get_running_loop().create_future(),
+            }
+        statuses = [(await client.get(f"/v1/vector-store/sync/{job_id}")).status for job_id in ("old", "recent")]
+        return statuses, sorted(jobs)
+
+    statuses, remaining = _call(test)
+    assert statuses == [404, 200]
+    assert remaining == ["recent", "running"]
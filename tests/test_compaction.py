@@ -0,0 +1,95 @@
+import itertools
+from types import SimpleNamespace
+from service.ai_service import AIAssistantManager
+from service.compaction import ContextBudget, compact_conversation
+from service.conversation_store import ConversationStore
+from service.thread_pool import ThreadPool
+
+
+class FakeClient:
+    """Just enough of the OpenAI client to write summaries; ``summaries`` of None fail."""
+
+    def __init__(self, summaries):
+        self.summaries = list(summaries)
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        self.requests.append(messages[-1]["content"])
+        summary = self.summaries.pop(0)
+        if summary is None:
+            raise RuntimeError("summary failed")
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=summary))])
+
+
+def _setup(tmp_path, monkeypatch, summaries):
+    client = FakeClient(summaries)
+    monkeypatch.setattr(AIAssistantManager, "init_client", staticmethod(lambda: client))
+    ids = itertools.count(1)
+    retired = []
+    pool = ThreadPool(
+        size=0,
+        path=str(tmp_path / "thread_pool.sqlite3"),
+        create_thread=lambda: f"thread_{next(ids)}",
+        delete_thread=retired.append,
+    )
+    store = ConversationStore(path=str(tmp_path / "conversations.sqlite3"))
+    conversation_id = store.create(thread_id="thread_0")
+    budget = ContextBudget(max_turns=3, keep_messages=2, retry_turns=2)
+    return client, pool, store, conversation_id, budget, retired
+
+
+def _turns(store, conversation_id, count):
+    for n in range(count):
+        store.append(conversation_id, "user", f"How did plant {n} do?")
+        store.append(conversation_id, "assistant", f"Plant {n} met its targets.")
+
+
+def test_long_conversations_move_to_a_summary_seeded_thread(tmp_path, monkeypatch):
+    client, pool, store, conversation_id, budget, retired = _setup(tmp_path, monkeypatch, ["- Plants 0-3 met targets"])
+    _turns(store, conversation_id, 4)
+    store.append(conversation_id, "user", "And plant 4?")
+    retry_at = {}
+
+    thread_id, seed, summarized = compact_conversation(store, pool, conversation_id, budget, retry_at)
+
+    assert (thread_id, summarized) == ("thread_1", 6)
+    assert "USER: How did plant 0 do?" in client.requests[0]
+    assert "plant 3" not in client.requests[0]
+    assert seed == [
+        {"role": "user", "content": "Summary of our conversation so far:\n\n- Plants 0-3 met targets"},
+        {"role": "user", "content": "How did plant 3 do?"},
+        {"role": "assistant", "content": "Plant 3 met its targets."},
+    ]
+    conversation = store.get(conversation_id)
+    assert conversation["thread_id"] == "thread_1"
+    assert conversation["pending_context"] == seed
+    assert conversation["thread_offset"] == 6
+    assert conversation["summary"] == "- Plants 0-3 met targets"
+    assert retired == ["thread_0"]
+
+    # The new thread is within budget until it grows again
+    store.append(conversation_id, "assistant", "Plant 4 missed its target.")
+    store.append(conversation_id, "user", "Why?")
+    assert compact_conversation(store, pool, conversation_id, budget, retry_at) is None
+
+
+def test_failed_summaries_are_retried_after_a_few_turns(tmp_path, monkeypatch):
+    client, pool, store, conversation_id, budget, retired = _setup(tmp_path, monkeypatch, [None, "- Summary"])
+    _turns(store, conversation_id, 4)
+    store.append(conversation_id, "user", "And plant 4?")
+    retry_at = {}
+
+    assert compact_conversation(store, pool, conversation_id, budget, retry_at) is None
+    # Waits retry_turns user turns (two messages each) before summarizing again
+    assert retry_at == {conversation_id: 9 + 2 * budget.retry_turns}
+    store.append(conversation_id, "assistant", "Plant 4 met its target.")
+    store.append(conversation_id, "user", "And plant 5?")
+    assert compact_conversation(store, pool, conversation_id, budget, retry_at) is None
+    assert len(client.requests) == 1
+
+    _turns(store, conversation_id, 2)
+    thread_id, _, _ = compact_conversation(store, pool, conversation_id, budget, retry_at)
+    assert thread_id == "thread_1"
+    assert retry_at == {}
+    assert retired == ["thread_0"]
@@ -0,0 +1,117 @@
+import threading
+from datetime import datetime
+from email import message_from_string
+from service.digest import DigestScheduler
+from service.mailer import build_message
+
+
+def _scheduler(tmp_path):
+    deliveries = []
+    scheduler = DigestScheduler(
+        path=str(tmp_path / "digests.sqlite3"),
+        answer=lambda query: f"Answer to: {query}",
+        send_batch=lambda recipients, content, subject: deliveries.append(sorted(recipients)) or {},
+    )
+    return scheduler, deliveries
+
+
+def test_identical_subscriptions_share_a_run_and_an_id(tmp_path):
+    scheduler, deliveries = _scheduler(tmp_path)
+    first = scheduler.subscribe("a@example.com", "Daily KPI summary", "0 7 * * *")
+    assert scheduler.subscribe("a@example.com", "daily KPI summary?", "0 7 * * *") == first
+    scheduler.subscribe("b@example.com", "Daily KPI summary", "0 7 * * *")
+
+    assert scheduler.run_pending(datetime(2024, 3, 4, 7, 0)) == 1
+    assert deliveries == [["a@example.com", "b@example.com"]]
+    # The same minute is not delivered twice
+    assert scheduler.run_pending(datetime(2024, 3, 4, 7, 0, 30)) == 0
+
+
+def test_minutes_skipped_by_a_slow_tick_are_caught_up(tmp_path):
+    scheduler, deliveries = _scheduler(tmp_path)
+    scheduler.subscribe("a@example.com", "Shift report", "1 7 * * *")
+    scheduler.subscribe("b@example.com", "Waste report", "2 7 * * *")
+
+    scheduler.run_pending(datetime(2024, 3, 4, 7, 0))
+    # The 7:00 tick ran long; the next one starts at 7:03
+    assert scheduler.run_pending(datetime(2024, 3, 4, 7, 3)) == 2
+    assert sorted(deliveries) == [["a@example.com"], ["b@example.com"]]
+
+
+def test_multi_line_queries_get_a_single_line_subject(tmp_path):
+    subjects = []
+    scheduler = DigestScheduler(
+        path=str(tmp_path / "digests.sqlite3"),
+        answer=lambda query: "Sales are up.",
+        send_batch=lambda recipients, content, subject: subjects.append(subject) or {},
+    )
+    scheduler.subscribe("a@example.com", "Weekly sales\nKey: value\n\nby region", "0 7 * * *")
+
+    assert scheduler.run_pending(datetime(2024, 3, 4, 7, 0)) == 1
+    assert subjects == ["SBA Performance Hub - Weekly sales"]
+    message = build_message("hub@example.com", "a@example.com", "Sales are up.", subjects[0])
+    assert message_from_string(message.as_string())["Subject"] == subjects[0]
+
+
+def test_schedulers_sharing_a_database_run_each_query_once(tmp_path):
+    path = str(tmp_path / "digests.sqlite3")
+    answers = []
+    deliveries = []
+    schedulers = [
+        DigestScheduler(
+            path=path,
+            answer=lambda query: answers.append(query) or f"Answer to: {query}",
+            send_batch=lambda recipients, content, subject: deliveries.extend(recipients) or {},
+        )
+        for _ in range(2)
+    ]
+    recipients = [f"manager{n}@example.com" for n in range(40)]
+    for email in recipients:
+        schedulers[0].subscribe(email, "Daily KPI summary", "0 7 * * *")
+
+    # Both processes tick at the same minute
+    barrier = threading.Barrier(len(schedulers))
+
+    def tick(scheduler):
+        barrier.wait()
+        scheduler.run_pending(datetime(2024, 3, 4, 7, 0))
+
+    threads = [threading.Thread(target=tick, args=(scheduler,)) for scheduler in schedulers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert answers == ["Daily KPI summary"]
+    assert sorted(deliveries) == sorted(recipients)
+
+
+def test_failed_runs_are_retried_on_the_next_tick(tmp_path):
+    failures = {"Shift report": 1, "Waste report": 1}
+    deliveries = []
+
+    def answer(query):
+        if query == "Shift report" and failures[query]:
+            failures[query] -= 1
+            raise RuntimeError("assistant unavailable")
+        return f"Answer to: {query}"
+
+    def send_batch(recipients, content, subject):
+        if content == "Answer to: Waste report" and failures["Waste report"]:
+            failures["Waste report"] -= 1
+            raise OSError("SMTP unavailable")
+        deliveries.append(sorted(recipients))
+        return {}
+
+    scheduler = DigestScheduler(path=str(tmp_path / "digests.sqlite3"), answer=answer, send_batch=send_batch)
+    scheduler.subscribe("a@example.com", "Shift report", "0 7 * * *")
+    scheduler.subscribe("b@example.com", "Waste report", "0 7 * * *")
+    scheduler.subscribe("c@example.com", "Daily KPI summary", "0 7 * * *")
+
+    # A failing query does not stop the others
+    assert scheduler.run_pending(datetime(2024, 3, 4, 7, 0)) == 3
+    assert deliveries == [["c@example.com"]]
+    # Both failures are retried, and only they
+    assert scheduler.run_pending(datetime(2024, 3, 4, 7, 1)) == 2
+    assert sorted(deliveries) == [["a@example.com"], ["b@example.com"], ["c@example.com"]]
+    assert scheduler.run_pending(datetime(2024, 3, 4, 7, 2)) == 0
@@ -0,0 +1,142 @@
+import time
+import socket
+import pytest
+from aiosmtpd.controller import Controller
+from service import mailer
+from service.email_queue import EmailJobQueue, TransientJobError, send_email_report
+
+
+class SMTPStandIn:
+    """aiosmtpd handler that records messages and can answer the next ones with 451."""
+
+    def __init__(self):
+        self.messages = []
+        self.temporary_failures = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.temporary_failures:
+            self.temporary_failures -= 1
+            return "451 Requested action aborted: try again later"
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    handler = SMTPStandIn()
+    controller = Controller(handler, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    config = mailer.SMTPConfig(
+        host="127.0.0.1", port=controller.port, starttls=False, auth=False, from_email="reports@example.com"
+    )
+    pool = mailer.SMTPPool(config, size=2, idle_timeout=60, batch_size=50)
+    monkeypatch.setattr(mailer, "_pool", pool)
+    yield handler
+    pool.close()
+    controller.stop()
+
+
+class Answers:
+    """Stand-in for the assistant that counts how often each query was answered."""
+
+    def __init__(self, failures=0):
+        self.calls = 0
+        self.failures = failures
+
+    def __call__(self, query):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise TransientJobError("Assistant run failed")
+        return f"Answer to: {query}"
+
+
+def _queue(tmp_path, answer, **kwargs):
+    kwargs.setdefault("max_attempts", 3)
+    queue = EmailJobQueue(
+        path=str(tmp_path / "email_jobs.sqlite3"), workers=2, retry_delay=0.05,
+        answer=answer, send=send_email_report, **kwargs
+    )
+    queue.start()
+    return queue
+
+
+def _wait(queue, job_id, statuses=("sent", "failed"), timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.status(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.02)
+    pytest.fail(f"Job {job_id} did not finish: {queue.status(job_id)}")
+
+
+def test_job_is_answered_and_sent(tmp_path, smtp):
+    answers = Answers()
+    queue = _queue(tmp_path, answers)
+    try:
+        job = _wait(queue, queue.submit("manager@example.com", "Daily KPI summary"))
+    finally:
+        queue.shutdown()
+    assert job["status"] == "sent"
+    assert job["attempts"] == 1
+    assert [message.rcpt_tos for message in smtp.messages] == [["manager@example.com"]]
+    assert "Answer to: Daily KPI summary" in smtp.messages[0].content.decode()
+
+
+def test_transient_smtp_failure_is_retried_without_rerunning_the_query(tmp_path, smtp):
+    smtp.temporary_failures = 1
+    answers = Answers()
+    queue = _queue(tmp_path, answers)
+    try:
+        job = _wait(queue, queue.submit("manager@example.com", "Daily KPI summary"))
+    finally:
+        queue.shutdown()
+    assert job["status"] == "sent"
+    assert job["attempts"] == 2
+    assert answers.calls == 1
+    assert len(smtp.messages) == 1
+
+
+def test_transient_run_failure_is_retried(tmp_path, smtp):
+    answers = Answers(failures=1)
+    queue = _queue(tmp_path, answers)
+    try:
+        job = _wait(queue, queue.submit("manager@example.com", "Daily KPI summary"))
+    finally:
+        queue.shutdown()
+    assert job["status"] == "sent"
+    assert answers.calls == 2
+
+
+def test_job_fails_after_max_attempts(tmp_path, smtp):
+    smtp.temporary_failures = 10
+    queue = _queue(tmp_path, Answers(), max_attempts=3)
+    try:
+        job = _wait(queue, queue.submit("manager@example.com", "Daily KPI summary"))
+    finally:
+        queue.shutdown()
+    assert job["status"] == "failed"
+    assert job["attempts"] == 3
+    assert "451" in job["error"]
+    assert smtp.messages == []
+
+
+def test_abandoned_jobs_count_towards_max_attempts(tmp_path, smtp):
+    queue = EmailJobQueue(
+        path=str(tmp_path / "email_jobs.sqlite3"), workers=0, max_attempts=2, stale_after=0, answer=Answers()
+    )
+    job_id = queue.submit("manager@example.com", "Daily KPI summary")
+    # Two workers claim the job and die before finishing it
+    assert queue._claim()["id"] == job_id
+    assert queue._claim()["id"] == job_id
+    assert queue._claim() is None
+    job = queue.status(job_id)
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
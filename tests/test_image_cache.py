@@ -0,0 +1,85 @@
+import os
+from service.image_cache import ImageCache
+
+
+class Files:
+    """Stand-in for the file download that counts requests per file_id."""
+
+    def __init__(self, size=10):
+        self.size = size
+        self.requests = []
+
+    def __call__(self, file_id):
+        self.requests.append(file_id)
+        return file_id.encode("utf-8").ljust(self.size, b".")
+
+
+def _age(cache, file_id, seconds):
+    path = cache._path(file_id)
+    stamp = os.path.getmtime(path) - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    files = Files()
+    cache = ImageCache(directory=str(tmp_path / "images"), max_memory_bytes=20, max_disk_bytes=1000, fetch=files)
+    cache.get("file_a")
+    cache.get("file_b")
+    # Reading file_a makes file_b the least recently used
+    cache.get("file_a")
+    cache.get("file_c")
+
+    assert list(cache._memory) == ["file_a", "file_c"]
+    assert cache.stats()["memory_evictions"] == 1
+    # The evicted file is still on disk
+    assert cache.get("file_b") == b"file_b...."
+    assert cache.stats()["disk_hits"] == 1
+    assert files.requests.count("file_b") == 1
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    files = Files()
+    cache = ImageCache(directory=str(tmp_path / "images"), max_memory_bytes=0, max_disk_bytes=25, fetch=files)
+    cache.get("file_a")
+    cache.get("file_b")
+    _age(cache, "file_a", 20)
+    _age(cache, "file_b", 30)
+    # Reading file_b from disk refreshes it
+    cache.get("file_b")
+    cache.get("file_c")
+
+    assert not os.path.exists(cache._path("file_a"))
+    assert os.path.exists(cache._path("file_b")) and os.path.exists(cache._path("file_c"))
+    stats = cache.stats()
+    assert (stats["disk_bytes"], stats["disk_evictions"]) == (20, 1)
+
+
+def test_disk_limit_holds_across_workers(tmp_path):
+    # Two worker processes share one cache directory
+    caches = [
+        ImageCache(directory=str(tmp_path / "images"), max_memory_bytes=0, max_disk_bytes=25, fetch=Files())
+        for _ in range(2)
+    ]
+    for n in range(6):
+        caches[n % 2].get(f"file_{n}")
+
+    assert caches[0].stats()["disk_bytes"] <= 25
+    assert len(os.listdir(tmp_path / "images")) == 2
+
+
+def test_disk_size_is_rescanned_only_when_stale_or_over_the_limit(tmp_path):
+    cache = ImageCache(directory=str(tmp_path / "images"), max_memory_bytes=0, max_disk_bytes=100, fetch=Files())
+    scans = []
+    disk_files = cache._disk_files
+    cache._disk_files = lambda: scans.append(1) or disk_files()
+    for n in range(3):
+        cache.get(f"file_{n}")
+    # Another worker's write is not seen until the next scan
+    (tmp_path / "images" / "other").write_bytes(b"x" * 10)
+
+    assert len(scans) == 1
+    assert cache.stats()["disk_bytes"] == 30
+    cache.scan_interval = 0
+    cache.get("file_3")
+    assert len(scans) == 2
+    assert cache.stats()["disk_bytes"] == 50
@@ -0,0 +1,104 @@
+import os
+import pandas as pd
+from service.preprocess import convert_spreadsheet, preprocess_directory
+
+
+def _header(path):
+    """The ``# key: value`` summary lines at the top of a CSV chunk."""
+    summary = {}
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.startswith("# "):
+                break
+            key, value = line[2:].rstrip("\n").split(": ", 1)
+            summary[key] = value
+    return summary
+
+
+def _production(rows):
+    return pd.DataFrame({
+        "Plant": [f"Plant {n % 2}" for n in range(rows)],
+        "Week": [n % 52 + 1 for n in range(rows)],
+        "Units": list(range(rows)),
+        "Yield %": [90.0 + n % 10 for n in range(rows)],
+        "Notes": [None] * rows,
+    })
+
+
+def test_csv_is_split_into_deduplicated_chunks(tmp_path):
+    frame = _production(5)
+    # Repeated rows, within and across chunks, are written once
+    pd.concat([frame, frame.iloc[:2]]).to_csv(tmp_path / "production.csv", index=False)
+
+    outputs = convert_spreadsheet(str(tmp_path / "production.csv"), str(tmp_path / "out"), chunk_rows=3)
+
+    assert [os.path.basename(output) for output in outputs] == [
+        "production.csv__part0001.csv", "production.csv__part0002.csv",
+    ]
+    chunks = [pd.read_csv(output, comment="#") for output in outputs]
+    assert sum(len(chunk) for chunk in chunks) == 5
+    # Empty columns are dropped
+    assert list(chunks[0].columns) == ["Plant", "Week", "Units", "Yield %"]
+
+
+def test_summary_describes_plants_periods_and_kpis(tmp_path):
+    _production(4).to_csv(tmp_path / "production.csv", index=False)
+
+    [output] = convert_spreadsheet(str(tmp_path / "production.csv"), str(tmp_path / "out"))
+
+    assert _header(output) == {
+        "source": "production.csv",
+        "plant": "Plant 0, Plant 1",
+        "period": "1 to 4",
+        "kpis": "Units, Yield %",
+        "rows": "4",
+    }
+
+
+def test_xlsx_sheets_are_chunked_separately(tmp_path):
+    with pd.ExcelWriter(tmp_path / "report.xlsx") as writer:
+        _production(3).to_excel(writer, sheet_name="North Plant", index=False)
+        pd.DataFrame({"Date": ["2024-03-01", "2024-03-08"], "Waste kg": [12.5, 9.0]}).to_excel(
+            writer, sheet_name="Waste", index=False
+        )
+
+    outputs = convert_spreadsheet(str(tmp_path / "report.xlsx"), str(tmp_path / "out"))
+
+    assert [os.path.basename(output) for output in outputs] == [
+        "report.xlsx__North_Plant__part0001.csv", "report.xlsx__Waste__part0002.csv",
+    ]
+    waste = _header(outputs[1])
+    assert (waste["sheet"], waste["period"], waste["kpis"]) == ("Waste", "2024-03-01 to 2024-03-08", "Waste kg")
+
+
+def test_similar_file_names_do_not_share_chunks(tmp_path):
+    source = tmp_path / "data"
+    source.mkdir()
+    _production(2).to_csv(source / "a.b.csv", index=False)
+    _production(3).to_csv(source / "a_b.csv", index=False)
+    (source / "notes.txt").write_text("Shift notes")
+
+    output_dir = preprocess_directory(str(source), str(tmp_path / "out"), max_workers=1)
+
+    names = sorted(name for name in os.listdir(output_dir) if not name.startswith("."))
+    assert names == ["a.b.csv__part0001.csv", "a_b.csv__part0001.csv", "notes.txt"]
+    assert _header(os.path.join(output_dir, "a_b.csv__part0001.csv"))["rows"] == "3"
+
+
+def test_measures_named_like_periods_stay_kpis(tmp_path):
+    pd.DataFrame({
+        "Plant": ["North", "South", "North"],
+        "Deadline": ["Q2", "Q2", "Q3"],
+        "Date": ["2024-03-01", "2024-03-02", "2024-03-03"],
+        "Downtime min": [12, 30, 5],
+        "Cycle Time s": [41.5, 39.0, 40.2],
+        "Shift Date": ["2024-01-01", "2024-01-02", "2024-01-03"],
+        "Units": [120, 95, 130],
+    }).to_csv(tmp_path / "downtime.csv", index=False)
+
+    [output] = convert_spreadsheet(str(tmp_path / "downtime.csv"), str(tmp_path / "out"))
+
+    summary = _header(output)
+    # Deadline is not a production line, and the first date column sets the period
+    assert (summary["plant"], summary["period"]) == ("North, South", "2024-03-01 to 2024-03-03")
+    assert summary["kpis"] == "Downtime min, Cycle Time s, Units"
@@ -0,0 +1,125 @@
+import time
+import asyncio
+import threading
+import httpx
+import openai
+import pytest
+from service.resilience import AsyncResilientTransport, CallGuard, ConcurrencyLimit, ResilientTransport
+from service.run_waiter import cancel_run
+
+
+def _client(guard, delay):
+    async def handler(request):
+        await asyncio.sleep(delay)
+        return httpx.Response(200, json={})
+
+    return httpx.AsyncClient(transport=AsyncResilientTransport(httpx.MockTransport(handler), guard))
+
+
+def test_cancelled_requests_free_their_slots():
+    guard = CallGuard(max_concurrency=2)
+
+    async def main():
+        async with _client(guard, delay=1.0) as client:
+            for _ in range(2):
+                try:
+                    await asyncio.wait_for(client.get("https://api.test/v1/threads"), 0.2)
+                except asyncio.TimeoutError:
+                    pass
+        async with _client(guard, delay=0) as client:
+            started = time.monotonic()
+            response = await asyncio.wait_for(client.get("https://api.test/v1/threads"), 1.0)
+            return response.status_code, time.monotonic() - started
+
+    status, elapsed = asyncio.run(main())
+    assert status == 200 and elapsed < 0.5
+    assert guard.slots.active == 0
+
+
+def test_cancelled_probe_does_not_keep_the_circuit_open():
+    guard = CallGuard(failure_threshold=1, reset_timeout=0)
+    guard.breaker.record(False)
+    assert guard.breaker.state == "open"
+
+    async def main():
+        async with _client(guard, delay=1.0) as client:
+            # The probe times out without an outcome
+            try:
+                await asyncio.wait_for(client.get("https://api.test/v1/threads"), 0.2)
+            except asyncio.TimeoutError:
+                pass
+        async with _client(guard, delay=0) as client:
+            return (await client.get("https://api.test/v1/threads")).status_code
+
+    assert asyncio.run(main()) == 200
+    assert guard.breaker.state == "closed"
+
+
+def test_open_streams_do_not_block_cancelling_their_runs():
+    guard = CallGuard(max_concurrency=2)
+    finish_streams = threading.Event()
+    cancelled = []
+
+    def events():
+        finish_streams.wait(5)
+        yield b"event: done\ndata: [DONE]\n\n"
+
+    def handler(request):
+        if request.url.path.endswith("/cancel"):
+            cancelled.append(request.url.path)
+            return httpx.Response(200, json={"id": "run_1", "object": "thread.run", "status": "cancelling"})
+        return httpx.Response(200, headers={"Content-Type": "text/event-stream"}, content=events())
+
+    http_client = httpx.Client(transport=ResilientTransport(httpx.MockTransport(handler), guard))
+    client = openai.OpenAI(api_key="test", base_url="https://api.test/v1", http_client=http_client, max_retries=0)
+    try:
+        # Every slot's worth of runs is streaming
+        streams = [http_client.stream("POST", f"https://api.test/v1/threads/thread_{n}/runs") for n in range(2)]
+        for stream in streams:
+            stream.__enter__()
+        canceller = threading.Thread(target=cancel_run, args=(client, "thread_0", "run_1"))
+        canceller.start()
+        canceller.join(5)
+        assert not canceller.is_alive()
+        assert cancelled == ["/v1/threads/thread_0/runs/run_1/cancel"]
+    finally:
+        finish_streams.set()
+        for stream in streams:
+            stream.__exit__(None, None, None)
+        http_client.close()
+    assert guard.slots.active == 0
+
+
+def test_waiting_for_a_slot_times_out():
+    limit = ConcurrencyLimit(1)
+    limit.acquire()
+    started = time.monotonic()
+    with pytest.raises(httpx.PoolTimeout):
+        limit.acquire(timeout=0.1)
+    assert time.monotonic() - started < 1
+    limit.release()
+    assert limit.active == 0 and limit.waiting() == 0
+
+
+def test_async_waiters_are_served_in_order():
+    limit = ConcurrencyLimit(1)
+    order = []
+
+    async def worker(name):
+        await limit.acquire_async()
+        order.append(name)
+        await asyncio.sleep(0.01)
+        limit.release()
+
+    async def main():
+        await limit.acquire_async()
+        tasks = []
+        for name in range(5):
+            tasks.append(asyncio.create_task(worker(name)))
+            await asyncio.sleep(0)
+        limit.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == [0, 1, 2, 3, 4]
+    assert limit.active == 0
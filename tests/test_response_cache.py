@@ -0,0 +1,93 @@
+import time
+from service.response_cache import ResponseCache
+
+SCOPE = ResponseCache.scope("asst_test", "vs_test")
+
+
+def _cache(tmp_path, **kwargs):
+    return ResponseCache(path=str(tmp_path / "responses.sqlite3"), **kwargs)
+
+
+def test_normalized_queries_share_an_entry(tmp_path):
+    cache = _cache(tmp_path, ttl=60, max_entries=10)
+    cache.put("View Overall KPIs", SCOPE, "KPIs are up.", ["file_1"])
+
+    assert cache.get("  view overall kpis? ", SCOPE) == {"response": "KPIs are up.", "images": ["file_1"]}
+    assert cache.stats()["hits"] == 1
+
+
+def test_entries_expire_after_the_ttl(tmp_path):
+    cache = _cache(tmp_path, ttl=0.05, max_entries=10)
+    cache.put("View Overall KPIs", SCOPE, "KPIs are up.")
+    time.sleep(0.1)
+
+    assert cache.get("View Overall KPIs", SCOPE) is None
+    # Expired entries are dropped on the next write
+    cache.put("Waste report", SCOPE, "Waste is down.")
+    assert cache.stats()["entries"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = _cache(tmp_path, ttl=60, max_entries=2)
+    cache.put("first", SCOPE, "1")
+    time.sleep(0.01)
+    cache.put("second", SCOPE, "2")
+    time.sleep(0.01)
+    # Reading the first entry makes the second the least recently used
+    assert cache.get("first", SCOPE)
+    time.sleep(0.01)
+    cache.put("third", SCOPE, "3")
+
+    assert cache.get("second", SCOPE) is None
+    assert cache.get("first", SCOPE) and cache.get("third", SCOPE)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_answers_do_not_cross_scopes(tmp_path):
+    cache = _cache(tmp_path, ttl=60, max_entries=10)
+    cache.put("View Overall KPIs", SCOPE, "KPIs are up.")
+
+    assert cache.get("View Overall KPIs", ResponseCache.scope("asst_test", "vs_test", "2")) is None
+    assert cache.get("View Overall KPIs", ResponseCache.scope("asst_other", "vs_test")) is None
+
+
+def test_similar_queries_match_by_embedding(tmp_path):
+    vectors = {
+        "show overall kpis": [1.0, 0.0, 0.1],
+        "overall kpi summary": [0.99, 0.0, 0.12],
+        "waste report": [0.0, 1.0, 0.0],
+    }
+    embedded = []
+
+    def embed(text):
+        embedded.append(text)
+        return vectors[text]
+
+    cache = _cache(tmp_path, ttl=60, max_entries=10, embed=embed, similarity_threshold=0.95)
+    assert cache.get("Show overall KPIs", SCOPE) is None
+    cache.put("Show overall KPIs", SCOPE, "KPIs are up.")
+    # The vector of the missed lookup is reused when storing the answer
+    assert embedded == ["show overall kpis"]
+
+    assert cache.get("Overall KPI summary", SCOPE)["response"] == "KPIs are up."
+    assert cache.get("Waste report", SCOPE) is None
+    stats = cache.stats()
+    assert (stats["similar_hits"], stats["misses"]) == (1, 2)
+
+
+def test_similarity_lookups_compare_the_most_recently_used_entries(tmp_path):
+    vectors = {"show overall kpis": [1.0, 0.0], "overall kpi summary": [0.99, 0.05], "waste report": [0.0, 1.0]}
+    cache = _cache(
+        tmp_path, ttl=60, max_entries=10, embed=vectors.get, similarity_threshold=0.95, similarity_candidates=1
+    )
+    cache.put("Show overall KPIs", SCOPE, "KPIs are up.")
+    time.sleep(0.01)
+    cache.put("Waste report", SCOPE, "Waste is down.")
+    # Embeddings are stored as packed float32
+    stored = cache._connection().execute("SELECT embedding FROM responses WHERE query = 'waste report'").fetchone()[0]
+    assert stored == bytes(4) + b"\x00\x00\x80?"
+
+    # Only the waste report is a candidate
+    assert cache.get("Overall KPI summary", SCOPE) is None
+    cache.similarity_candidates = 2
+    assert cache.get("Overall KPI summary", SCOPE)["response"] == "KPIs are up."
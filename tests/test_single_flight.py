@@ -0,0 +1,73 @@
+import threading
+import pytest
+from service.run import StreamResult
+from service.single_flight import SingleFlight
+
+
+def _registries(tmp_path, count=2, timeout=5):
+    # One registry per worker process, sharing the database under CACHE_DIR
+    return [
+        SingleFlight(timeout=timeout, path=str(tmp_path / "single_flight.sqlite3"), poll_interval=0.01, flush_interval=0)
+        for _ in range(count)
+    ]
+
+
+def test_identical_queries_follow_the_leaders_run(tmp_path):
+    first, second = _registries(tmp_path)
+    leader_flight, leader = first.join("kpis")
+    follower_flight, follower = second.join("kpis")
+    assert leader and not follower
+
+    received = []
+    follower_thread = threading.Thread(target=lambda: received.extend(follower_flight.subscribe(5)))
+    follower_thread.start()
+    for chunk in ("Overall ", "KPIs ", "are up."):
+        leader_flight.publish(chunk)
+    first.finish(leader_flight, StreamResult(text="Overall KPIs are up.", run_id="run_1", status="completed"))
+    follower_thread.join(5)
+
+    assert "".join(received) == "Overall KPIs are up."
+    assert follower_flight.result.run_id == "run_1"
+    assert leader_flight.subscribers == 1
+    assert first.stats()["in_flight"] == 0
+    # Once finished, the next identical query starts a fresh run
+    assert second.join("kpis")[1]
+
+
+def test_late_joiners_replay_the_prefix(tmp_path):
+    first, second = _registries(tmp_path)
+    leader_flight, _ = first.join("kpis")
+    leader_flight.publish("Overall ")
+    leader_flight.publish("KPIs ")
+
+    follower_flight, leader = second.join("kpis")
+    assert not leader
+    stream = follower_flight.subscribe(5)
+    assert [next(stream), next(stream)] == ["Overall ", "KPIs "]
+
+    leader_flight.publish("are up.")
+    first.finish(leader_flight, StreamResult(text="Overall KPIs are up.", status="completed"))
+    assert list(stream) == ["are up."]
+    assert follower_flight.result.status == "completed"
+
+
+def test_followers_give_up_on_a_run_that_does_not_finish(tmp_path):
+    first, second = _registries(tmp_path, timeout=0.2)
+    first.join("kpis")
+    follower_flight, leader = second.join("kpis")
+    assert not leader
+
+    with pytest.raises(TimeoutError):
+        list(follower_flight.subscribe(second.timeout))
+    # A run older than the timeout is abandoned; the next caller leads a new one
+    assert second.join("kpis")[1]
+
+
+def test_failed_runs_leave_followers_without_a_result(tmp_path):
+    first, second = _registries(tmp_path)
+    leader_flight, _ = first.join("kpis")
+    follower_flight, _ = second.join("kpis")
+    first.finish(leader_flight)
+
+    assert list(follower_flight.subscribe(5)) == []
+    assert follower_flight.result is None
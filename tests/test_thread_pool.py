@@ -0,0 +1,44 @@
+import itertools
+from service.thread_pool import ThreadPool
+
+
+def _pools(tmp_path, size=2, count=2):
+    ids = itertools.count()
+    deleted = []
+    pools = [
+        ThreadPool(
+            size=size,
+            path=str(tmp_path / "thread_pool.sqlite3"),
+            create_thread=lambda: f"thread_{next(ids)}",
+            delete_thread=deleted.append,
+        )
+        for _ in range(count)
+    ]
+    return pools, deleted
+
+
+def test_workers_share_one_pool(tmp_path):
+    (first, second), deleted = _pools(tmp_path)
+    first._fill()
+    second._fill()
+    assert second.stats()["ready"] == 2
+
+    # A thread filled by one worker is handed out once, to whichever worker asks first
+    assert {first.acquire(), second.acquire()} == {"thread_0", "thread_1"}
+    assert first.stats()["ready"] == 0
+    assert first.acquire() == "thread_2"
+    assert first.stats()["misses"] == 1
+    assert deleted == []
+
+
+def test_eviction_trims_threads_beyond_size(tmp_path):
+    (first, second), deleted = _pools(tmp_path)
+    # Both workers saw an empty pool and refilled it at the same time
+    first._fill()
+    second._connection().execute("INSERT INTO ready_threads VALUES ('surplus', 0)")
+    assert first.stats()["ready"] == 3
+
+    first.ttl = float("inf")
+    first._evict_expired()
+    assert first.stats()["ready"] == 2
+    assert deleted == ["surplus"]
@@ -0,0 +1,83 @@
+import os
+import itertools
+from types import SimpleNamespace
+from service import vector_sync
+from service.vector_sync import VectorStoreSync
+
+
+class FakeClient:
+    """Just enough of the OpenAI client for a sync; batches listed in ``failing_batches`` raise."""
+
+    def __init__(self, failing_batches=()):
+        self.ids = itertools.count()
+        self.batches = []
+        self.deleted = []
+        self.failing_batches = set(failing_batches)
+        self.files = SimpleNamespace(create=self._create, delete=lambda file_id, **kwargs: self.deleted.append(file_id))
+        vector_store_files = SimpleNamespace(delete=lambda file_id, **kwargs: None)
+        file_batches = SimpleNamespace(create_and_poll=self._create_and_poll)
+        self.beta = SimpleNamespace(vector_stores=SimpleNamespace(files=vector_store_files, file_batches=file_batches))
+
+    def _create(self, file, **kwargs):
+        return SimpleNamespace(id=f"file_{next(self.ids)}")
+
+    def _create_and_poll(self, vector_store_id, file_ids):
+        self.batches.append(list(file_ids))
+        if len(self.batches) in self.failing_batches:
+            raise RuntimeError("batch rejected")
+        counts = SimpleNamespace(failed=0, cancelled=0, total=len(file_ids))
+        return SimpleNamespace(id=f"batch_{len(self.batches)}", status="completed", file_counts=counts)
+
+
+def _sync(tmp_path, client):
+    return VectorStoreSync(client, "vs_test", str(tmp_path / "data"), manifest_path=str(tmp_path / "manifest.json"))
+
+
+def _write_files(tmp_path, count):
+    data = tmp_path / "data"
+    data.mkdir(exist_ok=True)
+    for index in range(count):
+        (data / f"report_{index}.csv").write_text(f"week,oee\n1,{index}\n")
+
+
+def test_large_folder_is_attached_in_batches_within_the_limit(tmp_path):
+    _write_files(tmp_path, 1001)
+    client = FakeClient()
+    summary = _sync(tmp_path, client).sync()
+
+    assert [len(batch) for batch in client.batches] == [500, 500, 1]
+    assert summary["uploaded"] == 1001 and summary["failed"] == 0
+    assert client.deleted == []
+
+
+def test_failed_batch_only_rolls_back_its_own_files(tmp_path):
+    _write_files(tmp_path, 600)
+    client = FakeClient(failing_batches={2})
+    sync = _sync(tmp_path, client)
+    summary = sync.sync()
+
+    assert summary["uploaded"] == 500 and summary["failed"] == 100
+    assert sorted(client.deleted) == sorted(client.batches[1])
+    assert len(sync.load_manifest()) == 500
+
+    # The next sync retries only the files that were rolled back
+    client.failing_batches.clear()
+    assert sync.sync()["uploaded"] == 100
+    assert len(client.batches[-1]) == 100
+
+
+def test_unchanged_files_are_not_hashed_again(tmp_path, monkeypatch):
+    _write_files(tmp_path, 3)
+    sync = _sync(tmp_path, FakeClient())
+    sync.sync()
+
+    hashed = []
+    file_sha256 = vector_sync.file_sha256
+    monkeypatch.setattr(vector_sync, "file_sha256", lambda path: hashed.append(path) or file_sha256(path))
+    changed = tmp_path / "data" / "report_1.csv"
+    changed.write_text("week,oee\n1,99\n")
+    os.utime(changed, (1, 1))
+
+    summary = sync.sync()
+    assert hashed == [str(changed)]
+    assert summary["updated"] == 1 and summary["unchanged"] == 2